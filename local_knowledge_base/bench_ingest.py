@@ -0,0 +1,231 @@
+"""
+文档导入基准：比较逐个加载切分后再计算向量的旧流程，与多进程流式导入（iter_documents）的总耗时和首批延迟；
+计算向量时（--embed-ms或--real-embeddings）再比较嵌入缓存为空（冷）和已缓存同一语料（热）时重新索引的耗时、
+命中率和模型计算的片段数
+
+不指定目录时生成几百个PDF/Markdown/文本混合的样本文件。运行方式（在local_knowledge_base目录）：
+    python bench_ingest.py --files 300 --workers 1 2 4 8
+    python bench_ingest.py --directory docs --embed-ms 2
+    python bench_ingest.py --files 300 --real-embeddings
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from langchain.embeddings.base import Embeddings
+
+from document_loaders import DocumentProcessor
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+WORDS = ("system design cache latency throughput database index shard replica queue consumer producer "
+         "transaction isolation lock thread process memory garbage collector interpreter python java "
+         "kubernetes container deployment rollback monitoring alert incident postmortem project team").split()
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    """
+    写一个每页若干行文本的最小PDF（Helvetica字体，仅ASCII）
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        content = "BT /F1 10 Tf 50 780 Td 13 TL " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    path.write_bytes(bytes(out))
+
+
+def make_corpus(directory: Path, count: int, seed: int = 0) -> List[Path]:
+    """
+    生成PDF、Markdown和文本各约三分之一的样本文件，长度为1~8页（每页约40行）
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        kind = (".pdf", ".md", ".txt")[i % 3]
+        pages = [[_sentence(rng) for _ in range(40)] for _ in range(rng.randint(1, 8))]
+        path = directory / f"doc_{i:04d}{kind}"
+        if kind == ".pdf":
+            # PDF每行需在页面宽度内，按句子分行
+            write_pdf(path, [[line[:95] for line in page] for page in pages])
+        elif kind == ".md":
+            sections = [f"## Section {n + 1}\n\n" + "\n\n".join(" ".join(page[j:j + 5]) for j in range(0, 40, 5))
+                        for n, page in enumerate(pages)]
+            path.write_text(f"# Document {i}\n\n" + "\n\n".join(sections), encoding="utf-8")
+        else:
+            path.write_text("\n\n".join(" ".join(page) for page in pages), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+class SimulatedEmbeddings(Embeddings):
+    """按每个片段embed_ms毫秒模拟耗时的嵌入模型，向量由文本哈希生成"""
+
+    def __init__(self, embed_ms: float, dim: int = 384):
+        self.embed_ms = embed_ms
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.embed_ms * len(texts) / 1000)
+        vectors = []
+        for text in texts:
+            rng = random.Random(text)
+            vectors.append([rng.random() for _ in range(self.dim)])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_model(embed_ms: float, real: bool) -> Optional[Embeddings]:
+    """
+    嵌入模型：真实的HuggingFace模型，或按每个片段embed_ms毫秒模拟的耗时
+    """
+    if real:
+        from embeddings import get_embeddings
+        return get_embeddings("huggingface")
+    if embed_ms > 0:
+        return SimulatedEmbeddings(embed_ms)
+    return None
+
+
+def run_sequential(paths: List[Path], embed, **kwargs) -> dict:
+    """
+    旧流程：逐个文件加载切分，全部片段在内存中收齐后再计算向量
+    """
+    processor = DocumentProcessor()
+    start = time.perf_counter()
+    all_splits = []
+    for path in paths:
+        all_splits.extend(processor.process_document(path, **kwargs))
+    parsed = time.perf_counter() - start
+    if embed is not None:
+        embed([doc.page_content for doc in all_splits])
+    total = time.perf_counter() - start
+    return {"chunks": len(all_splits), "first_batch": parsed, "parse": parsed, "total": total,
+            "max_held": len(all_splits)}
+
+
+def run_streaming(paths: List[Path], embed, workers: int, batch_size: int, **kwargs) -> dict:
+    """
+    流式导入：进程池解析，每批片段一到达就计算向量
+    """
+    processor = DocumentProcessor()
+    start = time.perf_counter()
+    first_batch = None
+    chunks = 0
+    max_held = 0
+    for batch in processor.iter_documents(paths, max_workers=workers, batch_size=batch_size, **kwargs):
+        if first_batch is None:
+            first_batch = time.perf_counter() - start
+        chunks += len(batch)
+        max_held = max(max_held, len(batch))
+        if embed is not None:
+            embed([doc.page_content for doc in batch])
+    total = time.perf_counter() - start
+    return {"chunks": chunks, "first_batch": first_batch or total, "parse": None, "total": total,
+            "max_held": max_held}
+
+
+def run_cached(paths: List[Path], model: Embeddings, cache_directory: str, workers: int, batch_size: int,
+               **kwargs) -> dict:
+    """
+    流式导入并经过嵌入缓存计算向量（每次运行重新打开缓存，与重新启动进程后重新索引相同）
+    """
+    cache = EmbeddingCache(cache_directory)
+    embeddings = CachedEmbeddings(model, cache, "bench")
+    try:
+        result = run_streaming(paths, embeddings.embed_documents, workers, batch_size, **kwargs)
+    finally:
+        cache.close()
+    return dict(result, **embeddings.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文档导入基准")
+    parser.add_argument("--directory", help="使用已有的文档目录（默认生成样本文件）")
+    parser.add_argument("--files", type=int, default=300, help="生成的样本文件数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1],
+                        help="流式导入的工作进程数")
+    parser.add_argument("--batch-size", type=int, default=64, help="流式导入每批的片段数")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="切分长度")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="模拟每个片段计算向量的耗时（毫秒），0表示只解析")
+    parser.add_argument("--real-embeddings", action="store_true", help="使用真实的HuggingFace嵌入模型")
+    args = parser.parse_args()
+
+    temp = None
+    if args.directory:
+        extensions = set(DocumentProcessor().loaders)
+        paths = sorted(path for path in Path(args.directory).rglob("*") if path.suffix.lower() in extensions)
+    else:
+        temp = tempfile.TemporaryDirectory()
+        paths = make_corpus(Path(temp.name), args.files)
+    size_mb = sum(path.stat().st_size for path in paths) / 1e6
+    kinds = {}
+    for path in paths:
+        kinds[path.suffix.lower()] = kinds.get(path.suffix.lower(), 0) + 1
+    print(f"文件: {len(paths)}个 {kinds}，共{size_mb:.1f}MB，CPU核数 {os.cpu_count()}")
+
+    model = make_model(args.embed_ms, args.real_embeddings)
+    embed = model.embed_documents if model is not None else None
+    if embed is not None:
+        # 模型加载不计入导入耗时
+        embed(["warm up"])
+    splitter = {"chunk_size": args.chunk_size, "chunk_overlap": min(200, args.chunk_size // 5)}
+
+    try:
+        baseline = run_sequential(paths, embed, **splitter)
+        rows = [("逐个处理", baseline)]
+        for workers in dict.fromkeys(args.workers):
+            rows.append((f"流式 {workers}进程", run_streaming(paths, embed, workers, args.batch_size, **splitter)))
+        cached_rows = []
+        if model is not None:
+            # 同一语料索引两次：第一次缓存为空，第二次（如重新创建知识库）所有片段都应命中缓存
+            with tempfile.TemporaryDirectory() as cache_directory:
+                workers = max(args.workers)
+                for name in ("缓存冷", "缓存热"):
+                    cached_rows.append((name, run_cached(paths, model, cache_directory, workers, args.batch_size,
+                                                         **splitter)))
+    finally:
+        if temp is not None:
+            temp.cleanup()
+
+    for name, result in rows:
+        print(f"{name:<10} 片段 {result['chunks']:6d}  首批 {result['first_batch'] * 1000:8.0f}ms  "
+              f"总耗时 {result['total']:7.2f}s  {result['chunks'] / result['total']:8.0f}片段/s  "
+              f"加速 {baseline['total'] / result['total']:5.2f}x  内存中最多 {result['max_held']}个片段")
+    for name, result in cached_rows:
+        print(f"{name:<10} 片段 {result['chunks']:6d}  总耗时 {result['total']:7.2f}s  "
+              f"命中 {result['hits']:6d}  模型计算 {result['misses']:6d}  命中率 {result['hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from typing import List, Union
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Union
 from pathlib import Path
 from langchain.document_loaders import (
     PyPDFLoader,
@@ -14,6 +16,23 @@ from langchain.text_splitter import (
 )
 from langchain.schema import Document
 
+# 进程池中每个工作进程的文档处理器
+_worker_processor = None
+
+
+def _init_worker(loaders: Dict[str, type]) -> None:
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+    _worker_processor.loaders = loaders
+
+
+def _process_in_worker(file_path: str, splitter_type: str, kwargs: dict) -> List[Document]:
+    """
+    在工作进程中加载并切分一个文件
+    """
+    return _worker_processor.process_document(file_path, splitter_type, **kwargs)
+
+
 class DocumentProcessor:
     """文档处理器：支持多种格式的文档加载和切分"""
     
@@ -94,15 +113,95 @@ class DocumentProcessor:
                          splitter_type: str = "recursive",
                          **kwargs) -> List[Document]:
         """
-        批量处理多个文档
+        批量处理多个文档（多进程并行加载和切分，结果按输入顺序排列）
         :param file_paths: 文档路径列表
         :param splitter_type: 分割器类型
-        :param kwargs: 分割器参数
+        :param kwargs: 分割器参数，以及iter_documents的max_workers
         :return: 所有文档的分割片段列表
         """
         all_splits = []
-        for file_path in file_paths:
-            splits = self.process_document(file_path, splitter_type, **kwargs)
-            all_splits.extend(splits)
-        return all_splits 
- 
\ No newline at end of file
+        for batch in self.iter_documents(file_paths, splitter_type, batch_size=0, ordered=True, **kwargs):
+            all_splits.extend(batch)
+        return all_splits
+
+    def iter_documents(self,
+                       file_paths: List[Union[str, Path]],
+                       splitter_type: str = "recursive",
+                       max_workers: Optional[int] = None,
+                       batch_size: int = 64,
+                       ordered: bool = False,
+                       **kwargs) -> Iterator[List[Document]]:
+        """
+        流式批量处理文档：在进程池中加载、解析和切分文件，片段按批返回，
+        调用方可以在后面的文件仍在解析时开始计算第一批片段的向量，也不必把全部片段保存在内存中
+        :param file_paths: 文档路径列表
+        :param splitter_type: 分割器类型
+        :param max_workers: 工作进程数，为None时使用CPU核数，为1时在当前进程中逐个处理
+        :param batch_size: 每批的片段数（按文件边界凑满，最后一批可能不足），为0时每个文件一批
+        :param ordered: 是否按输入顺序返回（否则哪个文件先处理完先返回）
+        :param kwargs: 分割器参数
+        :return: 片段批次的迭代器
+        """
+        file_paths = [str(file_path) for file_path in file_paths]
+        max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+        if max_workers <= 1:
+            results = (self.process_document(file_path, splitter_type, **kwargs) for file_path in file_paths)
+            yield from self._batches(results, batch_size)
+            return
+        yield from self._batches(
+            self._iter_parallel(file_paths, splitter_type, max_workers, ordered, kwargs),
+            batch_size
+        )
+
+    def _iter_parallel(self,
+                       file_paths: List[str],
+                       splitter_type: str,
+                       max_workers: int,
+                       ordered: bool,
+                       kwargs: dict) -> Iterator[List[Document]]:
+        """
+        进程池处理文件，依次返回每个文件的片段；同时提交的文件数有上限，已完成但未被取走的结果不会无限累积
+        """
+        window = max_workers * 2
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.loaders,)) as executor:
+            pending = {}
+            done_results = {}
+            next_submit = 0
+            next_yield = 0
+            try:
+                while next_yield < len(file_paths):
+                    while next_submit < len(file_paths) and len(pending) + len(done_results) < window:
+                        future = executor.submit(_process_in_worker, file_paths[next_submit], splitter_type, kwargs)
+                        pending[future] = next_submit
+                        next_submit += 1
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done_results[pending.pop(future)] = future.result()
+                    if ordered:
+                        while next_yield in done_results:
+                            yield done_results.pop(next_yield)
+                            next_yield += 1
+                    else:
+                        for index in list(done_results):
+                            yield done_results.pop(index)
+                            next_yield += 1
+            finally:
+                # 调用方提前停止迭代或出错时不再处理剩余文件
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _batches(results: Iterator[List[Document]], batch_size: int) -> Iterator[List[Document]]:
+        """
+        把逐个文件的片段凑成批次
+        """
+        batch: List[Document] = []
+        for splits in results:
+            batch.extend(splits)
+            if batch and len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
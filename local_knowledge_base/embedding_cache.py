@@ -0,0 +1,316 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# 默认放在用户缓存目录（$XDG_CACHE_HOME或~/.cache）下，不在工作目录中生成文件
+DEFAULT_CACHE_DIRECTORY = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "local_knowledge_base", "embeddings"
+)
+
+# SQLite单条语句的参数个数有上限，按批查询
+_QUERY_BATCH = 500
+
+
+def normalize_chunk(text: str) -> str:
+    """
+    归一化文档片段：合并空白字符，只有空白不同的片段共用一个向量
+    """
+    return " ".join(text.split())
+
+
+def chunk_key(text: str) -> bytes:
+    """
+    片段内容的SHA-256（归一化后）
+    """
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).digest()
+
+
+class _VectorFile:
+    """单个模型的向量矩阵文件（内存映射），按槽位读写，容量不足时扩展文件"""
+
+    def __init__(self, path: str, dim: int, dtype: np.dtype, capacity: int):
+        self.path = path
+        self.dim = dim
+        self.dtype = dtype
+        self.capacity = 0
+        self.array = None
+        self._open(capacity)
+
+    def _open(self, capacity: int) -> None:
+        size = capacity * self.dim * self.dtype.itemsize
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < size:
+            with open(self.path, "ab") as f:
+                f.truncate(size)
+        self.capacity = os.path.getsize(self.path) // (self.dim * self.dtype.itemsize)
+        self.array = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(self.capacity, self.dim))
+
+    def ensure(self, capacity: int) -> None:
+        """
+        保证至少有capacity个槽位，扩展时容量翻倍
+        """
+        if capacity <= self.capacity:
+            return
+        self.array.flush()
+        self.array = None
+        self._open(max(capacity, self.capacity * 2))
+
+    def flush(self) -> None:
+        self.array.flush()
+
+
+class EmbeddingCache:
+    """按内容寻址的磁盘嵌入缓存
+
+    键为(模型ID, 归一化片段文本的SHA-256)。每个模型的向量存放在一个内存映射的float32/float16矩阵文件中，
+    SQLite索引记录键到矩阵行（槽位）的映射和最近使用时间；条目总数超过上限时淘汰最久未使用的条目，
+    空出的槽位由之后写入的向量复用。同一目录可由多个向量存储共用。
+    """
+
+    def __init__(self,
+                 directory: str = DEFAULT_CACHE_DIRECTORY,
+                 dtype: str = "float32",
+                 max_entries: int = 500000,
+                 initial_capacity: int = 1024):
+        """
+        初始化嵌入缓存
+        :param directory: 缓存目录（支持~，不存在时创建）
+        :param dtype: 新建矩阵文件的存储精度 ("float32", "float16")，已存在的文件保持原精度
+        :param max_entries: 所有模型合计的最大条目数
+        :param initial_capacity: 矩阵文件的初始槽位数
+        """
+        directory = os.path.expanduser(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self.initial_capacity = initial_capacity
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY, dim INTEGER NOT NULL, dtype TEXT NOT NULL, next_slot INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT NOT NULL, key BLOB NOT NULL, slot INTEGER NOT NULL, last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (
+                model TEXT NOT NULL, slot INTEGER NOT NULL, PRIMARY KEY (model, slot)
+            );
+        """)
+        self._files: Dict[str, _VectorFile] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _file(self, model: str, dim: Optional[int] = None) -> Optional[_VectorFile]:
+        """
+        模型的矩阵文件，第一次写入时按向量维度创建
+        """
+        vector_file = self._files.get(model)
+        if vector_file is not None:
+            return vector_file
+        row = self._db.execute("SELECT dim, dtype, next_slot FROM models WHERE model = ?", (model,)).fetchone()
+        if row is None:
+            if dim is None:
+                return None
+            row = (dim, self.dtype.name, 0)
+            self._db.execute("INSERT INTO models VALUES (?, ?, ?, ?)", (model, *row))
+        digest = hashlib.sha1(model.encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.directory, f"{digest}.{row[1]}")
+        vector_file = _VectorFile(path, row[0], np.dtype(row[1]), max(row[2], self.initial_capacity))
+        self._files[model] = vector_file
+        return vector_file
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        批量查找向量
+        :param model: 模型ID
+        :param texts: 片段文本
+        :return: 与texts一一对应的float32向量，未缓存的为None
+        """
+        keys = [chunk_key(text) for text in texts]
+        with self._lock:
+            vector_file = self._file(model)
+            slots = {}
+            rows = {}
+            if vector_file is not None:
+                for i in range(0, len(keys), _QUERY_BATCH):
+                    batch = list(set(keys[i:i + _QUERY_BATCH]))
+                    slots.update(self._db.execute(
+                        f"SELECT key, slot FROM entries WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                        (model, *batch)
+                    ).fetchall())
+            if slots:
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE model = ? AND key = ?",
+                    [(time.time(), model, key) for key in slots]
+                )
+                self._db.commit()
+                # 一次取出所有命中的行，读取只涉及对应的页
+                found = sorted(set(slots.values()))
+                rows = dict(zip(found, np.asarray(vector_file.array[found], dtype=np.float32)))
+            hit = sum(key in slots for key in keys)
+            self.hits += hit
+            self.misses += len(keys) - hit
+            return [rows[slots[key]] if key in slots else None for key in keys]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """
+        批量写入向量（已存在的键保持不变）
+        :param model: 模型ID
+        :param texts: 片段文本
+        :param vectors: 与texts一一对应的向量
+        """
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            vector_file = self._file(model, matrix.shape[1])
+            if vector_file.dim != matrix.shape[1]:
+                raise ValueError(f"向量维度不一致：缓存中为{vector_file.dim}，写入的为{matrix.shape[1]}")
+            now = time.time()
+            next_slot = self._db.execute("SELECT next_slot FROM models WHERE model = ?", (model,)).fetchone()[0]
+            free = [slot for (slot,) in self._db.execute(
+                "SELECT slot FROM free_slots WHERE model = ? ORDER BY slot LIMIT ?", (model, len(texts))
+            )]
+            rows = []
+            seen = set()
+            for text, vector in zip(texts, matrix):
+                key = chunk_key(text)
+                if key in seen or self._db.execute(
+                    "SELECT 1 FROM entries WHERE model = ? AND key = ?", (model, key)
+                ).fetchone():
+                    continue
+                seen.add(key)
+                if free:
+                    slot = free.pop(0)
+                    self._db.execute("DELETE FROM free_slots WHERE model = ? AND slot = ?", (model, slot))
+                else:
+                    slot = next_slot
+                    next_slot += 1
+                    vector_file.ensure(next_slot)
+                vector_file.array[slot] = vector
+                rows.append((model, key, slot, now))
+            vector_file.flush()
+            self._db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("UPDATE models SET next_slot = ? WHERE model = ?", (next_slot, model))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """
+        条目总数超过上限时淘汰最久未使用的条目，槽位放入空闲列表
+        """
+        excess = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._db.execute(
+            "SELECT model, key, slot FROM entries ORDER BY last_used LIMIT ?", (excess,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE model = ? AND key = ?", [row[:2] for row in evicted])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots VALUES (?, ?)", [(row[0], row[2]) for row in evicted])
+        self.evictions += len(evicted)
+
+    def stats(self) -> dict:
+        """
+        条目数、命中/未命中次数、命中率和淘汰次数
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        with self._lock:
+            for vector_file in self._files.values():
+                vector_file.flush()
+            self._files.clear()
+            self._db.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """带磁盘缓存的嵌入模型：文档片段先查缓存，只计算未缓存的片段；查询文本直接计算"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_id: str):
+        """
+        :param embeddings: 实际的嵌入模型
+        :param cache: 嵌入缓存
+        :param model_id: 模型ID，不同模型的向量互不混用
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_id, texts)
+        missed = sum(vector is None for vector in vectors)
+        self.hits += len(vectors) - missed
+        self.misses += missed
+        # 未缓存的片段按归一化内容去重后一次计算
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_chunk(texts[i]), []).append(i)
+        if missing:
+            firsts = [texts[indices[0]] for indices in missing.values()]
+            computed = self.embeddings.embed_documents(firsts)
+            self.cache.put_many(self.model_id, firsts, computed)
+            for indices, vector in zip(missing.values(), computed):
+                for i in indices:
+                    vectors[i] = vector
+        return [vector.tolist() if isinstance(vector, np.ndarray) else list(vector) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self, since: Optional[dict] = None) -> dict:
+        """
+        经过该实例的文档片段的缓存命中次数和命中率（未命中的片段由模型计算）
+        :param since: 之前某次stats()的结果，提供时只统计此后的片段（如一次创建或同步）
+        """
+        hits = self.hits - (since["hits"] if since else 0)
+        misses = self.misses - (since["misses"] if since else 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+_shared_caches: Dict[str, EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(directory: str = DEFAULT_CACHE_DIRECTORY, **kwargs) -> EmbeddingCache:
+    """
+    同一目录在进程内共用一个缓存实例
+    :param directory: 缓存目录
+    :param kwargs: 第一次创建时的EmbeddingCache参数
+    """
+    path = os.path.abspath(os.path.expanduser(directory))
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = EmbeddingCache(directory, **kwargs)
+        return _shared_caches[path]
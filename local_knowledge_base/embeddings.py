@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from langchain.embeddings.base import Embeddings
+
+DEFAULT_HUGGINGFACE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _build_huggingface(model_name: Optional[str], device: Optional[str], **kwargs) -> Embeddings:
+    from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": device} if device else {}
+    )
+
+
+def _build_openai(model_name: Optional[str], device: Optional[str], **kwargs) -> Embeddings:
+    from langchain.embeddings import OpenAIEmbeddings
+    params = {"api_key": kwargs.get("api_key")}
+    if model_name:
+        params["model"] = model_name
+    return OpenAIEmbeddings(**params)
+
+
+def _build_cohere(model_name: Optional[str], device: Optional[str], **kwargs) -> Embeddings:
+    from langchain.embeddings import CohereEmbeddings
+    params = {"api_key": kwargs.get("api_key")}
+    if model_name:
+        params["model"] = model_name
+    return CohereEmbeddings(**params)
+
+
+class EmbeddingRegistry:
+    """嵌入模型注册表：只创建请求的模型，并按(类型, 模型名, 设备)在进程内缓存实例"""
+
+    def __init__(self, default_type: str = "huggingface"):
+        self.default_type = default_type
+        self._builders: Dict[str, Callable[..., Embeddings]] = {
+            "huggingface": _build_huggingface,
+            "openai": _build_openai,
+            "cohere": _build_cohere,
+        }
+        # 未指定模型名时使用的模型，使默认模型和显式指定的同名模型共用一个实例
+        self._default_models: Dict[str, Optional[str]] = {"huggingface": DEFAULT_HUGGINGFACE_MODEL}
+        self._instances: Dict[Tuple[str, Optional[str], Optional[str]], Embeddings] = {}
+        self._metrics: Dict[Tuple[str, Optional[str], Optional[str]], dict] = {}
+        self._key_locks: Dict[Tuple[str, Optional[str], Optional[str]], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self,
+                 embedding_type: str,
+                 builder: Callable[..., Embeddings],
+                 default_model: Optional[str] = None) -> None:
+        """
+        注册嵌入模型类型
+        :param embedding_type: 类型名称
+        :param builder: (model_name, device, **kwargs) -> Embeddings
+        :param default_model: 未指定模型名时使用的模型
+        """
+        with self._lock:
+            self._builders[embedding_type] = builder
+            self._default_models[embedding_type] = default_model
+
+    def get(self,
+            embedding_type: str = "huggingface",
+            model_name: Optional[str] = None,
+            device: Optional[str] = None,
+            **kwargs) -> Embeddings:
+        """
+        获取嵌入模型，第一次请求时创建，之后返回同一个实例
+        :param embedding_type: 嵌入模型类型 ("huggingface", "openai", "cohere")，未知类型使用默认类型
+        :param model_name: 模型名称，为None时使用该类型的默认模型
+        :param device: 运行设备（仅本地模型），如 "cpu"、"cuda"
+        :param kwargs: 创建时的其他参数（如api_key），不参与缓存的键
+        """
+        if embedding_type not in self._builders:
+            embedding_type = self.default_type
+        key = (embedding_type, model_name or self._default_models.get(embedding_type), device)
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._metrics[key]["hits"] += 1
+                return instance
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            builder = self._builders[embedding_type]
+
+        # 加载模型可能需要数秒，只锁住同一个键，其他模型的请求不必等待
+        with key_lock:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is not None:
+                    self._metrics[key]["hits"] += 1
+                    return instance
+            start = time.perf_counter()
+            instance = builder(key[1], device, **kwargs)
+            load_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._instances[key] = instance
+                self._metrics[key] = {"load_ms": round(load_ms, 1), "hits": 0}
+        return instance
+
+    def model_id(self, embedding_type: str = "huggingface", model_name: Optional[str] = None) -> str:
+        """
+        模型ID（"类型:模型名"），用于区分不同模型计算的向量
+        """
+        if embedding_type not in self._builders:
+            embedding_type = self.default_type
+        return f"{embedding_type}:{model_name or self._default_models.get(embedding_type) or 'default'}"
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        各已加载模型的加载耗时和缓存命中次数
+        :return: "类型:模型名:设备" -> {"load_ms": ..., "hits": ...}
+        """
+        with self._lock:
+            return {
+                ":".join(part or "default" for part in key): dict(metrics)
+                for key, metrics in self._metrics.items()
+            }
+
+    def clear(self) -> None:
+        """释放所有缓存的模型"""
+        with self._lock:
+            self._instances.clear()
+            self._metrics.clear()
+            self._key_locks.clear()
+
+
+# 进程内共享的注册表，VectorStoreManager和LocalKnowledgeBase使用同一个模型实例
+registry = EmbeddingRegistry()
+
+
+def get_embeddings(embedding_type: str = "huggingface", **kwargs) -> Embeddings:
+    """
+    从共享注册表获取嵌入模型
+    :param embedding_type: 嵌入模型类型
+    :param kwargs: model_name、device及创建参数
+    """
+    return registry.get(embedding_type, **kwargs)
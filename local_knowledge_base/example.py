@@ -6,7 +6,9 @@ def main():
     
     # 创建新的知识库
     pdf_path = "your_pdf_file.pdf"  # 替换为实际的PDF文件路径
-    kb.create_knowledge_base(pdf_path)
+    report = kb.create_knowledge_base(pdf_path)
+    # 重新创建同一份文档时片段的向量来自嵌入缓存（hits），只有新内容需要模型计算（misses）
+    print(f"已索引 {report['chunks_added']} 个片段，嵌入缓存：{report.get('embedding_cache')}")
     
     # 进行搜索
     query = "在这里输入您的问题"
@@ -1,23 +1,72 @@
 import os
-from typing import List, Optional
-from langchain.embeddings import HuggingFaceEmbeddings
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Union
+from langchain.embeddings.base import Embeddings
 from langchain.vectorstores import Chroma
-from pdf_loader import PDFDocumentProcessor
+try:
+    from .document_loaders import DocumentProcessor
+    from .embedding_cache import DEFAULT_CACHE_DIRECTORY, CachedEmbeddings, get_shared_cache
+    from .embeddings import DEFAULT_HUGGINGFACE_MODEL, registry
+    from .manifest import MANIFEST_FILE, DocumentManifest, IncrementalIndexer
+    from .pdf_loader import PDFDocumentProcessor
+except ImportError:
+    # 在local_knowledge_base目录中直接运行示例脚本时
+    from document_loaders import DocumentProcessor
+    from embedding_cache import DEFAULT_CACHE_DIRECTORY, CachedEmbeddings, get_shared_cache
+    from embeddings import DEFAULT_HUGGINGFACE_MODEL, registry
+    from manifest import MANIFEST_FILE, DocumentManifest, IncrementalIndexer
+    from pdf_loader import PDFDocumentProcessor
 
 class LocalKnowledgeBase:
-    def __init__(self, persist_directory: str = "./knowledge_base"):
+    def __init__(self,
+                 persist_directory: str = "./knowledge_base",
+                 model_name: str = DEFAULT_HUGGINGFACE_MODEL,
+                 device: Optional[str] = None,
+                 cache_directory: Optional[str] = DEFAULT_CACHE_DIRECTORY):
         """
-        初始化本地知识库
+        初始化本地知识库（嵌入模型在第一次使用时从共享注册表获取）
         :param persist_directory: 知识库持久化存储的目录
+        :param model_name: HuggingFace嵌入模型名称
+        :param device: 嵌入模型运行设备，为None时由sentence-transformers自动选择
+        :param cache_directory: 嵌入缓存目录（与VectorStoreManager共用），默认为用户缓存目录，为None时不缓存
         """
         self.persist_directory = persist_directory
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.model_name = model_name
+        self.device = device
+        self.embedding_cache = get_shared_cache(cache_directory) if cache_directory else None
         self.vector_store = None
+        self._embeddings = None
+        self._indexer = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """
+        嵌入模型，同一进程中相同模型只加载一次；启用缓存时文档片段的向量经过磁盘缓存
+        """
+        if self._embeddings is None:
+            embeddings = registry.get("huggingface", model_name=self.model_name, device=self.device)
+            if self.embedding_cache is not None:
+                embeddings = CachedEmbeddings(
+                    embeddings,
+                    self.embedding_cache,
+                    registry.model_id("huggingface", self.model_name)
+                )
+            self._embeddings = embeddings
+        return self._embeddings
+
+    def embedding_cache_stats(self) -> dict:
+        """
+        嵌入缓存命中率：本知识库经过的片段，以及共享缓存的总体情况
+        """
+        if not isinstance(self._embeddings, CachedEmbeddings):
+            return {}
+        return {"store": self._embeddings.stats(), "cache": self.embedding_cache.stats()}
         
-    def create_knowledge_base(self, pdf_path: str) -> None:
+    def create_knowledge_base(self, pdf_path: str) -> dict:
         """
-        从PDF文件创建知识库
+        从PDF文件创建知识库（替换已有的知识库），文件记入文档清单，之后可增量更新或移除
         :param pdf_path: PDF文件路径
+        :return: 变更摘要（启用嵌入缓存时包括本次的缓存命中情况）
         """
         # 确保存储目录存在
         os.makedirs(self.persist_directory, exist_ok=True)
@@ -26,13 +75,17 @@ class LocalKnowledgeBase:
         processor = PDFDocumentProcessor()
         documents = processor.load_and_split(pdf_path)
         
-        # 创建向量存储
-        self.vector_store = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory
+        # 清空已有的集合：Chroma.from_documents会追加到已持久化的集合中，旧片段不在清单里就再也无法删除
+        Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings
+        ).delete_collection()
+        self.vector_store = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings
         )
-        self.vector_store.persist()
+        self._indexer = None
+        return self._with_cache_stats(lambda: self._incremental().rebuild(documents))
         
     def load_existing_knowledge_base(self) -> None:
         """
@@ -57,4 +110,72 @@ class LocalKnowledgeBase:
             raise ValueError("请先创建或加载知识库")
             
         results = self.vector_store.similarity_search(query, k=k)
-        return [doc.page_content for doc in results] 
\ No newline at end of file
+        return [doc.page_content for doc in results]
+
+    def _with_cache_stats(self, run: Callable[[], dict]) -> dict:
+        """
+        执行一次创建或增量更新，启用嵌入缓存时在变更摘要中加上本次的缓存命中情况
+        （"embedding_cache": hits为命中缓存的片段，misses为由模型计算的片段）
+        """
+        embeddings = self.embeddings
+        before = embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+        report = run()
+        if before is not None:
+            report["embedding_cache"] = embeddings.stats(since=before)
+        return report
+
+    def _incremental(self) -> IncrementalIndexer:
+        """
+        增量索引器：文档清单保存在知识库目录中，知识库不存在时创建空的知识库
+        """
+        if self._indexer is None:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            if self.vector_store is None:
+                self.vector_store = Chroma(
+                    persist_directory=self.persist_directory,
+                    embedding_function=self.embeddings
+                )
+            processor = DocumentProcessor()
+            self._indexer = IncrementalIndexer(
+                DocumentManifest(os.path.join(self.persist_directory, MANIFEST_FILE)),
+                load_chunks=processor.process_document,
+                add=lambda documents, ids: self.vector_store.add_documents(documents, ids=ids),
+                delete=lambda ids: self.vector_store.delete(ids=ids),
+                persist=lambda: self.vector_store.persist()
+            )
+        return self._indexer
+
+    def add_documents(self, file_paths: Iterable[Union[str, Path]]) -> dict:
+        """
+        向知识库添加文件（PDF、Markdown、Word、文本），已添加且未修改的文件跳过
+        :param file_paths: 文件路径
+        :return: 变更摘要（添加/更新/移除的文件和片段数）
+        """
+        return self._with_cache_stats(lambda: self._incremental().add_documents(file_paths))
+
+    def update_documents(self, file_paths: Optional[Iterable[Union[str, Path]]] = None) -> dict:
+        """
+        重新索引内容有变化的文件，只替换变化的片段
+        :param file_paths: 文件路径，为None时检查所有已添加的文件
+        :return: 变更摘要
+        """
+        return self._with_cache_stats(lambda: self._incremental().update_documents(file_paths))
+
+    def remove_documents(self, file_paths: Iterable[Union[str, Path]]) -> dict:
+        """
+        从知识库移除文件的所有片段
+        :param file_paths: 文件路径
+        :return: 变更摘要
+        """
+        return self._incremental().remove_documents(file_paths)
+
+    def sync(self, directory: Union[str, Path], recursive: bool = True) -> dict:
+        """
+        与文档目录同步：只添加新文件、更新修改过的文件、移除已删除的文件
+        :param directory: 文档目录
+        :param recursive: 是否包含子目录
+        :return: 变更摘要
+        """
+        return self._with_cache_stats(
+            lambda: self._incremental().sync(directory, DocumentProcessor().loaders.keys(), recursive)
+        )
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from langchain.schema import Document
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """
+    文件内容的SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(source: str, chunks: List[Document]) -> List[str]:
+    """
+    片段ID：由来源文件和片段内容决定，文件修改后内容未变的片段ID不变；同一文件中重复的片段加序号区分
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        base = hashlib.sha256(f"{source}\n{chunk.page_content}".encode("utf-8")).hexdigest()[:32]
+        count = seen.get(base, 0)
+        seen[base] = count + 1
+        ids.append(base if count == 0 else f"{base}-{count}")
+    return ids
+
+
+class DocumentManifest:
+    """文档清单：记录已索引文件的路径、修改时间、大小、内容哈希和片段ID，保存为JSON"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        :param path: 清单文件路径（通常在向量存储目录中）
+        """
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("documents", {})
+
+    def save(self) -> None:
+        """
+        先写临时文件再替换，中途出错不会留下损坏的清单
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "documents": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(temp, self.path)
+
+    def get(self, source: str) -> Optional[dict]:
+        return self.entries.get(source)
+
+    def set(self, source: str, entry: dict) -> None:
+        self.entries[source] = entry
+
+    def remove(self, source: str) -> Optional[dict]:
+        return self.entries.pop(source, None)
+
+    def sources(self) -> List[str]:
+        return list(self.entries)
+
+
+class IncrementalIndexer:
+    """增量索引：按文档清单对比文件，只向向量存储添加新片段、删除失效片段
+
+    文件的修改时间和大小都未变时视为未修改（不读取内容）；否则比较内容哈希，
+    内容变化时重新切分，按片段ID求差集，未变的片段保留在存储中不重新计算向量。
+    """
+
+    def __init__(self,
+                 manifest: DocumentManifest,
+                 load_chunks: Callable[[str], List[Document]],
+                 add: Callable[[List[Document], List[str]], None],
+                 delete: Callable[[List[str]], None],
+                 persist: Callable[[], None]):
+        """
+        :param manifest: 文档清单
+        :param load_chunks: 文件路径 -> 切分后的片段
+        :param add: 向存储添加片段 (片段, 片段ID)
+        :param delete: 按片段ID从存储删除
+        :param persist: 保存存储
+        """
+        self.manifest = manifest
+        self.load_chunks = load_chunks
+        self.add = add
+        self.delete = delete
+        self.persist = persist
+
+    @staticmethod
+    def _source(path: Union[str, Path]) -> str:
+        return str(Path(path).resolve())
+
+    def _apply(self, to_index: Iterable[str], to_remove: Iterable[str], force: bool = False) -> dict:
+        """
+        执行变更并保存存储和清单
+        :param to_index: 需要添加或检查更新的文件
+        :param to_remove: 需要移除的文件
+        :param force: 不比较修改时间和哈希，强制重新切分
+        :return: 变更摘要
+        """
+        report = {"added": [], "updated": [], "removed": [], "unchanged": [],
+                  "chunks_added": 0, "chunks_removed": 0, "chunks_kept": 0}
+        new_documents: List[Document] = []
+        new_ids: List[str] = []
+        stale_ids: List[str] = []
+        # 清单的变更在存储更新成功后才写入，中途出错时清单与存储保持一致
+        staged: Dict[str, dict] = {}
+
+        for source in to_remove:
+            entry = self.manifest.get(source)
+            if entry is not None:
+                stale_ids.extend(entry["chunk_ids"])
+                report["removed"].append(source)
+
+        for source in dict.fromkeys(to_index):
+            stat = os.stat(source)
+            entry = self.manifest.get(source)
+            if entry is not None and not force:
+                if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    report["unchanged"].append(source)
+                    continue
+                digest = file_digest(source)
+                if digest == entry["sha256"]:
+                    # 只有修改时间变化（如重新保存），内容相同
+                    staged[source] = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                    report["unchanged"].append(source)
+                    continue
+            else:
+                digest = file_digest(source)
+
+            chunks = self.load_chunks(source)
+            ids = chunk_ids(source, chunks)
+            old_ids = set(entry["chunk_ids"]) if entry is not None else set()
+            for chunk, chunk_id in zip(chunks, ids):
+                if chunk_id not in old_ids:
+                    new_documents.append(chunk)
+                    new_ids.append(chunk_id)
+            current = set(ids)
+            stale_ids.extend(chunk_id for chunk_id in old_ids if chunk_id not in current)
+            report["chunks_kept"] += len(old_ids & current)
+            report["updated" if entry is not None else "added"].append(source)
+            staged[source] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest,
+                "chunk_ids": ids,
+            }
+
+        # 先删除再添加，存储中不会同时存在同一文件的新旧版本片段
+        if stale_ids:
+            self.delete(stale_ids)
+        if new_documents:
+            self.add(new_documents, new_ids)
+        if stale_ids or new_documents:
+            self.persist()
+        for source in report["removed"]:
+            self.manifest.remove(source)
+        for source, entry in staged.items():
+            self.manifest.set(source, entry)
+        self.manifest.save()
+        report["chunks_added"] = len(new_ids)
+        report["chunks_removed"] = len(stale_ids)
+        return report
+
+    def rebuild(self, documents: List[Document]) -> dict:
+        """
+        用已切分的片段重建（完整创建存储时）：片段按metadata中的来源文件分组并分配片段ID后一次写入，
+        清单替换为这些文件。调用前存储应已清空；来源不是现有文件的片段同样按ID写入，但不记入清单
+        :param documents: 切分后的片段
+        :return: 变更摘要
+        """
+        groups: Dict[str, List[Document]] = {}
+        for document in documents:
+            source = str(document.metadata.get("source", ""))
+            if source and os.path.isfile(source):
+                source = self._source(source)
+            groups.setdefault(source, []).append(document)
+
+        ordered: List[Document] = []
+        ids: List[str] = []
+        entries: Dict[str, dict] = {}
+        for source, chunks in groups.items():
+            group_ids = chunk_ids(source, chunks)
+            ordered.extend(chunks)
+            ids.extend(group_ids)
+            if source and os.path.isfile(source):
+                stat = os.stat(source)
+                entries[source] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sha256": file_digest(source),
+                    "chunk_ids": group_ids,
+                }
+
+        if ordered:
+            self.add(ordered, ids)
+        self.persist()
+        self.manifest.entries = entries
+        self.manifest.save()
+        return {"added": list(entries), "updated": [], "removed": [], "unchanged": [],
+                "chunks_added": len(ids), "chunks_removed": 0, "chunks_kept": 0}
+
+    def add_documents(self, file_paths: Iterable[Union[str, Path]]) -> dict:
+        """
+        添加文件，已索引的文件有修改时按更新处理
+        :param file_paths: 文件路径
+        :return: 变更摘要
+        """
+        sources = []
+        for path in file_paths:
+            if not Path(path).exists():
+                raise FileNotFoundError(f"文件不存在：{path}")
+            sources.append(self._source(path))
+        return self._apply(sources, [])
+
+    def update_documents(self,
+                         file_paths: Optional[Iterable[Union[str, Path]]] = None,
+                         force: bool = False) -> dict:
+        """
+        更新文件：只重新索引内容变化的文件，文件已被删除时移除其片段
+        :param file_paths: 文件路径，为None时检查清单中的所有文件
+        :param force: 强制重新切分（如更换了分割器参数）
+        :return: 变更摘要
+        """
+        sources = [self._source(path) for path in file_paths] if file_paths is not None \
+            else self.manifest.sources()
+        existing = [source for source in sources if os.path.exists(source)]
+        missing = [source for source in sources if not os.path.exists(source)]
+        return self._apply(existing, missing, force=force)
+
+    def remove_documents(self, file_paths: Iterable[Union[str, Path]]) -> dict:
+        """
+        移除文件的所有片段
+        :param file_paths: 文件路径（文件本身可以已不存在）
+        :return: 变更摘要
+        """
+        return self._apply([], [self._source(path) for path in file_paths])
+
+    def sync(self,
+             directory: Union[str, Path],
+             extensions: Iterable[str],
+             recursive: bool = True) -> dict:
+        """
+        与目录同步：添加新文件、更新修改过的文件、移除已删除的文件（仅限该目录下清单中的文件）
+        :param directory: 文档目录
+        :param extensions: 需要索引的文件扩展名（如 ".pdf"）
+        :param recursive: 是否包含子目录
+        :return: 变更摘要
+        """
+        root = Path(directory).resolve()
+        if not root.is_dir():
+            raise FileNotFoundError(f"目录不存在：{directory}")
+        extensions = {extension.lower() for extension in extensions}
+        pattern = "**/*" if recursive else "*"
+        present = sorted(
+            str(path) for path in root.glob(pattern)
+            if path.is_file() and path.suffix.lower() in extensions
+        )
+        present_set = set(present)
+        prefix = str(root) + os.sep
+        removed = [
+            source for source in self.manifest.sources()
+            if source.startswith(prefix) and source not in present_set
+            and (recursive or os.path.dirname(source) == str(root))
+        ]
+        return self._apply(present, removed)
@@ -1,75 +1,116 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Iterable, Union
 import os
 from pathlib import Path
 from langchain.vectorstores import Chroma, FAISS
 from langchain.embeddings.base import Embeddings
-from langchain.embeddings import (
-    HuggingFaceEmbeddings,
-    OpenAIEmbeddings,
-    CohereEmbeddings
-)
 from langchain.schema import Document
+try:
+    from .document_loaders import DocumentProcessor
+    from .embedding_cache import DEFAULT_CACHE_DIRECTORY, CachedEmbeddings, get_shared_cache
+    from .embeddings import registry
+    from .manifest import MANIFEST_FILE, DocumentManifest, IncrementalIndexer
+except ImportError:
+    # 在local_knowledge_base目录中直接运行示例脚本时
+    from document_loaders import DocumentProcessor
+    from embedding_cache import DEFAULT_CACHE_DIRECTORY, CachedEmbeddings, get_shared_cache
+    from embeddings import registry
+    from manifest import MANIFEST_FILE, DocumentManifest, IncrementalIndexer
 
 class VectorStoreManager:
     """向量存储管理器：支持多种向量存储和嵌入模型"""
     
-    def __init__(self, persist_directory: str = "./vector_store"):
+    def __init__(self,
+                 persist_directory: str = "./vector_store",
+                 cache_directory: Optional[str] = DEFAULT_CACHE_DIRECTORY):
+        """
+        :param persist_directory: 向量存储目录
+        :param cache_directory: 嵌入缓存目录（多个存储可共用），默认为用户缓存目录，为None时不缓存
+        """
         self.persist_directory = persist_directory
+        self.embedding_cache = get_shared_cache(cache_directory) if cache_directory else None
         self._embeddings = None
         self._vector_store = None
+        self._store_type = None
+        self._manifest = None
         
     def get_embeddings(self, embedding_type: str = "huggingface", **kwargs) -> Embeddings:
         """
-        获取嵌入模型
+        获取嵌入模型：只创建请求的类型，同一(类型, 模型名, 设备)在进程内只加载一次
         :param embedding_type: 嵌入模型类型 ("huggingface", "openai", "cohere")
-        :param kwargs: 模型参数
-        """
-        embeddings = {
-            "huggingface": HuggingFaceEmbeddings(
-                model_name=kwargs.get("model_name", "sentence-transformers/all-MiniLM-L6-v2")
-            ),
-            "openai": OpenAIEmbeddings(
-                api_key=kwargs.get("api_key"),
-            ),
-            "cohere": CohereEmbeddings(
-                api_key=kwargs.get("api_key"),
-            )
-        }
-        return embeddings.get(embedding_type, embeddings["huggingface"])
+        :param kwargs: 模型参数（model_name、device、api_key）
+        """
+        return registry.get(
+            embedding_type,
+            model_name=kwargs.get("model_name"),
+            device=kwargs.get("device"),
+            api_key=kwargs.get("api_key")
+        )
+
+    @staticmethod
+    def embedding_stats() -> Dict[str, dict]:
+        """
+        已加载嵌入模型的加载耗时和复用次数
+        """
+        return registry.stats()
+
+    def _store_embeddings(self, embedding_type: str, **kwargs) -> Embeddings:
+        """
+        向量存储使用的嵌入模型：启用缓存时文档片段先查磁盘缓存，只计算内容变化的片段
+        """
+        embeddings = self.get_embeddings(embedding_type, **kwargs)
+        if self.embedding_cache is None:
+            return embeddings
+        model_id = registry.model_id(embedding_type, kwargs.get("model_name"))
+        return CachedEmbeddings(embeddings, self.embedding_cache, model_id)
+
+    def embedding_cache_stats(self) -> Dict[str, Any]:
+        """
+        嵌入缓存统计：本存储（最近一次创建或加载以来）的命中率，以及共享缓存的总体情况
+        """
+        if self.embedding_cache is None:
+            return {}
+        store = self._embeddings.stats() if isinstance(self._embeddings, CachedEmbeddings) else {}
+        return {"store": store, "cache": self.embedding_cache.stats()}
         
     def create_vector_store(self,
                           documents: List[Document],
                           store_type: str = "chroma",
                           embedding_type: str = "huggingface",
-                          **kwargs) -> None:
+                          **kwargs) -> Dict[str, Any]:
         """
-        创建向量存储
+        创建向量存储（替换目录中已有的存储），片段按来源文件记入文档清单，之后可增量更新或移除
         :param documents: 文档列表
         :param store_type: 存储类型 ("chroma", "faiss")
         :param embedding_type: 嵌入模型类型
         :param kwargs: 额外参数
+        :return: 变更摘要（启用嵌入缓存时包括本次的缓存命中情况）
         """
+        if store_type not in ("chroma", "faiss"):
+            raise ValueError(f"不支持的存储类型：{store_type}")
+
         # 获取嵌入模型
-        self._embeddings = self.get_embeddings(embedding_type, **kwargs)
+        self._embeddings = self._store_embeddings(embedding_type, **kwargs)
         
         # 确保存储目录存在
         os.makedirs(self.persist_directory, exist_ok=True)
         
-        # 创建向量存储
+        # 清空已有的存储：Chroma.from_documents会追加到已持久化的集合中，旧片段不在清单里就再也无法删除
+        self._store_type = store_type
         if store_type == "chroma":
-            self._vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self._embeddings,
-                persist_directory=self.persist_directory
-            )
-            self._vector_store.persist()
-        elif store_type == "faiss":
-            self._vector_store = FAISS.from_documents(
-                documents=documents,
-                embedding=self._embeddings
+            Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self._embeddings
+            ).delete_collection()
+            self._vector_store = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self._embeddings
             )
-            # 保存FAISS索引
-            self._vector_store.save_local(self.persist_directory)
+        else:
+            # 第一次写入片段时创建新的FAISS索引并覆盖保存
+            self._vector_store = None
+
+        self._manifest = DocumentManifest(os.path.join(self.persist_directory, MANIFEST_FILE))
+        return self._with_cache_stats(lambda: self._indexer().rebuild(documents))
             
     def load_vector_store(self,
                          store_type: str = "chroma",
@@ -85,9 +126,10 @@ class VectorStoreManager:
             raise FileNotFoundError(f"向量存储目录不存在：{self.persist_directory}")
             
         # 获取嵌入模型
-        self._embeddings = self.get_embeddings(embedding_type, **kwargs)
+        self._embeddings = self._store_embeddings(embedding_type, **kwargs)
         
         # 加载向量存储
+        self._store_type = store_type
         if store_type == "chroma":
             self._vector_store = Chroma(
                 persist_directory=self.persist_directory,
@@ -131,4 +173,137 @@ class VectorStoreManager:
         """
         获取相关文档（别名方法）
         """
-        return self.similarity_search(query, **kwargs) 
\ No newline at end of file
+        return self.similarity_search(query, **kwargs)
+
+    def _with_cache_stats(self, run: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        执行一次创建或增量更新，启用嵌入缓存时在变更摘要中加上本次的缓存命中情况
+        （"embedding_cache": hits为命中缓存的片段，misses为由模型计算的片段）
+        """
+        before = self._embeddings.stats() if isinstance(self._embeddings, CachedEmbeddings) else None
+        report = run()
+        if before is not None:
+            report["embedding_cache"] = self._embeddings.stats(since=before)
+        return report
+
+    def _incremental(self,
+                     store_type: str,
+                     embedding_type: str,
+                     splitter_type: str,
+                     **kwargs) -> IncrementalIndexer:
+        """
+        增量索引器：尚未创建或加载存储时加载目录中已有的存储（不存在时新建）
+        """
+        if self._vector_store is None:
+            if store_type not in ("chroma", "faiss"):
+                raise ValueError(f"不支持的存储类型：{store_type}")
+            os.makedirs(self.persist_directory, exist_ok=True)
+            if store_type == "faiss" and not os.path.exists(os.path.join(self.persist_directory, "index.faiss")):
+                # 无法创建空的FAISS索引，第一次添加片段时再创建
+                self._embeddings = self._store_embeddings(embedding_type, **kwargs)
+                self._store_type = store_type
+            else:
+                self.load_vector_store(store_type, embedding_type, **kwargs)
+        if self._manifest is None:
+            self._manifest = DocumentManifest(os.path.join(self.persist_directory, MANIFEST_FILE))
+        return self._indexer(splitter_type, **kwargs)
+
+    def _indexer(self, splitter_type: str = "recursive", **kwargs) -> IncrementalIndexer:
+        processor = DocumentProcessor()
+        return IncrementalIndexer(
+            self._manifest,
+            load_chunks=lambda path: processor.process_document(path, splitter_type, **kwargs),
+            add=self._add_chunks,
+            delete=self._delete_chunks,
+            persist=self._persist
+        )
+
+    def _add_chunks(self, documents: List[Document], ids: List[str]) -> None:
+        if self._vector_store is None:
+            self._vector_store = FAISS.from_documents(documents, self._embeddings, ids=ids)
+        else:
+            self._vector_store.add_documents(documents, ids=ids)
+
+    def _delete_chunks(self, ids: List[str]) -> None:
+        if self._vector_store is not None:
+            self._vector_store.delete(ids=ids)
+
+    def _persist(self) -> None:
+        if self._vector_store is None:
+            return
+        if self._store_type == "faiss":
+            self._vector_store.save_local(self.persist_directory)
+        else:
+            self._vector_store.persist()
+
+    def add_documents(self,
+                      file_paths: Iterable[Union[str, Path]],
+                      store_type: str = "chroma",
+                      embedding_type: str = "huggingface",
+                      splitter_type: str = "recursive",
+                      **kwargs) -> Dict[str, Any]:
+        """
+        添加文件：加载、切分并只写入新的片段，已添加且未修改的文件跳过
+        :param file_paths: 文件路径
+        :param store_type: 存储类型（已创建或加载存储时使用该存储）
+        :param embedding_type: 嵌入模型类型
+        :param splitter_type: 分割器类型
+        :param kwargs: 嵌入模型和分割器参数
+        :return: 变更摘要（添加/更新/移除的文件和片段数）
+        """
+        indexer = self._incremental(store_type, embedding_type, splitter_type, **kwargs)
+        return self._with_cache_stats(lambda: indexer.add_documents(file_paths))
+
+    def update_documents(self,
+                         file_paths: Optional[Iterable[Union[str, Path]]] = None,
+                         store_type: str = "chroma",
+                         embedding_type: str = "huggingface",
+                         splitter_type: str = "recursive",
+                         force: bool = False,
+                         **kwargs) -> Dict[str, Any]:
+        """
+        更新文件：只重新切分内容变化的文件，删除失效的片段并写入新片段，内容未变的片段保留
+        :param file_paths: 文件路径，为None时检查清单中的所有文件
+        :param store_type: 存储类型
+        :param embedding_type: 嵌入模型类型
+        :param splitter_type: 分割器类型
+        :param force: 强制重新切分所有指定文件（如更换了分割器参数）
+        :param kwargs: 嵌入模型和分割器参数
+        :return: 变更摘要
+        """
+        indexer = self._incremental(store_type, embedding_type, splitter_type, **kwargs)
+        return self._with_cache_stats(lambda: indexer.update_documents(file_paths, force=force))
+
+    def remove_documents(self,
+                         file_paths: Iterable[Union[str, Path]],
+                         store_type: str = "chroma",
+                         embedding_type: str = "huggingface",
+                         **kwargs) -> Dict[str, Any]:
+        """
+        移除文件的所有片段
+        :param file_paths: 文件路径（文件本身可以已不存在）
+        :param store_type: 存储类型
+        :param embedding_type: 嵌入模型类型
+        :return: 变更摘要
+        """
+        return self._incremental(store_type, embedding_type, "recursive", **kwargs).remove_documents(file_paths)
+
+    def sync(self,
+             directory: Union[str, Path],
+             store_type: str = "chroma",
+             embedding_type: str = "huggingface",
+             splitter_type: str = "recursive",
+             recursive: bool = True,
+             **kwargs) -> Dict[str, Any]:
+        """
+        与文档目录同步：计算与清单的差异，只添加新文件、更新修改过的文件、移除已删除的文件
+        :param directory: 文档目录
+        :param store_type: 存储类型
+        :param embedding_type: 嵌入模型类型
+        :param splitter_type: 分割器类型
+        :param recursive: 是否包含子目录
+        :param kwargs: 嵌入模型和分割器参数
+        :return: 变更摘要
+        """
+        indexer = self._incremental(store_type, embedding_type, splitter_type, **kwargs)
+        return self._with_cache_stats(lambda: indexer.sync(directory, DocumentProcessor().loaders.keys(), recursive))
@@ -0,0 +1,108 @@
+"""
+音频回调微基准：对比旧回调（copy + 电平计算 + Queue.put）与环形缓冲区写入的耗时，
+并在消费者跟不上时统计环形缓冲区的溢出
+
+运行方式（在仓库根目录）：
+    python -m speech2text.benchmarks.bench_audio_callback --sample-rate 48000 --channels 2
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+
+from speech2text.src.audio.ring_buffer import AudioRingBuffer
+
+
+def _percentiles(samples: list) -> str:
+    values = np.array(samples) * 1e6
+    return f"p50 {np.percentile(values, 50):6.1f}µs  p99 {np.percentile(values, 99):6.1f}µs  max {values.max():7.1f}µs"
+
+
+def _run_queue(block: np.ndarray, count: int, interval: float) -> list:
+    """旧回调：每块分配副本、计算电平、回调并放入队列，同时有消费者线程取数据"""
+    audio_queue = queue.Queue()
+    levels = []
+    stop = threading.Event()
+
+    def consume():
+        while not stop.is_set():
+            try:
+                audio_queue.get(timeout=0.05)
+            except queue.Empty:
+                pass
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        if np.any(block):
+            levels.append(np.abs(block).mean())
+        audio_queue.put(block.copy())
+        timings.append(time.perf_counter() - start)
+        time.sleep(interval)
+    stop.set()
+    consumer.join()
+    return timings
+
+
+def _run_ring(block: np.ndarray, count: int, interval: float, duration: float, sample_rate: int) -> tuple:
+    """新回调：只把数据拷贝进环形缓冲区，消费者轮询读取并计算电平"""
+    ring = AudioRingBuffer.for_duration(duration, sample_rate, block.shape[1])
+    stop = threading.Event()
+
+    def consume():
+        while not stop.is_set():
+            data = ring.wait_read(len(block), timeout=0.05)
+            if data is not None and np.any(data):
+                np.abs(data).mean()
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        ring.write(block)
+        timings.append(time.perf_counter() - start)
+        time.sleep(interval)
+    stop.set()
+    consumer.join()
+    return timings, ring.overflows
+
+
+def _overflow_demo(block: np.ndarray, duration: float, sample_rate: int, stall: float) -> tuple:
+    """消费者暂停stall秒时，按实时节奏写入的环形缓冲区丢弃的块数和帧数"""
+    ring = AudioRingBuffer.for_duration(duration, sample_rate, block.shape[1])
+    blocks = int(stall * sample_rate / len(block))
+    for _ in range(blocks):
+        ring.write(block)
+    return ring.overflows, ring.dropped_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频回调开销基准")
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--chunk-duration", type=float, default=0.1)
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--interval", type=float, default=0.001, help="两次回调之间的间隔（秒），模拟加速的实时节奏")
+    parser.add_argument("--ring-duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    block = (rng.standard_normal((int(args.sample_rate * args.chunk_duration), args.channels)) * 0.1).astype(np.float32)
+
+    print(f"块大小: {len(block)}帧 × {args.channels}声道, 共{args.blocks}块")
+    print(f"queue: {_percentiles(_run_queue(block, args.blocks, args.interval))}")
+    timings, overflows = _run_ring(block, args.blocks, args.interval, args.ring_duration, args.sample_rate)
+    print(f"ring:  {_percentiles(timings)}  溢出 {overflows}块")
+    for stall in (2.0, args.ring_duration + 2.0):
+        overflows, dropped = _overflow_demo(block, args.ring_duration, args.sample_rate, stall)
+        print(f"消费者暂停{stall:.0f}秒: 溢出{overflows}块, 丢弃{dropped / args.sample_rate:.1f}秒音频")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+HTTP连接基准：用本地HTTPS桩服务器测量连接复用率、握手耗时和首个问题的请求耗时，
+对比每次新建客户端、共享连接池和共享连接池+预热
+
+运行方式（在仓库根目录，需要openssl命令生成自签名证书）：
+    python -m speech2text.benchmarks.bench_http_transport --utterances 10 --rtt 0.05
+"""
+
+import argparse
+import tempfile
+import time
+
+from openai import OpenAI
+
+from speech2text.benchmarks.stub_server import StubConfig, make_certificate, start_stub_server
+from speech2text.src.config.settings import HTTP_SETTINGS
+from speech2text.src.utils.http_transport import TransportStats, create_http_client, warm_up
+
+
+def _make_client(base_url: str, stats: TransportStats) -> OpenAI:
+    return OpenAI(
+        api_key="benchmark",
+        base_url=base_url,
+        max_retries=0,
+        http_client=create_http_client(HTTP_SETTINGS, stats, verify=False)
+    )
+
+
+def _utterance(client: OpenAI):
+    """一次问答：上传转写后流式请求回答"""
+    client.audio.transcriptions.create(model="whisper-1", file=("segment.flac", b"0" * 32000))
+    for _ in client.chat.completions.create(
+        model="stub", messages=[{"role": "user", "content": "问题"}], stream=True
+    ):
+        pass
+
+
+def _run(base_url: str, utterances: int, mode: str) -> dict:
+    stats = TransportStats()
+    timings = []
+    client = None if mode == "per_request" else _make_client(base_url, stats)
+    if mode == "warm":
+        warm_up(client)
+    for _ in range(utterances):
+        if mode == "per_request":
+            client = _make_client(base_url, stats)
+        start = time.perf_counter()
+        _utterance(client)
+        timings.append(time.perf_counter() - start)
+        if mode == "per_request":
+            client.close()
+    result = stats.stats()
+    result["first_ms"] = timings[0] * 1000
+    result["avg_ms"] = sum(timings) / len(timings) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP连接复用和预热基准")
+    parser.add_argument("--utterances", type=int, default=10)
+    parser.add_argument("--rtt", type=float, default=0.05, help="模拟的网络往返时间（秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # 只测连接开销：接口本身不等待，回答4个token
+        config = StubConfig(transcribe_latency=0, first_token_latency=0, token_rate=0,
+                            answer_tokens=4, handshake_rtt=args.rtt)
+        server = start_stub_server(config, certificate=make_certificate(directory))
+        base_url = server.base_url
+
+        print(f"{args.utterances}次问答（每次转写+流式回答），模拟往返{args.rtt * 1000:.0f}ms")
+        for name, mode in (("每次新建客户端", "per_request"), ("共享连接池", "shared"), ("共享连接池+预热", "warm")):
+            r = _run(base_url, args.utterances, mode)
+            print(
+                f"{name:<10} 请求 {r['requests']:3d}  新建连接 {r['new_connections']:3d}  复用率 {r['reuse_rate']:.0%}  "
+                f"TLS握手 {r['avg_tls_ms']:6.1f}ms  首次问答 {r['first_ms']:6.1f}ms  平均 {r['avg_ms']:6.1f}ms"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
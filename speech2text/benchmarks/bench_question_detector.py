@@ -0,0 +1,132 @@
+"""
+问题检测基准：在标注语料上比较旧的关键词扫描与编译后的加权检测器的精确率、召回率和每次调用耗时
+
+语料为TSV（split<TAB>label<TAB>text，label为1表示问题），默认使用benchmarks/data/questions.tsv。
+split为tune的样本用于调整QUESTION_DETECTOR_SETTINGS的权重，test的样本不参与调整，
+两部分分别报告；检测器的实际效果以test为准。没有split列的语料整体视为test。
+
+检测器并不比旧实现快：旧实现只做25次子串查找（11个关键词加14个补充词，首个命中即返回），
+检测器覆盖合并后的完整词表（约160个词，含英文疑问词，并匹配全角写法），每次调用约为旧实现的1.5倍
+（单核机器上约3.0µs对约2.0µs）。检测器换来的是精确率；与逐个扫描完整词表相比，
+编译后的正则耗时基本不随词表增长。
+
+运行方式（在仓库根目录）：
+    python -m speech2text.benchmarks.bench_question_detector
+    python -m speech2text.benchmarks.bench_question_detector my_corpus.tsv --errors
+"""
+
+import argparse
+import csv
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from speech2text.src.config.settings import QUESTION_DETECTOR_SETTINGS, QUESTION_KEYWORDS
+from speech2text.src.llm.question_detector import QuestionDetector
+from speech2text.src.utils.text_normalize import fold_width
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "questions.tsv"
+
+# 旧实现中audio_processor模块内的关键词表
+LEGACY_KEYWORDS = ['吗', '?', '？', '什么', '为什么', '如何', '怎么', '哪里', '谁', '何时', '是否']
+
+# 旧的AudioProcessor.is_question中补充的关键词
+LEGACY_EXTRA_KEYWORDS = [
+    "请", "能否", "可以", "怎样", "多少", "几个", "是不是",
+    "有没有", "为啥", "咋", "有何", "哪些", "啥时", "干嘛"
+]
+
+SPLIT_NAMES = {"tune": "调参集", "test": "留出集"}
+
+
+def legacy_is_question(text: str) -> bool:
+    """旧的AudioProcessor.is_question：每次调用拼接关键词表，首个命中即返回"""
+    if "?" in text or "？" in text:
+        return True
+    question_keywords = LEGACY_KEYWORDS + LEGACY_EXTRA_KEYWORDS
+    if any(keyword in text for keyword in question_keywords):
+        return True
+    if text.strip().startswith("请") and len(text) > 2:
+        return True
+    if len(text) > 15:
+        return False
+    if len(text) <= 15 and not text.endswith(("。", "！", "~", "…")):
+        return True
+    return False
+
+
+def settings_scan_is_question(text: str) -> bool:
+    """逐个扫描settings中的完整关键词表（约120个词），首个命中即返回"""
+    return any(keyword in text for keyword in QUESTION_KEYWORDS)
+
+
+def load_corpus(path: Path) -> Dict[str, List[Tuple[str, bool]]]:
+    """按split分组的语料：split -> [(文本, 是否问题)]"""
+    splits: Dict[str, List[Tuple[str, bool]]] = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            splits.setdefault(row.get("split") or "test", []).append((row["text"], row["label"] == "1"))
+    return splits
+
+
+def evaluate(detect: Callable[[str], bool], corpus: List[Tuple[str, bool]], repeat: int) -> dict:
+    predictions = [detect(text) for text, _ in corpus]
+    tp = sum(p and label for p, (_, label) in zip(predictions, corpus))
+    fp = sum(p and not label for p, (_, label) in zip(predictions, corpus))
+    fn = sum(not p and label for p, (_, label) in zip(predictions, corpus))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    texts = [text for text, _ in corpus]
+    # 取最快的一遍，减少其他进程对计时的干扰
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            detect(text)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "us_per_call": elapsed / len(texts) * 1e6 if repeat and texts else 0.0,
+        "errors": [(text, label) for p, (text, label) in zip(predictions, corpus) if p != label],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="问题检测精确率/召回率和耗时基准")
+    parser.add_argument("corpus", nargs="?", default=str(DEFAULT_CORPUS), help="标注语料TSV")
+    parser.add_argument("--repeat", type=int, default=200, help="计时时重复整个语料的次数（取最快的一遍）")
+    parser.add_argument("--errors", action="store_true", help="列出检测器判断错误的样本及命中的规则")
+    args = parser.parse_args()
+
+    splits = load_corpus(Path(args.corpus))
+    corpus = [sample for samples in splits.values() for sample in samples]
+    start = time.perf_counter()
+    detector = QuestionDetector.from_settings(QUESTION_DETECTOR_SETTINGS, QUESTION_KEYWORDS)
+    build_ms = (time.perf_counter() - start) * 1000
+    for split, samples in splits.items():
+        positives = sum(label for _, label in samples)
+        print(f"{SPLIT_NAMES.get(split, split)}: {len(samples)}条（问题{positives}，非问题{len(samples) - positives}）")
+    print(f"检测器构建 {build_ms:.2f}ms，合并后关键词 {sum(word == fold_width(word) for word in detector.weights)}个；"
+          f"旧实现只查找{len(LEGACY_KEYWORDS) + len(LEGACY_EXTRA_KEYWORDS)}个")
+
+    for name, detect in (
+        ("旧实现", legacy_is_question),
+        ("完整词表扫描", settings_scan_is_question),
+        ("编译检测器", detector.is_question),
+    ):
+        # 耗时在全部语料上测量，精确率和召回率按split分别报告
+        us_per_call = evaluate(detect, corpus, args.repeat)["us_per_call"]
+        print(f"{name}（{us_per_call:.2f}µs/次）")
+        for split, samples in splits.items():
+            r = evaluate(detect, samples, 0)
+            print(f"  {SPLIT_NAMES.get(split, split):<6} 精确率 {r['precision']:6.1%}  召回率 {r['recall']:6.1%}  "
+                  f"F1 {r['f1']:.3f}  错误 {len(r['errors'])}")
+            if args.errors and detect == detector.is_question:
+                for text, label in r["errors"]:
+                    print(f"    [{'问题' if label else '非问题'}] {text}  "
+                          f"得分 {detector.score(text):.2f}  {detector.matches(text)}")
+
+if __name__ == "__main__":
+    main()
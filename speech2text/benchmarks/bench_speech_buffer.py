@@ -0,0 +1,107 @@
+"""
+语音缓冲区微基准：对比list.extend累积与预分配SpeechBuffer的追加开销和峰值内存
+
+运行方式（在仓库根目录）：
+    python -m speech2text.benchmarks.bench_speech_buffer --duration 30 --sample-rate 48000
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import time
+
+import numpy as np
+
+from speech2text.src.audio.speech_buffer import SpeechBuffer
+
+
+def _peak_rss_mb() -> float:
+    """返回当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux返回KB，macOS返回字节
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def _make_blocks(duration: float, sample_rate: int, chunk_duration: float) -> list:
+    """生成合成音频块，模拟回调送入队列的单声道数据"""
+    block_size = int(sample_rate * chunk_duration)
+    count = int(duration / chunk_duration)
+    rng = np.random.default_rng(0)
+    return [rng.standard_normal(block_size).astype(np.float32) * 0.1 for _ in range(count)]
+
+
+def _run_list(blocks: list) -> tuple:
+    """旧路径：list.extend累积，片段结束时np.array"""
+    speech_buffer = []
+    start = time.perf_counter()
+    for block in blocks:
+        speech_buffer.extend(block)
+    append_time = time.perf_counter() - start
+    start = time.perf_counter()
+    segment = np.array(speech_buffer)
+    finalize_time = time.perf_counter() - start
+    return append_time, finalize_time, len(segment)
+
+
+def _run_arena(blocks: list, capacity: int) -> tuple:
+    """新路径：预分配float32缓冲区，片段结束时取视图"""
+    speech_buffer = SpeechBuffer(capacity)
+    start = time.perf_counter()
+    for block in blocks:
+        speech_buffer.append(block)
+    append_time = time.perf_counter() - start
+    start = time.perf_counter()
+    segment = speech_buffer.view()
+    finalize_time = time.perf_counter() - start
+    return append_time, finalize_time, len(segment)
+
+
+def _worker(mode: str, args: argparse.Namespace, result_queue):
+    """在独立进程中运行一种路径，保证峰值内存互不干扰"""
+    blocks = _make_blocks(args.duration, args.sample_rate, args.chunk_duration)
+    baseline = _peak_rss_mb()
+    if mode == "list":
+        append_time, finalize_time, samples = _run_list(blocks)
+    else:
+        capacity = int(args.duration * args.sample_rate)
+        append_time, finalize_time, samples = _run_arena(blocks, capacity)
+    result_queue.put({
+        "mode": mode,
+        "blocks": len(blocks),
+        "samples": samples,
+        "append_us_per_block": append_time / len(blocks) * 1e6,
+        "finalize_ms": finalize_time * 1e3,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_delta_mb": _peak_rss_mb() - baseline,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音缓冲区微基准")
+    parser.add_argument("--duration", type=float, default=30.0, help="片段时长（秒）")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="采样率")
+    parser.add_argument("--chunk-duration", type=float, default=0.1, help="音频块时长（秒）")
+    args = parser.parse_args()
+
+    print(f"片段: {args.duration}s @ {args.sample_rate}Hz, 块时长 {args.chunk_duration}s")
+    print(f"{'路径':<8}{'块数':>8}{'追加(µs/块)':>14}{'收尾(ms)':>12}{'峰值RSS(MB)':>14}{'增量(MB)':>12}")
+
+    ctx = mp.get_context("spawn")
+    for mode in ("list", "arena"):
+        result_queue = ctx.Queue()
+        process = ctx.Process(target=_worker, args=(mode, args, result_queue))
+        process.start()
+        result = result_queue.get()
+        process.join()
+        print(f"{result['mode']:<8}{result['blocks']:>8}{result['append_us_per_block']:>14.1f}"
+              f"{result['finalize_ms']:>12.2f}{result['peak_rss_mb']:>14.1f}{result['peak_rss_delta_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+流式输出基准：用模拟的流式响应测量回答从第一个token到最后一条界面消息的吞吐量，
+对比旧的逐token回调加sleep(0.01)与合并输出
+
+运行方式（在仓库根目录）：
+    python -m speech2text.benchmarks.bench_stream --tokens 500 --token-interval 0.005
+"""
+
+import argparse
+import os
+import time
+from types import SimpleNamespace
+
+from speech2text.src.config.settings import ANSWER_CACHE_SETTINGS, LATENCY_SETTINGS
+
+
+class MockCompletions:
+    """模拟chat.completions，按固定间隔产出token"""
+
+    def __init__(self, tokens: int, interval: float):
+        self.tokens = tokens
+        self.interval = interval
+        self.created_at = None
+
+    def _chunks(self):
+        for i in range(self.tokens):
+            if self.interval:
+                time.sleep(self.interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"字{i % 10}"))])
+
+    def create(self, **params):
+        self.created_at = time.perf_counter()
+        return self._chunks()
+
+
+class MessageSink:
+    """模拟界面回调，记录流式消息数和最后一条的时间"""
+
+    def __init__(self):
+        self.messages = 0
+        self.chars = 0
+        self.last_at = None
+
+    def __call__(self, text: str):
+        if text.startswith("<stream>") and not text.startswith("<stream>🤔") and not text.startswith("<stream>\r"):
+            self.messages += 1
+            self.chars += len(text) - 8
+            self.last_at = time.perf_counter()
+
+
+def _legacy_response(processor, question: str):
+    """旧实现：每个增量一次回调并sleep(0.01)"""
+    response = processor._open_completion(question)
+    for chunk in response:
+        content = processor._chunk_content(chunk)
+        if content:
+            processor.text_callback(f"<stream>{content}")
+            time.sleep(0.01)
+
+
+def _run(processor, completions: MockCompletions, legacy: bool) -> dict:
+    sink = MessageSink()
+    processor.text_callback = sink
+    if legacy:
+        _legacy_response(processor, "问题")
+    else:
+        processor._get_gpt_response("问题")
+    elapsed = sink.last_at - completions.created_at
+    return {
+        "elapsed": elapsed,
+        "tokens_per_s": completions.tokens / elapsed,
+        "messages": sink.messages,
+        "chars": sink.chars,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式输出吞吐量基准")
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--token-interval", type=float, default=0.005, help="模拟的token间隔（秒），0表示尽可能快")
+    args = parser.parse_args()
+
+    # 基准不需要真实接口、回答缓存和延迟统计导出
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    ANSWER_CACHE_SETTINGS['enabled'] = False
+    LATENCY_SETTINGS['enabled'] = False
+    from speech2text.src.audio.audio_processor import AudioProcessor
+
+    processor = AudioProcessor()
+    completions = MockCompletions(args.tokens, args.token_interval)
+    processor.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    print(f"{args.tokens}个token，间隔{args.token_interval * 1000:.1f}ms")
+    for name, legacy in (("逐token+sleep", True), ("合并输出", False)):
+        result = _run(processor, completions, legacy)
+        print(
+            f"{name:<12} {result['elapsed']:6.2f}s  {result['tokens_per_s']:8.0f} token/s  "
+            f"界面消息 {result['messages']:4d}条  字符 {result['chars']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
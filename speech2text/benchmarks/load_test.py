@@ -0,0 +1,208 @@
+"""
+负载测试：让N路回放音频同时经过AudioProcessor，接口由本地桩服务器提供，
+报告吞吐量、各级队列深度和端到端延迟分位数
+
+运行方式（在仓库根目录）：
+    python -m speech2text.benchmarks.load_test --streams 4 --speed 1
+    python -m speech2text.benchmarks.load_test a.wav b.wav --streams 8 --speed 2 --error-rate 0.05
+    python -m speech2text.benchmarks.load_test --base-url http://127.0.0.1:8765/v1   # 使用单独运行的桩服务器
+
+不指定音频文件时使用eval_vad生成的合成样本，多路之间循环使用这些文件。
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from speech2text.benchmarks.eval_vad import make_fixtures
+from speech2text.benchmarks.stub_server import add_config_arguments, config_from_args, start_stub_server
+from speech2text.src.audio.audio_processor import AudioProcessor
+from speech2text.src.audio.sources import FileSource
+from speech2text.src.config.settings import ANSWER_CACHE_SETTINGS, LATENCY_SETTINGS
+from speech2text.src.replay import EventWriter
+from speech2text.src.utils.latency import percentiles_of
+
+# 报告的延迟指标
+REPORT_METRICS = ("queue_wait", "close_to_transcript", "answer_wait", "close_to_first_token", "stream",
+                  "close_to_first_render")
+
+
+class Stream:
+    """一路回放：一个AudioProcessor和它的文件音频源"""
+
+    def __init__(self, index: int, path: str, speed: float):
+        self.index = index
+        self.source = FileSource(path, speed=speed)
+        self.processor = AudioProcessor()
+        self.writer = EventWriter(open(os.devnull, "w", encoding="utf-8"), self.source,
+                                  on_render=self.processor.mark_answer_rendered)
+        self.processor.text_callback = self.writer
+        self.finished = False
+        self.elapsed = 0.0
+
+    def run(self, timeout: float):
+        start = time.perf_counter()
+        try:
+            self.processor.start_recording("file", 0, source=self.source)
+            self.finished = self.processor.wait_until_idle(timeout=timeout)
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.processor.stop_recording()
+            self.writer.output.close()
+
+    def depths(self):
+        """(待转写, 待路由, 回答进行中, 回答排队)"""
+        pipeline = self.processor.pipeline
+        if pipeline is None:
+            return 0, 0, 0, 0
+        scheduler = pipeline.scheduler.stats()
+        return pipeline.segment_queue.qsize(), pipeline.result_queue.qsize(), scheduler["active"], scheduler["queued"]
+
+
+def sample_depths(streams, interval: float, stop: threading.Event) -> list:
+    """定期采样所有流的队列深度之和"""
+    samples = []
+    while not stop.wait(interval):
+        samples.append(np.sum([stream.depths() for stream in streams], axis=0))
+    return samples
+
+
+def run(args, base_url: str) -> dict:
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    # 各路播放相同的问题，回答缓存会让后面的流直接命中；也不导出每个处理器的延迟文件
+    ANSWER_CACHE_SETTINGS["enabled"] = False
+    LATENCY_SETTINGS["export_path"] = None
+
+    inputs = args.inputs
+    directory = None
+    if not inputs:
+        directory = tempfile.TemporaryDirectory()
+        make_fixtures(Path(directory.name))
+        inputs = sorted(str(path) for path in Path(directory.name).glob("*.wav"))
+
+    streams = [Stream(i, inputs[i % len(inputs)], args.speed) for i in range(args.streams)]
+    threads = [threading.Thread(target=stream.run, args=(args.timeout,), name=f"stream-{stream.index}")
+               for stream in streams]
+    stop = threading.Event()
+    depth_samples = []
+    sampler = threading.Thread(
+        target=lambda: depth_samples.extend(sample_depths(streams, args.sample_interval, stop)), daemon=True
+    )
+
+    start = time.perf_counter()
+    sampler.start()
+    for thread in threads:
+        thread.start()
+        if args.stagger:
+            time.sleep(args.stagger)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    if directory is not None:
+        directory.cleanup()
+
+    samples = {}
+    for stream in streams:
+        if stream.processor.latency:
+            for name, values in stream.processor.latency.samples().items():
+                samples.setdefault(name, []).extend(values)
+    scheduler = {}
+    limiter = {}
+    for stream in streams:
+        for key, value in stream.processor.pipeline.scheduler.stats().items():
+            if isinstance(value, int):
+                scheduler[key] = scheduler.get(key, 0) + value
+        if stream.processor.rate_limiter:
+            for endpoint, counts in stream.processor.rate_limiter.stats().items():
+                totals = limiter.setdefault(endpoint, {})
+                for key, value in counts.items():
+                    totals[key] = round(totals.get(key, 0) + value, 3)
+
+    depths = np.array(depth_samples) if depth_samples else np.zeros((1, 4))
+    audio = sum(stream.source.duration for stream in streams)
+    segments = len(samples.get("utterance", []))
+    return {
+        "streams": args.streams,
+        "speed": args.speed,
+        "wall_s": round(wall, 3),
+        "audio_s": round(audio, 3),
+        "realtime_factor": round(audio / wall, 2),
+        "segments_per_s": round(segments / wall, 2),
+        "answers_per_s": round(scheduler.get("completed", 0) / wall, 2),
+        "unfinished_streams": sum(not stream.finished for stream in streams),
+        "dropped_segments": sum(stream.processor.pipeline.dropped_segments for stream in streams),
+        "queue_depth": {
+            name: {"mean": round(float(depths[:, i].mean()), 2), "max": int(depths[:, i].max())}
+            for i, name in enumerate(("segments", "results", "answers_active", "answers_queued"))
+        },
+        "scheduler": scheduler,
+        "rate_limiter": limiter,
+        "latency_ms": {name: entry for name, entry in percentiles_of(samples).items() if name in REPORT_METRICS},
+    }
+
+
+def print_report(report: dict, server_stats: dict = None):
+    print(
+        f"{report['streams']}路 x {report['speed']:g}倍速: 墙钟 {report['wall_s']:.1f}s，音频 {report['audio_s']:.1f}s，"
+        f"吞吐 {report['realtime_factor']:.1f}x实时，片段 {report['segments_per_s']:.2f}/s，"
+        f"回答 {report['answers_per_s']:.2f}/s，丢弃片段 {report['dropped_segments']}，"
+        f"未完成 {report['unfinished_streams']}"
+    )
+    print("队列深度（所有流之和）: " + "，".join(
+        f"{name} 平均{entry['mean']:.2f}/最大{entry['max']}" for name, entry in report["queue_depth"].items()
+    ))
+    print(f"回答调度: {report['scheduler']}")
+    if report["rate_limiter"]:
+        print(f"限流统计: {report['rate_limiter']}")
+    if server_stats:
+        print(f"服务器统计: {server_stats}")
+    for name, entry in report["latency_ms"].items():
+        if entry["count"]:
+            print(f"  {name:<22} n={entry['count']:<4d} p50={entry['p50']:7.0f}ms "
+                  f"p90={entry['p90']:7.0f}ms p99={entry['p99']:7.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多路回放负载测试")
+    parser.add_argument("inputs", nargs="*", help="音频文件，多路之间循环使用；不指定时生成合成样本")
+    parser.add_argument("--streams", type=int, default=4, help="同时回放的路数")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0表示尽可能快")
+    parser.add_argument("--stagger", type=float, default=0.0, help="各路启动之间的间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=300.0, help="每路等待处理完毕的最长时间（秒）")
+    parser.add_argument("--sample-interval", type=float, default=0.1, help="队列深度采样间隔（秒）")
+    parser.add_argument("--base-url", help="使用已运行的桩服务器（或其他兼容接口），不启动内置服务器")
+    parser.add_argument("--json", help="把报告写入JSON文件")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    # 每个请求一行的HTTP日志会淹没报告
+    for name in ("httpx", "httpx2"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    server = None if args.base_url else start_stub_server(config_from_args(args))
+    try:
+        report = run(args, args.base_url or server.base_url)
+    finally:
+        if server is not None:
+            server.shutdown()
+    server_stats = server.stats.as_dict() if server is not None else None
+    if server_stats:
+        report["server"] = server_stats
+    print_report(report, server_stats)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+本地OpenAI兼容桩服务器：实现转写、流式对话、向量和模型列表接口，
+可配置延迟、token速率、错误注入和脚本化的转写/回答，用于不依赖真实接口的性能测试
+
+单独运行（在仓库根目录），然后把OPENAI_BASE_URL指向输出的地址：
+    python -m speech2text.benchmarks.stub_server --port 8765 --first-token-latency 0.3 --token-rate 50
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# 默认脚本：转写结果依次循环返回，回答按问题匹配
+DEFAULT_SCRIPT = [
+    {"transcript": "什么是连接池？", "answer": "连接池会保留已经建立的连接，后续请求直接复用，省去TCP连接和TLS握手的时间。"},
+    {"transcript": "今天的会议主要讨论了下个季度的计划。", "answer": ""},
+    {"transcript": "为什么流式输出能降低首字延迟？", "answer": "流式输出在生成第一个token后就开始返回，不必等待完整回答，所以用户更早看到内容。"},
+    {"transcript": "如何估算接口的每分钟token用量？", "answer": "把每个请求的提示词token数和最大输出token数相加，再乘以每分钟的请求数即可粗略估算。"},
+]
+
+
+class StubConfig:
+    """桩服务器的行为配置"""
+
+    def __init__(
+        self,
+        transcribe_latency: float = 0.2,
+        first_token_latency: float = 0.3,
+        token_rate: float = 50.0,
+        answer_tokens: int = 40,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        retry_after: Optional[float] = 1.0,
+        handshake_rtt: float = 0.0,
+        script: Optional[List[Dict[str, str]]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        参数:
+            transcribe_latency: 转写接口的响应延迟（秒）
+            first_token_latency: 对话接口第一个token的延迟（秒）
+            token_rate: 之后每秒输出的token数，0表示尽可能快
+            answer_tokens: 脚本中没有匹配的问题时生成的回答token数
+            latency_jitter: 延迟的随机抖动比例（0.2表示±20%）
+            error_rate: 每个POST请求返回错误的概率
+            error_status: 注入错误的HTTP状态码
+            retry_after: 注入429/503错误时的Retry-After（秒），为None时不返回
+            handshake_rtt: 每个新连接在握手前等待的模拟往返时间（秒），TCP和TLS握手各计一次
+            script: [{"transcript": ..., "answer": ...}]，转写结果依次循环返回，回答按问题匹配
+            seed: 随机种子
+        """
+        self.transcribe_latency = transcribe_latency
+        self.first_token_latency = first_token_latency
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.handshake_rtt = handshake_rtt
+        self.script = script or DEFAULT_SCRIPT
+        self.random = random.Random(seed)
+        self._transcripts = itertools.cycle([entry["transcript"] for entry in self.script])
+        self._answers = {entry["transcript"]: entry.get("answer", "") for entry in self.script}
+        self._lock = threading.Lock()
+
+    def delay(self, seconds: float) -> float:
+        """加上随机抖动后的延迟"""
+        if not self.latency_jitter or seconds <= 0:
+            return seconds
+        with self._lock:
+            return max(0.0, seconds * (1 + self.random.uniform(-self.latency_jitter, self.latency_jitter)))
+
+    def inject_error(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def next_transcript(self) -> str:
+        with self._lock:
+            return next(self._transcripts)
+
+    def answer_tokens_for(self, question: str) -> List[str]:
+        """问题对应的回答，按字拆成token；没有脚本回答时生成固定数量的token"""
+        answer = self._answers.get(question.strip())
+        if answer:
+            return list(answer)
+        return [f"字{i % 10}" for i in range(self.answer_tokens)]
+
+
+class StubStats:
+    """服务器端计数"""
+
+    def __init__(self):
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.connections = 0
+        self.active_streams = 0
+        self.max_active_streams = 0
+        self.streamed_tokens = 0
+        self._lock = threading.Lock()
+
+    def count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+            if name == "active_streams":
+                self.max_active_streams = max(self.max_active_streams, self.active_streams)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "connections": self.connections,
+                "max_active_streams": self.max_active_streams,
+                "streamed_tokens": self.streamed_tokens,
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI兼容接口：模型列表、转写、流式/非流式对话和向量"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> StubConfig:
+        return self.server.config
+
+    @property
+    def stats(self) -> StubStats:
+        return self.server.stats
+
+    def _send_json(self, data: dict, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes, last: bool = False):
+        # 结束块和最后一个事件一起发出，客户端读到[DONE]时响应体已完整
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n" + (b"0\r\n\r\n" if last else b""))
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.stats.count(self.path)
+        self._send_json({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.stats.count(self.path)
+        if self.config.inject_error():
+            self.stats.add("errors")
+            status = self.config.error_status
+            headers = {}
+            if self.config.retry_after is not None and status in (429, 503):
+                headers["Retry-After"] = f"{self.config.retry_after:g}"
+            self._send_json({"error": {"message": "injected error", "type": "stub_error"}}, status, headers)
+            return
+        if self.path.endswith("/audio/transcriptions"):
+            time.sleep(self.config.delay(self.config.transcribe_latency))
+            self._send_json({"text": self.config.next_transcript()})
+        elif self.path.endswith("/chat/completions"):
+            self._chat(json.loads(body or b"{}"))
+        elif self.path.endswith("/embeddings"):
+            self._embeddings(json.loads(body or b"{}"))
+        else:
+            self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def _chat(self, request: dict):
+        messages = request.get("messages") or [{}]
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        tokens = self.config.answer_tokens_for(question)
+        time.sleep(self.config.delay(self.config.first_token_latency))
+        if not request.get("stream"):
+            self._send_json({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.stats.add("active_streams")
+        interval = 1.0 / self.config.token_rate if self.config.token_rate > 0 else 0.0
+        try:
+            for i, token in enumerate(tokens):
+                if i and interval:
+                    time.sleep(self.config.delay(interval))
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.stats.add("streamed_tokens")
+            self._write_chunk(b"data: [DONE]\n\n", last=True)
+        except (BrokenPipeError, ConnectionResetError, ssl.SSLError):
+            # 客户端取消时关闭了连接
+            self.close_connection = True
+        finally:
+            self.stats.add("active_streams", -1)
+
+    def _embeddings(self, request: dict):
+        inputs = request.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for index, text in enumerate(inputs):
+            # 由文本摘要生成的确定性向量，相同文本得到相同向量
+            digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+            data.append({"object": "embedding", "index": index, "embedding": [b / 255 - 0.5 for b in digest]})
+        self._send_json({"object": "list", "data": data, "model": "stub",
+                         "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+
+class StubServer(ThreadingHTTPServer):
+    """桩服务器，提供TLS上下文时以HTTPS提供服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig, context: Optional[ssl.SSLContext] = None):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.context = context
+        self.stats = StubStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{'https' if self.context else 'http'}://{host}:{port}/v1"
+
+    def finish_request(self, request, client_address):
+        self.stats.add("connections")
+        if self.config.handshake_rtt:
+            # TCP三次握手和TLS握手各约一个往返
+            time.sleep((2 if self.context else 1) * self.config.handshake_rtt)
+        if self.context:
+            request = self.context.wrap_socket(request, server_side=True)
+        super().finish_request(request, client_address)
+
+
+def make_certificate(directory: str) -> Tuple[str, str]:
+    """用openssl命令生成自签名证书，返回(证书路径, 私钥路径)"""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+         "-days", "1", "-subj", "/CN=127.0.0.1"],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_stub_server(
+    config: StubConfig,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    certificate: Optional[Tuple[str, str]] = None
+) -> StubServer:
+    """
+    在后台线程中启动桩服务器
+
+    参数:
+        config: 行为配置
+        host: 监听地址
+        port: 端口，0表示自动分配
+        certificate: (证书路径, 私钥路径)，提供时使用HTTPS
+
+    返回:
+        已启动的服务器，base_url为接口地址，结束时调用shutdown()
+    """
+    context = None
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+    server = StubServer((host, port), config, context)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
+
+
+def load_script(path: str) -> List[Dict[str, str]]:
+    """读取JSONL脚本，每行{"transcript": ..., "answer": ...}"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """添加桩服务器行为参数（负载测试脚本共用）"""
+    parser.add_argument("--transcribe-latency", type=float, default=0.2, help="转写延迟（秒）")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="首token延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="每秒输出token数，0表示尽可能快")
+    parser.add_argument("--answer-tokens", type=int, default=40, help="没有脚本回答时的回答token数")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="POST请求返回错误的概率")
+    parser.add_argument("--error-status", type=int, default=429, help="注入错误的HTTP状态码")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="注入429/503时的Retry-After（秒）")
+    parser.add_argument("--script", help="JSONL脚本，每行{\"transcript\": ..., \"answer\": ...}")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        transcribe_latency=args.transcribe_latency,
+        first_token_latency=args.first_token_latency,
+        token_rate=args.token_rate,
+        answer_tokens=args.answer_tokens,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        script=load_script(args.script) if args.script else None,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容桩服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), config_from_args(args))
+    print(f"桩服务器已启动: OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"服务器统计: {server.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,11 @@
 音频处理模块，负责音频捕获和处理
 """
 
-import sounddevice as sd
 import numpy as np
+import hashlib
 import threading
 import queue
 import time
-import tempfile
 import soundfile as sf
 import os
 import wave
@@ -17,32 +16,78 @@ import mimetypes
 from typing import Optional, List, Dict, Callable, Any
 from openai import OpenAI
 import psutil
-import win32gui
-import win32process
-from ..config.settings import AUDIO_SETTINGS, WHISPER_SETTINGS, GPT_SETTINGS, QUESTION_KEYWORDS
-from ..utils.error_handler import ErrorHandler
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # 没有PortAudio库时（如无声卡的Linux服务器）仍可使用文件音频源
+    sd = None
+try:
+    import win32gui
+    import win32process
+except ImportError:
+    # 非Windows平台无法枚举应用程序窗口
+    win32gui = None
+    win32process = None
+from ..config.settings import (
+    AUDIO_SETTINGS, WHISPER_SETTINGS, GPT_SETTINGS, QUESTION_KEYWORDS, VAD_SETTINGS, PIPELINE_SETTINGS,
+    PARTIAL_SETTINGS, LATENCY_SETTINGS, ANSWER_CACHE_SETTINGS, SPECULATIVE_SETTINGS, STREAM_SETTINGS,
+    HTTP_SETTINGS, MEMORY_SETTINGS, RATE_LIMIT_SETTINGS, QUESTION_DETECTOR_SETTINGS, STITCH_SETTINGS,
+    RAG_SETTINGS
+)
+from ..utils.error_handler import ErrorHandler, logger
+from ..utils.http_transport import TransportStats, create_http_client, warm_up
+from ..utils.rate_limiter import DeadlineExceeded, RateLimiter
+from ..utils.latency import LatencyRecorder
+from ..llm.answer_cache import AnswerCache
+from ..llm.coalescer import StreamCoalescer
+from ..llm.memory import ConversationMemory, TokenCounter
+from ..llm.question_detector import QuestionDetector
+from ..llm.retrieval import KnowledgeRetriever, load_local_knowledge_base
+from ..llm.scheduler import AnswerTask
+from ..llm.stitcher import QuestionStitcher
+from ..llm.speculative import SpeculativeAnswerer
+from .encoder import encode_segment, to_mono
+from .local_whisper import decode_options, get_whisper_model, transcribe_array
+from .partial_transcriber import PartialTranscriber
+from .pipeline import Segment, SpeechPipeline
+from .resample import StreamingResampler
+from .ring_buffer import AudioRingBuffer
+from .sources import AudioSource, DeviceSource
+from .speech_buffer import SpeechBuffer
+from .vad import create_detector
 
 # 用于multipart/form-data请求的boundary
 BOUNDARY = '----WebKitFormBoundary' + ''.join(['1234567890', 'abcdefghijklmnopqrstuvwxyz'][:10])
 
-# 问题关键词
-QUESTION_KEYWORDS = ['吗', '?', '？', '什么', '为什么', '如何', '怎么', '哪里', '谁', '何时', '是否']
-
 class AudioProcessor:
     def __init__(self):
         """初始化音频处理器"""
-        # 初始化API客户端
+        # 初始化API客户端，转写和对话请求共享同一个连接池
+        self.transport_stats = TransportStats()
+        # 客户端限流和重试，启用时关闭SDK自带的重试，由限流器按截止时间决定是否重试
+        self.rate_limiter = RateLimiter(
+            RATE_LIMIT_SETTINGS.get('limits', {}),
+            max_retries=RATE_LIMIT_SETTINGS.get('max_retries', 4),
+            base_delay=RATE_LIMIT_SETTINGS.get('base_delay', 0.5),
+            max_delay=RATE_LIMIT_SETTINGS.get('max_delay', 8.0)
+        ) if RATE_LIMIT_SETTINGS.get('enabled', False) else None
         try:
             self.client = OpenAI(
                 api_key=os.getenv('OPENAI_API_KEY'),
-                base_url=os.getenv('OPENAI_BASE_URL')
+                base_url=os.getenv('OPENAI_BASE_URL'),
+                http_client=create_http_client(HTTP_SETTINGS, self.transport_stats),
+                **({'max_retries': 0} if self.rate_limiter else {})
             )
         except Exception as e:
             ErrorHandler.handle_error(e, "API客户端初始化失败")
             raise
             
         # 初始化内部状态
-        self.audio_queue = queue.Queue()
+        # 音频回调只把数据拷贝进环形缓冲区，在开始采集时按设备参数创建
+        self.audio_ring = None
+        self._capture_wait = False
+        self.callback_status_count = 0
+        self._last_callback_status = None
         self.is_recording = False
         self.text_callback = None
         self.volume_callback = None
@@ -50,12 +95,105 @@ class AudioProcessor:
         # 从配置文件加载设置
         self.sample_rate = AUDIO_SETTINGS['SAMPLE_RATE']
         self.channels = AUDIO_SETTINGS['CHANNELS']
+        # 处理线程把采集数据下混为单声道并重采样到该采样率，None表示保持设备采样率
+        self.capture_sample_rate = AUDIO_SETTINGS.get('CAPTURE_SAMPLE_RATE', 16000)
+        self.device_sample_rate = self.sample_rate
+        self.capture_resampler = None
         self.chunk_duration = AUDIO_SETTINGS.get('CHUNK_DURATION', 0.1)
         self.buffer_duration = AUDIO_SETTINGS['BUFFER_DURATION']
         
         self.audio_buffer = []
         self.latest_audio_data = np.array([])
         self.current_device = None
+        self.audio_source = None
+        
+        # 转写、问题路由和回答流水线，在开始录音时创建
+        self.pipeline = None
+        # 部分转写器，启用时在说话过程中显示临时文本
+        self.partial_transcriber = None
+        # 推测式回答：停顿时根据部分转写结果提前请求回答
+        self.speculator = None
+        self._partial_texts = {}
+        self._speculation_armed = set()
+        # 每个语音片段的端到端延迟追踪
+        self.latency = LatencyRecorder(LATENCY_SETTINGS.get('max_samples', 1000)) \
+            if LATENCY_SETTINGS.get('enabled', True) else None
+        # 按归一化问题缓存的回答
+        self.answer_cache = ErrorHandler.safe_execute(
+            self._create_answer_cache,
+            "回答缓存初始化失败"
+        ) if ANSWER_CACHE_SETTINGS.get('enabled', False) else None
+        # 问题检测器，关键词和位置规则在启动时编译一次
+        self.question_detector = QuestionDetector.from_settings(QUESTION_DETECTOR_SETTINGS, QUESTION_KEYWORDS)
+        # 对话记忆和按token限流共用的计数器
+        self.token_counter = TokenCounter(GPT_SETTINGS['model'])
+        # 对话记忆：追问时带上最近的问答和较早对话的摘要
+        self.memory = ConversationMemory(
+            self.token_counter,
+            budget=MEMORY_SETTINGS.get('budget_tokens', 1500),
+            summary_tokens=MEMORY_SETTINGS.get('summary_tokens', 300),
+            summarize=self._summarize_history,
+            follow_up_max_chars=MEMORY_SETTINGS.get('follow_up_max_chars', 6)
+        ) if MEMORY_SETTINGS.get('enabled', False) else None
+        # 本地知识库检索：识别出问题后在后台检索，回答前只等到截止时间
+        self.retriever = KnowledgeRetriever(
+            lambda: load_local_knowledge_base(RAG_SETTINGS.get('persist_directory', './knowledge_base')),
+            k=RAG_SETTINGS.get('k', 3),
+            deadline=RAG_SETTINGS.get('deadline', 0.15),
+            max_chars=RAG_SETTINGS.get('max_chars', 1500),
+            max_workers=RAG_SETTINGS.get('max_workers', 2)
+        ) if RAG_SETTINGS.get('enabled', False) else None
+        
+    def _create_answer_cache(self) -> AnswerCache:
+        """内部方法：创建回答缓存，命名空间区分模型和系统提示词"""
+        prompt_digest = hashlib.sha1(GPT_SETTINGS['system_prompt'].encode('utf-8')).hexdigest()[:12]
+        embed = None
+        embedding_model = ANSWER_CACHE_SETTINGS.get('embedding_model')
+        if embedding_model:
+            def embed(text: str) -> List[float]:
+                return self._api_call(
+                    "embedding",
+                    lambda: self.client.embeddings.create(model=embedding_model, input=text),
+                    tokens=self.token_counter.count(text)
+                ).data[0].embedding
+        return AnswerCache(
+            path=ANSWER_CACHE_SETTINGS.get('path'),
+            namespace=f"{GPT_SETTINGS['model']}:{prompt_digest}",
+            max_entries=ANSWER_CACHE_SETTINGS.get('max_entries', 500),
+            ttl=ANSWER_CACHE_SETTINGS.get('ttl'),
+            embed=embed,
+            similarity_threshold=ANSWER_CACHE_SETTINGS.get('similarity_threshold', 0.92)
+        )
+        
+    def _summarize_history(self, summary: str, history: str, max_tokens: int) -> str:
+        """内部方法：把已有摘要和移出记忆的对话合并成新摘要（在后台线程中调用）"""
+        content = f"已有摘要：{summary}\n\n新的对话：\n{history}" if summary else f"对话：\n{history}"
+        params = {
+            'model': MEMORY_SETTINGS.get('summary_model') or GPT_SETTINGS['model'],
+            'messages': [
+                {"role": "system", "content": MEMORY_SETTINGS['summary_prompt']},
+                {"role": "user", "content": content}
+            ],
+            'max_tokens': max_tokens,
+            'temperature': 0
+        }
+        response = self._api_call(
+            "chat",
+            lambda: self.client.chat.completions.create(**params),
+            tokens=self._request_tokens(params)
+        )
+        return response.choices[0].message.content or ""
+        
+    def _api_call(self, endpoint: str, func, tokens: int = 0, deadline: Optional[float] = None):
+        """内部方法：经过限流器调用接口（未启用限流时直接调用）"""
+        if self.rate_limiter is None:
+            return func()
+        return self.rate_limiter.call(endpoint, func, tokens=tokens, deadline=deadline)
+        
+    def _request_tokens(self, params: dict) -> int:
+        """内部方法：估算对话请求计入每分钟token限额的数量（提示词加最大输出token数）"""
+        prompt = sum(self.token_counter.count(message['content']) + 4 for message in params['messages'])
+        return prompt + params.get('max_tokens', 0)
         
     def get_audio_devices(self) -> List[tuple]:
         """获取所有音频设备"""
@@ -105,6 +243,8 @@ class AudioProcessor:
     def _get_audio_applications(self) -> List[tuple]:
         """内部方法：获取正在播放音频的应用程序"""
         apps = []
+        if win32gui is None:
+            return apps
         def enum_windows_callback(hwnd, results):
             if win32gui.IsWindowVisible(hwnd):
                 _, pid = win32process.GetWindowThreadProcessId(hwnd)
@@ -127,25 +267,98 @@ class AudioProcessor:
         return devices
         
     def audio_callback(self, indata, frames, time, status):
-        """音频回调函数，处理捕获的音频数据"""
+        """音频回调函数：在实时线程上只把数据拷贝进环形缓冲区，不分配内存也不唤醒其他线程"""
         if status:
-            print(f"音频回调状态: {status}")
+            # 只记录，由处理线程输出日志
+            self.callback_status_count += 1
+            self._last_callback_status = status
         
-        # 计算当前音量级别
-        if np.any(indata):
-            volume_level = np.abs(indata).mean()
-            if self.volume_callback:
-                self.volume_callback(volume_level)
+        ring = self.audio_ring
+        if ring is not None:
+            ring.write(indata, wait=self._capture_wait)
         
-        self.audio_queue.put(indata.copy())
+    def start_recording(self, device_type: str, device_id: int, source: Optional[AudioSource] = None):
+        """
+        开始录音
         
-    def start_recording(self, device_type: str, device_id: int):
-        """开始录音"""
+        参数:
+            device_type: 设备类型（"input"、"output"、"app"、"file"）
+            device_id: 设备编号
+            source: 可选的音频源（如FileSource），提供时忽略设备参数
+        """
         if self.is_recording:
             # 如果已经在录音，先停止当前录音
             self.stop_recording()
             
         self.is_recording = True
+        self.audio_source = source
+        self.capture_resampler = None
+        self.audio_ring = None
+        self.callback_status_count = 0
+        if source is not None:
+            # 音频源的参数已知，先于处理线程设置好
+            self.device_sample_rate = source.sample_rate
+            self.channels = source.channels
+        if self.capture_sample_rate:
+            # 处理采样率固定，不依赖设备在录音线程中何时打开
+            self.sample_rate = int(self.capture_sample_rate)
+        elif source is not None:
+            self.sample_rate = source.sample_rate
+        
+        # 启动转写和回答流水线，使音频处理线程不必等待网络
+        self.pipeline = SpeechPipeline(
+            transcribe=self._transcribe_segment,
+            route=self._route_transcript,
+            answer=self._answer_question,
+            transcribe_workers=PIPELINE_SETTINGS.get('transcribe_workers', 2),
+            segment_queue_size=PIPELINE_SETTINGS.get('segment_queue_size', 8),
+            answer_queue_size=PIPELINE_SETTINGS.get('answer_queue_size', 4),
+            error_callback=self.text_callback,
+            discard=self._discard_segment,
+            answer_policy=PIPELINE_SETTINGS.get('answer_policy', 'queue'),
+            max_parallel_answers=PIPELINE_SETTINGS.get('max_parallel_answers', 2),
+            stitcher=QuestionStitcher(
+                self.is_question,
+                hold_unpunctuated=STITCH_SETTINGS.get('hold_unpunctuated', True),
+                max_chars=STITCH_SETTINGS.get('max_chars', 200)
+            ) if STITCH_SETTINGS.get('enabled', False) else None
+        )
+        self.pipeline.start()
+        
+        if HTTP_SETTINGS.get('warm_up', True):
+            # 后台预热连接，第一个问题不必等待DNS解析和TLS握手
+            threading.Thread(target=warm_up, args=(self.client,), name="http-warm-up", daemon=True).start()
+        
+        if WHISPER_SETTINGS.get('backend', 'api') == 'local':
+            # 后台预加载本地模型，避免第一个片段等待模型加载
+            threading.Thread(
+                target=lambda: ErrorHandler.safe_execute(
+                    self._get_local_model,
+                    "加载本地Whisper模型时出错",
+                    self.text_callback
+                ),
+                daemon=True
+            ).start()
+        
+        if self.retriever:
+            # 后台加载知识库和嵌入模型，加载完成前的问题不做检索
+            self.retriever.start_loading()
+        
+        self.speculator = None
+        if PARTIAL_SETTINGS.get('enabled', False):
+            self.partial_transcriber = PartialTranscriber(
+                transcribe=self._transcribe_partial,
+                callback=self._show_partial,
+                error_callback=self.text_callback
+            )
+            self.partial_transcriber.start()
+            if SPECULATIVE_SETTINGS.get('enabled', False):
+                self.speculator = SpeculativeAnswerer(
+                    self._open_completion,
+                    self._chunk_content,
+                    similarity_threshold=SPECULATIVE_SETTINGS.get('similarity_threshold', 0.85),
+                    count_tokens=self.token_counter.count
+                )
         
         # 启动录音线程
         self.record_thread = threading.Thread(
@@ -170,61 +383,85 @@ class AudioProcessor:
         self.record_thread.start()
         self.process_thread.start()
             
-    def _record_audio(self, device_type: str, device_id: int):
-        """内部方法：实际录音实现"""
-        try:
-            # 获取设备信息
-            devices = sd.query_devices()
-            device_info = None
-            selected_device_id = device_id  # 保存原始device_id
+    def _open_device_source(self, device_type: str, device_id: int) -> DeviceSource:
+        """内部方法：根据设备类型查找实际采集设备并创建音频源"""
+        if sd is None:
+            raise Exception("sounddevice不可用，无法打开音频设备")
             
-            if device_type == "app":
-                # 查找VB-CABLE Output设备
-                for i, dev in enumerate(devices):
-                    if dev['max_input_channels'] > 0 and ('CABLE Output' in dev['name'] or 'VB-Audio' in dev['name']):
-                        selected_device_id = i
-                        device_info = dev
-                        break
-                
-                # 如果没找到VB-CABLE，尝试使用默认输入设备
-                if device_info is None:
-                    default_device = sd.query_devices(kind='input')
-                    selected_device_id = default_device['index']
-                    device_info = default_device
-            else:
-                device_info = devices[selected_device_id]
+        # 获取设备信息
+        devices = sd.query_devices()
+        device_info = None
+        selected_device_id = device_id  # 保存原始device_id
+        
+        if device_type == "app":
+            # 查找VB-CABLE Output设备
+            for i, dev in enumerate(devices):
+                if dev['max_input_channels'] > 0 and ('CABLE Output' in dev['name'] or 'VB-Audio' in dev['name']):
+                    selected_device_id = i
+                    device_info = dev
+                    break
             
+            # 如果没找到VB-CABLE，尝试使用默认输入设备
             if device_info is None:
-                raise Exception("找不到可用的音频设备")
-            
-            # 保存当前设备信息
-            self.current_device = device_info
-            
-            # 设置采样率和通道数
-            self.sample_rate = int(device_info['default_samplerate'])
-            self.channels = min(2, device_info['max_input_channels'])
-            
-            # 配置音频流
-            stream_config = {
-                'device': selected_device_id,
-                'channels': self.channels,
-                'samplerate': self.sample_rate,
-                'callback': self.audio_callback,
-                'blocksize': int(self.sample_rate * self.chunk_duration)
-            }
+                default_device = sd.query_devices(kind='input')
+                selected_device_id = default_device['index']
+                device_info = default_device
+        else:
+            device_info = devices[selected_device_id]
+        
+        if device_info is None:
+            raise Exception("找不到可用的音频设备")
+        
+        # 保存当前设备信息
+        self.current_device = device_info
+        
+        # 设置采样率和通道数
+        self.device_sample_rate = int(device_info['default_samplerate'])
+        if not self.capture_sample_rate:
+            self.sample_rate = self.device_sample_rate
+        self.channels = min(2, device_info['max_input_channels'])
+        
+        # 使用WASAPI共享模式
+        extra_settings = None
+        if device_type in ["output", "app"]:
+            extra_settings = dict(
+                wasapi_shared=True,
+                wasapi_exclusive=False
+            )
+        
+        return DeviceSource(
+            selected_device_id,
+            self.device_sample_rate,
+            self.channels,
+            block_duration=self.chunk_duration,
+            extra_settings=extra_settings,
+            device_name=device_info['name']
+        )
             
-            # 使用WASAPI共享模式
-            if device_type in ["output", "app"]:
-                stream_config['extra_settings'] = dict(
-                    wasapi_shared=True,
-                    wasapi_exclusive=False
-                )
+    def _record_audio(self, device_type: str, device_id: int):
+        """内部方法：实际录音实现"""
+        try:
+            if self.audio_source is None:
+                self.audio_source = self._open_device_source(device_type, device_id)
+            source = self.audio_source
+            source.callback = self.audio_callback
+            if self.sample_rate != source.sample_rate or source.channels > 1:
+                self.capture_resampler = StreamingResampler(source.sample_rate, self.sample_rate)
+            self._capture_wait = not source.is_realtime
+            # 环形缓冲区创建后处理线程才开始读取
+            self.audio_ring = AudioRingBuffer.for_duration(
+                AUDIO_SETTINGS.get('RING_BUFFER_DURATION', 5.0),
+                source.sample_rate,
+                source.channels
+            )
             
-            # 创建音频流
-            with sd.InputStream(**stream_config):
+            # 启动音频源
+            with source:
                 if self.text_callback:
-                    self.text_callback(f"正在使用设备: {device_info['name']}\n")
-                    self.text_callback(f"采样率: {self.sample_rate}Hz, 通道数: {self.channels}\n")
+                    self.text_callback(f"正在使用设备: {source.name}\n")
+                    self.text_callback(f"采样率: {source.sample_rate}Hz, 通道数: {self.channels}\n")
+                    if self.capture_resampler is not None:
+                        self.text_callback(f"处理采样率: {self.sample_rate}Hz 单声道\n")
                     if device_type == "app":
                         self.text_callback("""
 请确保：
@@ -250,8 +487,9 @@ class AudioProcessor:
    - 尝试重新插拔耳机或重启电脑
 \n""")
                 
-                while self.is_recording:
-                    sd.sleep(int(1000 * self.chunk_duration))
+                # 实时设备一直采集到停止录音，文件音频源采集到播放完毕
+                while self.is_recording and not source.is_finished:
+                    time.sleep(self.chunk_duration)
                     
         except Exception as e:
             if not self.is_recording:
@@ -264,7 +502,7 @@ class AudioProcessor:
 音频设备配置错误，请检查：
 1. 设备状态：
    - 当前设备: {self.current_device['name'] if self.current_device else '未知'}
-   - 采样率: {self.sample_rate}Hz
+   - 采样率: {self.device_sample_rate}Hz
    - 通道数: {self.channels}
 
 2. 常见问题解决：
@@ -285,8 +523,11 @@ class AudioProcessor:
         if not self.is_recording:
             return
             
-        print("正在停止录音...")
+        logger.info("正在停止录音...")
         self.is_recording = False
+        if self.audio_ring:
+            # 释放可能在等待缓冲区空间的文件回放线程
+            self.audio_ring.close()
         
         try:
             # 等待线程结束，但设置超时时间
@@ -294,200 +535,620 @@ class AudioProcessor:
                 self.record_thread.join(timeout=2.0)
             if hasattr(self, 'process_thread'):
                 self.process_thread.join(timeout=2.0)
+            if self.pipeline:
+                self.pipeline.stop(timeout=2.0)
+            if self.partial_transcriber:
+                self.partial_transcriber.stop(timeout=2.0)
+                self.partial_transcriber = None
+            if self.speculator:
+                self.speculator.shutdown()
+                logger.info(f"推测回答统计: {self.speculator.stats()}")
+            self._partial_texts.clear()
+            self._speculation_armed.clear()
+            if self.retriever:
+                self.retriever.cancel_all()
+                logger.info(f"知识库检索统计: {self.retriever.stats()}")
+            self.export_latency()
+            if self.answer_cache:
+                logger.info(f"回答缓存统计: {self.answer_cache.stats()}")
+            logger.info(f"连接统计: {self.transport_stats.stats()}")
+            if self.pipeline:
+                logger.info(f"回答调度统计: {self.pipeline.scheduler.stats()}")
+                if self.pipeline.stitched_segments:
+                    logger.info(f"问题拼接: 合并了{self.pipeline.stitched_segments}个片段")
+            if self.rate_limiter:
+                logger.info(f"限流统计: {self.rate_limiter.stats()}")
+            if self.memory:
+                logger.info(f"对话记忆统计: {self.memory.stats()}")
                 
-            # 清空队列
-            while not self.audio_queue.empty():
-                try:
-                    self.audio_queue.get_nowait()
-                except queue.Empty:
-                    break
+            if self.audio_ring and self.audio_ring.overflows:
+                logger.warning(
+                    f"音频缓冲区溢出{self.audio_ring.overflows}次，"
+                    f"丢弃{self.audio_ring.dropped_frames}帧"
+                )
                     
             # 重置缓冲区和设备信息
             self.audio_buffer = []
             self.latest_audio_data = np.array([])
             self.current_device = None
+            self.audio_source = None
             
         except Exception as e:
             ErrorHandler.handle_error(e, "停止录音时出错", self.text_callback)
         finally:
-            print("录音已停止")
+            logger.info("录音已停止")
             
     def process_audio(self):
         """处理音频数据"""
+        # 等待录音线程打开音频源并创建环形缓冲区，此后采样率等参数才确定
+        while self.is_recording and self.audio_ring is None:
+            time.sleep(0.01)
+        ring = self.audio_ring
+        if ring is None:
+            return
+        resampler = self.capture_resampler
+        block_frames = max(1, int(self.device_sample_rate * self.chunk_duration))
+        reported_status = reported_overflows = 0
+        # 停顿超过该时长时用部分转写结果推测回答（应小于PAUSE_TOLERANCE）
+        speculate_silence_samples = int(self.sample_rate * SPECULATIVE_SETTINGS.get('silence', 0.6))
+        
         buffer_samples = int(self.sample_rate * self.buffer_duration)
         
         # 从配置文件读取参数
-        silence_threshold = AUDIO_SETTINGS.get("SILENCE_THRESHOLD", 0.0015)  # 静音阈值，增加灵敏度
         min_speech_samples = int(self.sample_rate * AUDIO_SETTINGS.get("MIN_SPEECH_DURATION", 0.5))  # 最小语音片段时长
         max_speech_samples = int(self.sample_rate * AUDIO_SETTINGS.get("MAX_RECORDING_DURATION", 20.0))  # 最大语音片段时长（最多20秒）
-        speech_energy_threshold = AUDIO_SETTINGS.get("SPEECH_ENERGY_THRESHOLD", 0.002)  # 语音能量阈值
+        
+        # 语音活动检测器，按帧向量化判决并带有滞回和拖尾
+        detector = create_detector(self.sample_rate, VAD_SETTINGS)
         
         # 语音状态
         is_speech = False
-        speech_buffer = []
+        # 按最大录音时长预分配语音缓冲区，片段结束时取零拷贝视图
+        speech_buffer = SpeechBuffer(max_speech_samples)
         silence_counter = 0
         # 从配置文件读取最大静音时长，默认为1.5秒
         max_silence_samples = int(self.sample_rate * AUDIO_SETTINGS.get("PAUSE_TOLERANCE", 1.5))
         
-        # 限制回复频率，避免重复提问
-        last_response_time = 0
-        # 从配置文件读取最小回复间隔，默认为2.0秒
-        min_response_interval = AUDIO_SETTINGS.get("SPEECH_TIMEOUT", 2.0)
+        # 部分转写：片段每增长一个间隔就提交一次快照
+        partial_interval_samples = int(self.sample_rate * PARTIAL_SETTINGS.get('interval', 0.5))
+        next_partial_samples = partial_interval_samples
+        seq = None
+        # 已处理的样本数，作为音频流时钟（文件快速回放时与墙上时间无关）
+        stream_samples = 0
+        # 问题拼接：上一个提交的片段及其结束时刻，等待判断下一段是否在窗口内开始
+        stitch_window_samples = int(self.sample_rate * STITCH_SETTINGS.get('window', 1.0)) \
+            if self.pipeline.stitcher else None
+        last_closed = None
+        last_close_samples = 0
         
         while self.is_recording:
             try:
-                # 使用超时来避免无限等待
-                audio_data = self.audio_queue.get(timeout=0.5)
-                
-                # 如果是立体声，转换为单声道
-                if audio_data.shape[1] == 2:
-                    audio_data = np.mean(audio_data, axis=1)
+                # 由处理线程轮询环形缓冲区，音频回调不需要唤醒本线程
+                raw_data = ring.wait_read(block_frames, timeout=0.5)
+                self._report_capture_status(ring, reported_status, reported_overflows)
+                reported_status, reported_overflows = self.callback_status_count, ring.overflows
+                if raw_data is None:
+                    # 文件音频源播放完毕且缓冲区已空：结束当前片段后退出
+                    if self.audio_source is not None and self.audio_source.is_finished:
+                        if is_speech:
+                            if resampler is not None:
+                                speech_buffer.append(resampler.flush())
+                            if self._close_segment(speech_buffer, seq, min_speech_samples, stream_samples) \
+                                    and stitch_window_samples is not None:
+                                last_closed = seq
+                        break
+                    continue
                 
-                # 应用简单的噪声门限
-                audio_data = np.where(np.abs(audio_data) < silence_threshold, 0, audio_data)
+                # 电平计量在处理线程中完成
+                if self.volume_callback and np.any(raw_data):
+                    self.volume_callback(np.abs(raw_data).mean())
                 
-                # 计算当前帧的能量
-                frame_energy = np.mean(np.abs(audio_data))
+                # 下混为单声道并重采样到处理采样率
+                audio_data = to_mono(raw_data)
+                if resampler is not None:
+                    audio_data = resampler.process(audio_data)
+                    if not len(audio_data):
+                        continue
+                stream_samples += len(audio_data)
                 
-                if frame_energy > speech_energy_threshold:
+                # 缓冲区达到最大时长时语音块中没有写入的部分
+                overflow = audio_data[:0]
+                if detector.is_speech(audio_data):
                     # 检测到语音
                     if not is_speech:
                         is_speech = True
-                        speech_buffer = []
+                        # 上一段结束后很快又开始说话，可能是同一个问题的后半段
+                        seq = self._open_segment(
+                            speech_buffer,
+                            last_closed,
+                            last_closed is not None and stream_samples - last_close_samples <= stitch_window_samples
+                        )
+                        last_closed = None
+                        next_partial_samples = partial_interval_samples
                     silence_counter = 0
-                    speech_buffer.extend(audio_data)
+                    overflow = audio_data[speech_buffer.append(audio_data):]
+                    # 继续说话时停止根据新的部分结果推测
+                    self._speculation_armed.discard(seq)
                 else:
                     # 检测到静音
                     if is_speech:
                         silence_counter += len(audio_data)
-                        speech_buffer.extend(audio_data)
-                        
-                        # 如果静音时长超过阈值或语音长度超过最大值，处理当前语音片段
-                        if silence_counter >= max_silence_samples or len(speech_buffer) >= max_speech_samples:
-                            if len(speech_buffer) >= min_speech_samples:
-                                # 处理语音片段
-                                speech_segment = np.array(speech_buffer)
-                                # 标准化音频数据
-                                speech_segment = speech_segment / (np.max(np.abs(speech_segment)) + 1e-6)
-                                # 转写音频
-                                text = self.transcribe_audio(speech_segment)
-                                if text and self.text_callback:
-                                    text = text.strip()
-                                    if text and len(text) > 1:  # 只处理有意义的文本
-                                        current_time = time.time()
-                                        is_question_text = self.is_question(text)
-                                        
-                                        # 对于问题，检查是否需要响应
-                                        if is_question_text:
-                                            # 确保回复间隔大于最小间隔
-                                            if current_time - last_response_time >= min_response_interval:
-                                                self.text_callback(f"问题: {text}\n")
-                                                answer = self.get_gpt_response(text)
-                                                last_response_time = time.time()  # 更新最后响应时间
-                                            else:
-                                                # 响应太频繁，仅显示问题
-                                                self.text_callback(f"问题: {text} (等待中...)\n")
-                                        else:
-                                            self.text_callback(f"文本: {text}\n")
-                            # 重置状态
-                            is_speech = False
-                            speech_buffer = []
-                            silence_counter = 0
+                        speech_buffer.append(audio_data)
+                        if (self.speculator and silence_counter >= speculate_silence_samples
+                                and seq not in self._speculation_armed):
+                            self._arm_speculation(seq)
+                
+                # 说话过程中周期性提交快照做部分转写（静音期间不再提交）
+                if (self.partial_transcriber and is_speech and silence_counter == 0
+                        and len(speech_buffer) >= next_partial_samples):
+                    self.partial_transcriber.update(seq, speech_buffer.view().copy(), self.sample_rate)
+                    next_partial_samples = len(speech_buffer) + partial_interval_samples
+                
+                # 如果静音时长超过阈值或语音长度达到最大值，处理当前语音片段
+                if is_speech and (silence_counter >= max_silence_samples or speech_buffer.is_full):
+                    if self._close_segment(speech_buffer, seq, min_speech_samples, stream_samples) \
+                            and stitch_window_samples is not None:
+                        last_closed = seq
+                        last_close_samples = stream_samples
+                    # 重置状态
+                    is_speech = False
+                    speech_buffer.clear()
+                    silence_counter = 0
+                    if len(overflow):
+                        # 说话中途达到最大时长被强制切分：剩余样本作为下一段的开头，两段紧邻，交给问题拼接合并
+                        is_speech = True
+                        seq = self._open_segment(speech_buffer, last_closed, last_closed is not None)
+                        last_closed = None
+                        next_partial_samples = partial_interval_samples
+                        speech_buffer.append(overflow)
+                elif (last_closed is not None and not is_speech
+                        and stream_samples - last_close_samples > stitch_window_samples):
+                    # 拼接窗口内没有新的语音，上一段不会再有后续
+                    self.pipeline.settle(last_closed)
+                    last_closed = None
                 
-            except queue.Empty:
-                # 队列超时，继续循环
-                continue
             except Exception as e:
                 ErrorHandler.handle_error(e, "处理音频数据时出错", self.text_callback)
+        
+        if last_closed is not None:
+            self.pipeline.settle(last_closed)
+    
+    def _report_capture_status(self, ring: AudioRingBuffer, reported_status: int, reported_overflows: int):
+        """在处理线程中输出音频回调记录的状态和缓冲区溢出"""
+        if self.callback_status_count != reported_status:
+            logger.warning(f"音频回调状态: {self._last_callback_status}（累计{self.callback_status_count}次）")
+        if ring.overflows != reported_overflows:
+            logger.warning(f"音频缓冲区溢出，累计丢弃{ring.dropped_frames}帧（{ring.overflows}块）")
+    
+    def _open_segment(self, speech_buffer: SpeechBuffer, last_closed: Optional[int], linked: bool) -> int:
+        """
+        开始新的语音片段
+
+        参数:
+            speech_buffer: 语音缓冲区（会被清空）
+            last_closed: 等待判断是否有后续的上一个片段，没有时为None
+            linked: 上一个片段是否与本段相连（在拼接窗口内），否则确认其已结束
+
+        返回:
+            本段的序号（片段开始时预留，部分结果和最终结果使用同一序号）
+        """
+        speech_buffer.clear()
+        seq = self.pipeline.reserve()
+        if self.latency:
+            self.latency.start(seq)
+        if last_closed is not None:
+            if linked:
+                self.pipeline.link(last_closed, seq)
+            else:
+                self.pipeline.settle(last_closed)
+        return seq
+    
+    def _close_segment(
+        self,
+        speech_buffer: SpeechBuffer,
+        seq: int,
+        min_speech_samples: int,
+        stream_samples: int
+    ) -> bool:
+        """结束当前语音片段：足够长则提交流水线并返回True，否则放弃"""
+        if self.partial_transcriber:
+            self.partial_transcriber.finish(seq)
+        self._partial_texts.pop(seq, None)
+        self._speculation_armed.discard(seq)
+        if len(speech_buffer) >= min_speech_samples:
+            # 处理语音片段
+            speech_segment = speech_buffer.view()
+            # 标准化音频数据（生成新数组，缓冲区可以立即复用）
+            speech_segment = speech_segment / (np.max(np.abs(speech_segment)) + 1e-6)
+            self._trace(seq, "segment_close")
+            # 交给流水线转写，不等待网络；超过截止时间后不再重试或显示回答
+            utterance_deadline = RATE_LIMIT_SETTINGS.get('utterance_deadline')
+            self.pipeline.submit(
+                speech_segment,
+                self.sample_rate,
+                seq,
+                stream_samples / self.sample_rate,
+                deadline=time.monotonic() + utterance_deadline if utterance_deadline else None
+            )
+            return True
+        self.pipeline.skip(seq)
+        self._discard_segment(seq)
+        return False
+    
+    def _discard_segment(self, seq: int):
+        """片段被放弃（过短或因积压被丢弃）：清除临时文本和延迟追踪"""
+        self._clear_partial(seq)
+        if self.speculator:
+            self.speculator.cancel(seq)
+        if self.retriever:
+            self.retriever.cancel(seq)
+        if self.latency:
+            self.latency.discard(seq)
+    
+    def _trace(self, seq: Optional[int], stage: str):
+        """记录片段到达某个处理阶段的时间"""
+        if self.latency:
+            self.latency.mark(seq, stage)
+    
+    def _finish_trace(self, seq: Optional[int], pending: Optional[str] = None):
+        """片段不再有后续阶段，完成延迟追踪"""
+        if self.latency:
+            self.latency.finish(seq, pending)
+    
+    def mark_answer_rendered(self, seq: int):
+        """界面显示出回答的第一个字符时调用"""
+        self._trace(seq, "first_render")
+    
+    def export_latency(self) -> List[str]:
+        """把延迟分位数导出为JSON和CSV，返回生成的文件路径"""
+        path = LATENCY_SETTINGS.get('export_path')
+        if not self.latency or not path or not self.latency.percentiles()['utterance']['count']:
+            return []
+        paths = self.latency.export(path)
+        logger.info(f"延迟统计已导出: {', '.join(paths)}")
+        return paths
+    
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待文件音频源播放完毕，且所有语音片段都已转写和回答
+        
+        返回:
+            是否在超时前处理完毕
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.time())
+        
+        if hasattr(self, 'process_thread'):
+            self.process_thread.join(timeout=remaining())
+            if self.process_thread.is_alive():
+                return False
+        return self.pipeline.join(timeout=remaining()) if self.pipeline else True
                     
-    def transcribe_audio(self, audio_data: np.ndarray) -> Optional[str]:
-        """使用OpenAI Whisper API转写音频"""
+    def _transcribe_segment(self, segment: Segment) -> Optional[str]:
+        """流水线转写阶段：转写一个语音片段"""
+        text = self.transcribe_audio(segment.audio, segment.sample_rate, seq=segment.seq, deadline=segment.deadline)
+        self._trace(segment.seq, "transcript")
+        return text
+    
+    def _transcribe_partial(self, audio_data: np.ndarray, sample_rate: int) -> Optional[str]:
+        """使用本地faster-whisper模型转写正在增长的片段"""
+        # 线程参数与最终转写相同，两者使用同一模型时共用一份缓存，不会重复加载
+        model = get_whisper_model(
+            PARTIAL_SETTINGS.get('model', 'small'),
+            device=PARTIAL_SETTINGS.get('device', 'cpu'),
+            compute_type=PARTIAL_SETTINGS.get('compute_type', 'int8'),
+            **self._local_model_threads()
+        )
+        return transcribe_array(
+            model,
+            audio_data,
+            sample_rate,
+            language=WHISPER_SETTINGS.get('language', 'zh'),
+            initial_prompt=WHISPER_SETTINGS.get('prompt', None),
+            beam_size=PARTIAL_SETTINGS.get('beam_size', 1)
+        )
+    
+    def _show_partial(self, seq: int, text: str):
+        """发送片段的临时文本，空文本表示清除"""
+        if self.text_callback:
+            self.text_callback(f"<partial>{seq}:{text}")
+        if self.speculator and text:
+            self._partial_texts[seq] = text
+            # 停顿期间部分结果更新时，推测随之更新
+            if seq in self._speculation_armed:
+                self._speculate(seq, text)
+    
+    def _arm_speculation(self, seq: int):
+        """说话人停顿：此后用最新的部分转写结果推测回答"""
+        self._speculation_armed.add(seq)
+        text = self._partial_texts.get(seq)
+        if text:
+            self._speculate(seq, text)
+    
+    def _speculate(self, seq: int, text: str):
+        """部分转写结果看起来是问题时提前请求回答"""
+        text = text.strip()
+        if len(text) > 1 and self.is_question(text):
+            self.speculator.start(seq, text)
+    
+    def _clear_partial(self, seq: int):
+        """清除片段的临时文本"""
+        if self.partial_transcriber:
+            self._show_partial(seq, "")
+    
+    def _route_transcript(self, segment: Segment, text: Optional[str]) -> Optional[str]:
+        """流水线路由阶段：显示转写文本，返回需要回答的问题"""
+        question = self._route_text(segment, text)
+        if question is None and self.speculator:
+            # 最终结果不需要回答，推测作废
+            self.speculator.cancel(segment.seq)
+        return question
+    
+    def _route_text(self, segment: Segment, text: Optional[str]) -> Optional[str]:
+        """显示转写文本，判断是否为需要回答的问题"""
+        # 最终结果替换临时文本
+        self._clear_partial(segment.seq)
+        if text is None and self.latency:
+            # 转写失败的片段不计入延迟统计
+            self.latency.discard(segment.seq)
+        text = (text or "").strip()
+        if not self.text_callback or not text or len(text) <= 1:  # 只处理有意义的文本
+            self._finish_trace(segment.seq)
+            return None
+            
+        is_question = self.is_question(text)
+        self._trace(segment.seq, "classified")
+        if not is_question:
+            self.text_callback(f"文本: {text}\n")
+            self._finish_trace(segment.seq)
+            return None
+            
+        # 回答正在进行时的新问题交给回答调度器按策略排队、取消或并行处理
+        self.text_callback(f"问题: {text}\n")
+        if self.retriever:
+            # 检索与回答前的排队、缓存查找等工作并行进行
+            self.retriever.start(segment.seq, text)
+        return text
+    
+    def _answer_question(self, segment: Segment, question: str, task: Optional[AnswerTask] = None) -> str:
+        """流水线回答阶段：回答一个问题，task被取消时停止并关闭流"""
+        if task is not None and task.cancelled:
+            if self.retriever:
+                self.retriever.cancel(segment.seq)
+            self._finish_trace(segment.seq, pending="first_token")
+            return ""
+        self._answer_message(segment.seq, f"针对问题: {question}\n")
+        response = self.get_gpt_response(question, seq=segment.seq, task=task, deadline=segment.deadline)
+        # 出错或回答为空时不会有首字显示，在此完成追踪
+        self._finish_trace(segment.seq, pending="first_token")
+        return response
+        
+    def transcribe_audio(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: Optional[int] = None,
+        seq: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Optional[str]:
+        """使用OpenAI Whisper API转写音频，seq为延迟追踪使用的片段序号，deadline为截止时间"""
         return ErrorHandler.safe_execute(
             self._transcribe_audio,
             "转写音频时出错",
             self.text_callback,
-            audio_data=audio_data
+            audio_data=audio_data,
+            sample_rate=sample_rate,
+            seq=seq,
+            deadline=deadline
         )
     
-    def _transcribe_audio(self, audio_data: np.ndarray) -> Optional[str]:
+    def _transcribe_audio(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: Optional[int] = None,
+        seq: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Optional[str]:
         """内部方法：实际转写实现"""
-        # 将音频数据保存为临时文件
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            sf.write(temp_file.name, audio_data, self.sample_rate)
-            temp_filename = temp_file.name
-
-        try:
-            # 使用OpenAI客户端进行音频转写
-            with open(temp_filename, 'rb') as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model=WHISPER_SETTINGS['model'],
-                    file=audio_file,
-                    language=WHISPER_SETTINGS.get('language', 'zh'),
-                    prompt=WHISPER_SETTINGS.get('prompt', None),
-                    response_format="json"
-                )
-                return transcript.text.strip()
-        finally:
-            # 确保临时文件被删除
-            try:
-                os.unlink(temp_filename)
-            except Exception as e:
-                print(f"删除临时文件时出错: {e}")
+        sample_rate = sample_rate or self.sample_rate
+        if WHISPER_SETTINGS.get('backend', 'api') == 'local':
+            return self._transcribe_local(audio_data, sample_rate, seq)
         
-    def is_question(self, text: str) -> bool:
-        """检测文本是否为问题"""
-        # 添加更多的判断条件
+        # 在内存中下混、重采样并编码，避免临时文件的磁盘读写
+        encoded = encode_segment(
+            audio_data,
+            sample_rate,
+            codec=WHISPER_SETTINGS.get('upload_codec', 'flac'),
+            target_rate=WHISPER_SETTINGS.get('upload_sample_rate', 16000)
+        )
+        logger.info(
+            f"语音片段编码: {encoded.codec} {encoded.sample_rate}Hz, "
+            f"{len(audio_data) / sample_rate:.1f}秒 -> {encoded.size}字节, "
+            f"耗时{encoded.encode_time * 1000:.1f}ms"
+        )
         
-        # 1. 如果直接包含问号，肯定是问题
-        if "?" in text or "？" in text:
-            return True
-            
-        # 2. 检查常见问句关键词
-        question_keywords = QUESTION_KEYWORDS + [
-            "请", "能否", "可以", "怎样", "多少", "几个", "是不是", 
-            "有没有", "为啥", "咋", "有何", "哪些", "啥时", "干嘛"
-        ]
+        # 使用OpenAI客户端进行音频转写
+        self._trace(seq, "upload_start")
+        transcript = self._api_call(
+            "transcription",
+            lambda: self.client.audio.transcriptions.create(
+                model=WHISPER_SETTINGS['model'],
+                file=(encoded.filename, encoded.data),
+                language=WHISPER_SETTINGS.get('language', 'zh'),
+                prompt=WHISPER_SETTINGS.get('prompt', None),
+                response_format="json"
+            ),
+            deadline=deadline
+        )
+        self._trace(seq, "upload_end")
+        return transcript.text.strip()
+    
+    def _get_local_model(self):
+        """获取本地转写模型（进程内只加载一次）"""
+        return get_whisper_model(
+            WHISPER_SETTINGS.get('local_model', 'small'),
+            device=WHISPER_SETTINGS.get('local_device', 'cpu'),
+            compute_type=WHISPER_SETTINGS.get('local_compute_type', 'int8'),
+            **self._local_model_threads()
+        )
+    
+    @staticmethod
+    def _local_model_threads() -> dict:
+        """本地模型的线程参数（属于模型缓存键，部分转写与最终转写必须一致）"""
+        return {
+            'cpu_threads': WHISPER_SETTINGS.get('local_cpu_threads', 0),
+            'num_workers': PIPELINE_SETTINGS.get('transcribe_workers', 2),
+        }
+    
+    def _transcribe_local(self, audio_data: np.ndarray, sample_rate: int, seq: Optional[int] = None) -> str:
+        """使用本地faster-whisper模型直接转写内存中的float32音频"""
+        model = self._get_local_model()
+        # 本地推理没有上传，upload阶段记录的是推理耗时
+        self._trace(seq, "upload_start")
+        start = time.perf_counter()
+        text = transcribe_array(
+            model,
+            audio_data,
+            sample_rate,
+            language=WHISPER_SETTINGS.get('language', 'zh'),
+            initial_prompt=WHISPER_SETTINGS.get('prompt', None),
+            beam_size=WHISPER_SETTINGS.get('local_beam_size', 5),
+            **decode_options(WHISPER_SETTINGS)
+        )
+        self._trace(seq, "upload_end")
+        logger.info(
+            f"本地转写: {len(audio_data) / sample_rate:.1f}秒音频, "
+            f"耗时{(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return text
         
-        if any(keyword in text for keyword in question_keywords):
-            return True
-            
-        # 3. 检查特定的句式模式 (以"请"开头的指令)
-        if text.strip().startswith("请") and len(text) > 2:
-            return True
-            
-        # 4. 如果文本很长(超过15个字符)但没有任何问句特征，可能是陈述句
-        if len(text) > 15:
-            # 长文本但没有明显问句特征，可能是陈述或描述
-            return False
-            
-        # 5. 如果是较短的文本(<=15字符)且没有明显结束符，倾向于认为是问题
-        if len(text) <= 15 and not text.endswith(("。", "！", "~", "…")):
-            return True
-            
-        return False
+    def is_question(self, text: str) -> bool:
+        """检测文本是否为问题"""
+        return self.question_detector.is_question(text)
         
-    def get_gpt_response(self, question: str) -> str:
-        """获取GPT回答，使用流式输出"""
+    def get_gpt_response(
+        self,
+        question: str,
+        seq: Optional[int] = None,
+        task: Optional[AnswerTask] = None,
+        deadline: Optional[float] = None
+    ) -> str:
+        """获取GPT回答，使用流式输出，seq为延迟追踪和回答区域使用的片段序号，task用于取消，deadline为截止时间"""
         return ErrorHandler.safe_execute(
             self._get_gpt_response,
             "获取GPT回答时出错",
             self.text_callback,
             question=question,
+            seq=seq,
+            task=task,
+            deadline=deadline,
             default_return="抱歉，无法获取回答。"
         )
     
-    def _get_gpt_response(self, question: str) -> str:
+    def _get_gpt_response(
+        self,
+        question: str,
+        seq: Optional[int] = None,
+        task: Optional[AnswerTask] = None,
+        deadline: Optional[float] = None
+    ) -> str:
         """内部方法：实际GPT调用实现"""
+        # 依赖上文的追问（如"详细点"）不能使用按问题缓存的回答
+        use_cache = self.answer_cache is not None and not (self.memory and self.memory.is_follow_up(question))
+        cached = self.answer_cache.get(question) if use_cache else None
+        if cached is not None:
+            if self.speculator and seq is not None:
+                self.speculator.cancel(seq)
+            if self.retriever:
+                self.retriever.cancel(seq)
+            answer = self._replay_cached_answer(cached.answer, seq)
+            if self.memory:
+                self.memory.add(question, answer)
+            return answer
+        
+        # 片段结束前已根据部分转写结果提前请求时，直接采用推测结果
+        speculation = self.speculator.claim(seq, question) if self.speculator and seq is not None else None
+        
         # 先发送正在处理的提示
-        if self.text_callback:
-            self.text_callback("回答: ")
-            self.text_callback("<stream>🤔 正在思考...")
+        self._answer_message(seq, "回答: ")
+        self._answer_message(seq, "<stream>🤔 正在思考...")
+        
+        # 用于累积完整的回答
+        full_response = ""
+        
+        # 清除"正在思考"提示
+        self._answer_message(seq, "<stream>\r" + " " * 20 + "\r")  # 清除当前行
         
+        # 使用流式调用API
+        if speculation:
+            # 推测请求已按部分转写文本检索过资料
+            if self.retriever:
+                self.retriever.cancel(seq)
+            deltas = speculation.iter_tokens()
+            if task is not None:
+                task.add_closer(speculation.cancel)
+        else:
+            deltas = self._iter_completion(question, task, deadline, seq)
+        
+        # 增量按时间或字数合并后再发给界面，避免每个token一条消息
+        with StreamCoalescer(
+            lambda text: self._emit_stream(text, seq),
+            interval=STREAM_SETTINGS.get('flush_interval', 0.03),
+            max_chars=STREAM_SETTINGS.get('max_chars', 64)
+        ) as coalescer:
+            # 逐个处理流式响应的内容
+            try:
+                for content in deltas:
+                    if task is not None and task.cancelled:
+                        break
+                    if not full_response and seq is not None:
+                        self._trace(seq, "first_token")
+                        # 通知界面下一个显示的字符是回答的首字
+                        if self.text_callback:
+                            self.text_callback(f"<trace>{seq}")
+                    full_response += content
+                    coalescer.push(content)
+            except DeadlineExceeded as e:
+                # 限流或重试等待会超过截止时间，回答已经没有意义
+                logger.warning(f"放弃回答 #{seq}: {e}")
+                self._answer_message(seq, "<stream>（已超时，放弃回答）")
+                return ""
+            except Exception:
+                # 取消时流被关闭，读取中断是预期的
+                if task is None or not task.cancelled:
+                    raise
+        
+        if task is not None and task.cancelled:
+            logger.info(f"回答 #{seq} 已取消，已接收{len(full_response)}字")
+            self._answer_message(seq, "<stream>\n（已取消）")
+            return full_response
+        
+        self._trace(seq, "last_token")
+        if use_cache and full_response:
+            self.answer_cache.put(question, full_response)
+        if self.memory:
+            self.memory.add(question, full_response)
+        return full_response
+    
+    def _emit_stream(self, text: str, seq: Optional[int] = None):
+        """发送带有特殊标记的增量更新"""
+        self._answer_message(seq, f"<stream>{text}")
+    
+    def _answer_message(self, seq: Optional[int], text: str):
+        """发送回答区域的消息，带片段序号时加上<block:序号>前缀，界面据此把并行的回答分别显示"""
+        if self.text_callback:
+            self.text_callback(f"<block:{seq}>{text}" if seq is not None else text)
+    
+    def _completion_params(self, question: str, context: Optional[str] = None) -> dict:
+        """构造流式对话请求参数，context为检索到的知识库资料"""
         # 从GPT_SETTINGS中获取所有可用的参数
         completion_params = {
             'model': GPT_SETTINGS['model'],
             'messages': [
                 {"role": "system", "content": GPT_SETTINGS['system_prompt']},
+                *(self.memory.messages() if self.memory else []),
+                *([{"role": "system", "content": f"{RAG_SETTINGS['prompt']}\n\n{context}"}] if context else []),
                 {"role": "user", "content": question}
             ],
             'stream': True  # 启用流式输出
@@ -499,34 +1160,56 @@ class AudioProcessor:
         for param in optional_params:
             if param in GPT_SETTINGS:
                 completion_params[param] = GPT_SETTINGS[param]
-        
-        # 用于累积完整的回答
-        full_response = ""
-        
-        # 清除"正在思考"提示
-        if self.text_callback:
-            self.text_callback("<stream>\r" + " " * 20 + "\r")  # 清除当前行
-            time.sleep(0.1)  # 短暂停顿
-        
-        # 使用流式调用API
-        response = self.client.chat.completions.create(**completion_params)
-        
-        # 逐个处理流式响应的内容
+        return completion_params
+    
+    def _open_completion(self, question: str, deadline: Optional[float] = None, seq: Optional[int] = None):
+        """发起流式对话请求（经过限流和重试），返回可迭代的响应；启用知识库时先取截止时间内的检索结果"""
+        context = None
+        if self.retriever:
+            context = self.retriever.format_context(self.retriever.collect(question, seq).chunks) or None
+        params = self._completion_params(question, context)
+        return self._api_call(
+            "chat",
+            lambda: self.client.chat.completions.create(**params),
+            tokens=self._request_tokens(params),
+            deadline=deadline
+        )
+    
+    @staticmethod
+    def _chunk_content(chunk) -> Optional[str]:
+        """取出流式响应块中的文本增量"""
+        # 安全地检查是否有内容，避免索引错误
+        try:
+            if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
+                delta = chunk.choices[0].delta
+                if hasattr(delta, 'content') and delta.content:
+                    return delta.content
+        except (IndexError, AttributeError) as e:
+            logger.warning(f"处理流式响应块时出错: {e}")
+        return None
+    
+    def _iter_completion(
+        self,
+        question: str,
+        task: Optional[AnswerTask] = None,
+        deadline: Optional[float] = None,
+        seq: Optional[int] = None
+    ):
+        """逐个返回流式响应的文本增量，task被取消时关闭响应"""
+        response = self._open_completion(question, deadline, seq)
+        if task is not None:
+            task.add_closer(response.close)
         for chunk in response:
-            # 安全地检查是否有内容，避免索引错误
-            try:
-                if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
-                    delta = chunk.choices[0].delta
-                    if hasattr(delta, 'content') and delta.content:
-                        content = delta.content
-                        full_response += content
-                        # 发送带有特殊标记的增量更新
-                        if self.text_callback:
-                            self.text_callback(f"<stream>{content}")
-                        # 小延迟，避免过快刷新
-                        time.sleep(0.01)
-            except (IndexError, AttributeError) as e:
-                print(f"处理流式响应块时出错: {e}")
-                continue  # 跳过这个块，继续处理下一个
-        
-        return full_response 
\ No newline at end of file
+            content = self._chunk_content(chunk)
+            if content:
+                yield content
+    
+    def _replay_cached_answer(self, answer: str, seq: Optional[int] = None) -> str:
+        """通过相同的流式通道立即输出缓存的回答"""
+        self._trace(seq, "first_token")
+        self._answer_message(seq, "回答: ")
+        if self.text_callback and seq is not None:
+            self.text_callback(f"<trace>{seq}")
+        self._answer_message(seq, f"<stream>{answer}")
+        self._trace(seq, "last_token")
+        return answer 
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+音频编码模块，在内存中把语音片段编码为上传用的压缩格式
+"""
+
+import io
+import time
+from typing import NamedTuple
+
+import numpy as np
+import soundfile as sf
+
+from .resample import resample_poly
+
+# 编解码器名称 -> (容器格式, 子类型, 上传文件名)
+CODECS = {
+    "wav": ("WAV", "PCM_16", "segment.wav"),
+    "flac": ("FLAC", "PCM_16", "segment.flac"),
+    "opus": ("OGG", "OPUS", "segment.ogg"),
+}
+
+
+class EncodedSegment(NamedTuple):
+    """编码后的语音片段"""
+    data: bytes          # 编码后的字节
+    filename: str        # 上传时使用的文件名（决定服务端识别的格式）
+    codec: str           # 实际使用的编解码器
+    sample_rate: int     # 编码采样率
+    encode_time: float   # 下混、重采样和编码的总耗时（秒）
+
+    @property
+    def size(self) -> int:
+        """编码后的字节数"""
+        return len(self.data)
+
+
+def is_codec_available(codec: str) -> bool:
+    """检查当前libsndfile是否支持指定编解码器"""
+    if codec not in CODECS:
+        return False
+    container, subtype, _ = CODECS[codec]
+    return subtype in sf.available_subtypes(container)
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """把(帧数, 声道数)的音频下混为一维单声道"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    return audio
+
+
+def encode_segment(
+    audio: np.ndarray,
+    sample_rate: int,
+    codec: str = "flac",
+    target_rate: int = 16000
+) -> EncodedSegment:
+    """
+    下混、重采样并在内存中编码语音片段
+
+    参数:
+        audio: 语音数据，一维或(帧数, 声道数)
+        sample_rate: 语音数据的采样率
+        codec: 编解码器（"wav"、"flac"、"opus"），不可用时回退到FLAC
+        target_rate: 编码采样率
+
+    返回:
+        编码结果
+    """
+    start = time.perf_counter()
+    if not is_codec_available(codec):
+        codec = "flac" if is_codec_available("flac") else "wav"
+    container, subtype, filename = CODECS[codec]
+
+    mono = resample_poly(to_mono(audio), sample_rate, target_rate)
+    # 限幅，避免转为16位整数时溢出
+    np.clip(mono, -1.0, 1.0, out=mono)
+
+    buffer = io.BytesIO()
+    sf.write(buffer, mono, target_rate, format=container, subtype=subtype)
+    return EncodedSegment(
+        data=buffer.getvalue(),
+        filename=filename,
+        codec=codec,
+        sample_rate=target_rate,
+        encode_time=time.perf_counter() - start
+    )
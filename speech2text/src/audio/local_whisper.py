@@ -0,0 +1,109 @@
+"""
+本地faster-whisper模型模块，按进程缓存模型并直接转写内存中的音频
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..utils.error_handler import logger
+from .encoder import to_mono
+from .resample import resample_poly
+
+# faster-whisper要求的输入采样率
+WHISPER_SAMPLE_RATE = 16000
+
+# (模型, 设备, 计算类型, CPU线程数, 并行数) -> WhisperModel，进程内只加载一次
+_models: Dict[Tuple[str, str, str, int, int], object] = {}
+_models_lock = threading.Lock()
+
+# WHISPER_SETTINGS中的解码参数 -> WhisperModel.transcribe参数
+DECODE_OPTIONS = {
+    'temperature': 'temperature',
+    'compression_ratio_threshold': 'compression_ratio_threshold',
+    'logprob_threshold': 'log_prob_threshold',
+    'no_speech_threshold': 'no_speech_threshold',
+}
+
+
+def get_whisper_model(
+    model: str,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    cpu_threads: int = 0,
+    num_workers: int = 1
+):
+    """
+    获取（必要时加载）faster-whisper模型
+
+    参数:
+        model: 模型名称（如"small"）或本地模型目录
+        device: 运行设备（"cpu"、"cuda"、"auto"）
+        compute_type: 计算类型（如"int8"、"int8_float16"、"float16"）
+        cpu_threads: CPU推理线程数，0表示使用默认值
+        num_workers: 允许并行转写的数量，与转写线程数一致时多个片段不必排队
+
+    返回:
+        WhisperModel实例
+    """
+    key = (model, device, compute_type, cpu_threads, num_workers)
+    with _models_lock:
+        if key not in _models:
+            from faster_whisper import WhisperModel
+            logger.info(f"加载本地Whisper模型: {model} ({device}, {compute_type})")
+            start = time.perf_counter()
+            _models[key] = WhisperModel(
+                model,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers
+            )
+            logger.info(f"本地Whisper模型加载完成，耗时{time.perf_counter() - start:.1f}秒")
+        return _models[key]
+
+
+def decode_options(settings: dict) -> dict:
+    """从WHISPER_SETTINGS中提取faster-whisper支持的解码参数"""
+    return {
+        option: settings[key]
+        for key, option in DECODE_OPTIONS.items()
+        if key in settings
+    }
+
+
+def transcribe_array(
+    model,
+    audio: np.ndarray,
+    sample_rate: int,
+    language: Optional[str] = "zh",
+    initial_prompt: Optional[str] = None,
+    beam_size: int = 1,
+    **options
+) -> str:
+    """
+    直接转写内存中的音频，不经过文件
+
+    参数:
+        model: WhisperModel实例
+        audio: 音频数据，一维或(帧数, 声道数)
+        sample_rate: 音频采样率
+        language: 语言代码
+        initial_prompt: 提示词
+        beam_size: 束搜索宽度，部分结果使用1以降低延迟
+        options: 其他传给WhisperModel.transcribe的参数
+
+    返回:
+        转写文本
+    """
+    samples = resample_poly(to_mono(audio), sample_rate, WHISPER_SAMPLE_RATE)
+    segments, _ = model.transcribe(
+        samples,
+        language=language,
+        initial_prompt=initial_prompt,
+        beam_size=beam_size,
+        **options
+    )
+    return "".join(segment.text for segment in segments).strip()
@@ -0,0 +1,101 @@
+"""
+部分转写模块，在说话过程中周期性转写正在增长的语音片段
+"""
+
+import threading
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from ..utils.error_handler import ErrorHandler
+
+
+class PartialTranscriber:
+    """部分结果转写器
+
+    分段线程每隔固定时长提交一次当前片段的快照，后台线程只转写最新的
+    快照（旧快照直接被覆盖），并通过回调发送临时文本。片段结束后，
+    该片段迟到的部分结果会被丢弃，由最终转写结果替换临时文本。
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray, int], Optional[str]],
+        callback: Callable[[int, str], Any],
+        error_callback: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        参数:
+            transcribe: 转写函数，输入(音频, 采样率)，返回文本
+            callback: 部分结果回调，输入(片段序号, 临时文本)
+            error_callback: 错误消息回调
+        """
+        self.transcribe = transcribe
+        self.callback = callback
+        self.error_callback = error_callback
+        self.is_running = False
+        self._pending = None
+        self._closed_seq = -1
+        self._last_text = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台转写线程"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._worker, name="partial-transcribe", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止后台线程"""
+        self.is_running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def update(self, seq: int, audio: np.ndarray, sample_rate: int):
+        """提交片段的最新快照（调用方之后不得再修改audio）"""
+        with self._lock:
+            if seq <= self._closed_seq:
+                return
+            self._pending = (seq, audio, sample_rate)
+        self._wakeup.set()
+
+    def finish(self, seq: int):
+        """标记片段已结束，此后不再发送该片段的部分结果"""
+        with self._lock:
+            self._closed_seq = max(self._closed_seq, seq)
+            if self._pending and self._pending[0] <= seq:
+                self._pending = None
+            self._last_text.pop(seq, None)
+
+    def _worker(self):
+        """后台线程：转写最新快照并发送部分结果"""
+        while self.is_running:
+            self._wakeup.wait(timeout=0.5)
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if not pending:
+                continue
+
+            seq, audio, sample_rate = pending
+            text = ErrorHandler.safe_execute(
+                self.transcribe,
+                "部分转写出错",
+                self.error_callback,
+                None,
+                audio,
+                sample_rate
+            )
+            if not text:
+                continue
+            with self._lock:
+                # 在锁内检查并发送，保证片段结束后不会再出现临时文本
+                if seq > self._closed_seq and self._last_text.get(seq) != text:
+                    self._last_text[seq] = text
+                    self.callback(seq, text)
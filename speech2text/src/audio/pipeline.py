@@ -0,0 +1,345 @@
+"""
+语音处理流水线模块，把分段、转写、问题路由和回答解耦到独立线程
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+import numpy as np
+
+from ..llm.scheduler import AnswerScheduler, AnswerTask
+from ..llm.stitcher import QuestionStitcher
+from ..utils.error_handler import ErrorHandler, logger
+
+
+class Segment(NamedTuple):
+    """一个已结束的语音片段"""
+    seq: int               # 递增序号，用于保证输出顺序
+    audio: np.ndarray      # 片段音频（流水线独占的副本）
+    sample_rate: int       # 片段采样率
+    end_time: float        # 片段结束时的音频流时间（秒，从开始录音算起）
+    deadline: Optional[float] = None   # 转写和回答的截止时间（time.monotonic()），超过后结果已无用
+
+
+class SpeechPipeline:
+    """分段 -> 转写线程池 -> 问题路由 -> 回答调度 的多级流水线
+
+    各级之间使用有界队列。分段队列写满时丢弃最旧的片段而不是阻塞，
+    因此音频采集永远不会等待网络；转写结果按序号重排后再路由，
+    保证显示顺序与说话顺序一致。回答由AnswerScheduler按策略排队、取消或并行执行。
+
+    提供stitcher时，看起来没说完的转写结果先暂缓路由：处理线程通过link()告知下一段在拼接窗口内开始，
+    两段合并后作为一个片段路由；通过settle()告知窗口内没有新的语音时，暂缓的结果单独路由。
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[Segment], Optional[str]],
+        route: Callable[[Segment, str], Optional[str]],
+        answer: Callable[[Segment, str, AnswerTask], Any],
+        transcribe_workers: int = 2,
+        segment_queue_size: int = 8,
+        answer_queue_size: int = 4,
+        error_callback: Optional[Callable[[str], Any]] = None,
+        discard: Optional[Callable[[int], Any]] = None,
+        answer_policy: str = "queue",
+        max_parallel_answers: int = 2,
+        stitcher: Optional[QuestionStitcher] = None
+    ):
+        """
+        参数:
+            transcribe: 转写函数，输入片段，返回文本
+            route: 路由函数，输入片段和文本（转写失败时为None），返回需要回答的问题（不需要回答时返回None）
+            answer: 回答函数，输入片段、问题和调度任务（用于检查取消和登记关闭函数）
+            transcribe_workers: 转写线程数
+            segment_queue_size: 待转写片段队列容量
+            answer_queue_size: 待回答问题队列容量
+            error_callback: 错误消息回调
+            discard: 片段因积压或被新问题取代而丢弃时的回调，输入片段序号
+            answer_policy: 回答调度策略（queue/cancel/parallel）
+            max_parallel_answers: parallel策略下同时进行的回答数
+            stitcher: 跨片段的问题拼接，为None时每个片段单独路由
+        """
+        self.transcribe = transcribe
+        self.route = route
+        self.answer = answer
+        self.discard = discard
+        self.transcribe_workers = max(1, transcribe_workers)
+        self.error_callback = error_callback
+
+        self.segment_queue = queue.Queue(maxsize=segment_queue_size)
+        # 转写结果队列同样有界，路由阻塞时反压到转写线程
+        self.result_queue = queue.Queue(maxsize=segment_queue_size + self.transcribe_workers)
+        self.scheduler = AnswerScheduler(
+            self._run_answer,
+            policy=answer_policy,
+            max_parallel=max_parallel_answers,
+            queue_size=answer_queue_size,
+            on_done=lambda task: self._task_done(),
+            on_drop=self._drop_answer,
+            error_callback=error_callback
+        )
+
+        self.stitcher = stitcher
+        # 暂缓路由的(片段, 文本)，以及处理线程给出的时间信号：下一段序号 -> 前一段序号，和确定没有后续的序号
+        self._held = None
+        self._links = {}
+        self._settled = set()
+        self.stitched_segments = 0
+
+        self.is_running = False
+        self.dropped_segments = 0
+        self._next_seq = 0
+        self._skipped = set()
+        self._seq_lock = threading.Lock()
+        # 已提交但尚未处理完（路由完毕，或回答完毕）的片段数
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """启动所有工作线程"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._threads = [
+            threading.Thread(target=self._transcribe_worker, name=f"transcribe-{i}", daemon=True)
+            for i in range(self.transcribe_workers)
+        ]
+        self._threads.append(threading.Thread(target=self._route_worker, name="router", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        self.scheduler.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止所有工作线程并丢弃未处理的数据"""
+        self.is_running = False
+        deadline = time.time() + timeout
+        self.scheduler.stop(timeout=max(0.0, deadline - time.time()))
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        self._threads = []
+        for q in (self.segment_queue, self.result_queue):
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+        self._held = None
+        with self._seq_lock:
+            self._links.clear()
+            self._settled.clear()
+        with self._idle:
+            self._in_flight = 0
+            self._idle.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有已提交的片段处理完毕
+
+        返回:
+            是否在超时前全部处理完毕
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def _task_done(self):
+        """一个片段处理完毕"""
+        with self._idle:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def reserve(self) -> int:
+        """预留下一个片段序号（片段开始时调用，用于关联部分转写结果）"""
+        with self._seq_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            return seq
+
+    def skip(self, seq: int):
+        """放弃一个已预留但不会提交的序号，避免路由线程等待它"""
+        with self._seq_lock:
+            self._skipped.add(seq)
+
+    def link(self, seq: int, next_seq: int):
+        """处理线程：片段next_seq在前一片段seq结束后的拼接窗口内开始"""
+        with self._seq_lock:
+            self._links[next_seq] = seq
+
+    def settle(self, seq: int):
+        """处理线程：片段seq结束后拼接窗口内没有新的语音"""
+        with self._seq_lock:
+            self._settled.add(seq)
+
+    def submit(
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        seq: Optional[int] = None,
+        end_time: float = 0.0,
+        deadline: Optional[float] = None
+    ) -> int:
+        """
+        提交一个语音片段，不会阻塞
+
+        参数:
+            audio: 片段音频，调用方之后不得再修改
+            sample_rate: 采样率
+            seq: 通过reserve()预留的序号，为None时自动分配
+            end_time: 片段结束时的音频流时间（秒）
+            deadline: 转写和回答的截止时间（time.monotonic()）
+
+        返回:
+            片段序号
+        """
+        if seq is None:
+            seq = self.reserve()
+        segment = Segment(seq, audio, sample_rate, end_time, deadline)
+        with self._idle:
+            self._in_flight += 1
+
+        while True:
+            try:
+                self.segment_queue.put_nowait(segment)
+                return seq
+            except queue.Full:
+                # 丢弃最旧的片段，并跳过其序号，避免路由线程一直等待
+                try:
+                    oldest = self.segment_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped_segments += 1
+                logger.warning(f"转写积压，丢弃语音片段 #{oldest.seq}")
+                self.skip(oldest.seq)
+                self._task_done()
+                if self.discard:
+                    self.discard(oldest.seq)
+
+    def _put_result(self, result: tuple):
+        """把结果放入重排队列，队列满时等待但可随停止退出"""
+        while self.is_running:
+            try:
+                self.result_queue.put(result, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _transcribe_worker(self):
+        """转写线程：从片段队列取出片段并转写"""
+        while self.is_running:
+            try:
+                segment = self.segment_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            text = ErrorHandler.safe_execute(
+                self.transcribe,
+                "转写线程出错",
+                self.error_callback,
+                None,
+                segment
+            )
+            self._put_result((segment, text))
+
+    def _route_worker(self):
+        """路由线程：按序号重排转写结果，拼接没说完的问题，识别问题并交给回答线程"""
+        pending = {}
+        expected = 0
+        while self.is_running:
+            try:
+                # 有暂缓的结果时更频繁地检查处理线程的时间信号
+                segment, text = self.result_queue.get(timeout=0.05 if self._held else 0.2)
+                pending[segment.seq] = (segment, text)
+            except queue.Empty:
+                pass
+
+            while True:
+                with self._seq_lock:
+                    skipped = expected in self._skipped
+                    self._skipped.discard(expected)
+                if skipped:
+                    # 后续片段被放弃（过短或积压），暂缓的结果不会再有下文
+                    expected += 1
+                    self._release_held()
+                    continue
+                if expected not in pending:
+                    break
+                segment, text = pending.pop(expected)
+                expected += 1
+                self._stitch(segment, text)
+
+            if self._held is not None:
+                with self._seq_lock:
+                    settled = self._held[0].seq in self._settled
+                if settled:
+                    self._release_held()
+
+    def _stitch(self, segment: Segment, text: Optional[str]):
+        """与暂缓的前一段合并，或在本段看起来没说完时暂缓"""
+        if self._held is not None:
+            held_segment, held_text = self._held
+            with self._seq_lock:
+                continued = self._links.get(segment.seq) == held_segment.seq
+            if continued and text and text.strip():
+                self._held = None
+                text = self.stitcher.join(held_text, text)
+                self.stitched_segments += 1
+                logger.info(f"片段 #{held_segment.seq} 与 #{segment.seq} 拼接为一个问题")
+                # 前一段并入本段，不再单独处理
+                if self.discard:
+                    self.discard(held_segment.seq)
+                self._task_done()
+            else:
+                self._release_held()
+        with self._seq_lock:
+            self._links.pop(segment.seq, None)
+            self._settled.discard(segment.seq - 1)
+            settled = segment.seq in self._settled
+        if (self.stitcher is not None and text and not settled
+                and self.stitcher.is_incomplete(text)):
+            self._held = (segment, text)
+            return
+        self._route(segment, text)
+
+    def _release_held(self):
+        """暂缓的结果没有后续，单独路由"""
+        if self._held is None:
+            return
+        segment, text = self._held
+        self._held = None
+        with self._seq_lock:
+            self._settled.discard(segment.seq)
+        self._route(segment, text)
+
+    def _route(self, segment: Segment, text: Optional[str]):
+        """路由一个（可能已拼接的）转写结果"""
+        question = ErrorHandler.safe_execute(
+            self.route,
+            "路由转写结果时出错",
+            self.error_callback,
+            None,
+            segment,
+            text
+        )
+        if question:
+            self._put_answer((segment, question))
+        else:
+            self._task_done()
+
+    def _put_answer(self, item: tuple):
+        """把(片段, 问题)交给回答调度器，排队已满时等待但可随停止退出"""
+        segment, _ = item
+        if self.scheduler.submit(segment.seq, item) is None:
+            self._task_done()
+
+    def _run_answer(self, task: AnswerTask):
+        """调度器回答线程：回答一个问题"""
+        segment, question = task.item
+        self.answer(segment, question, task)
+
+    def _drop_answer(self, task: AnswerTask):
+        """问题在开始回答前被新问题取代"""
+        if self.discard:
+            self.discard(task.seq)
@@ -0,0 +1,161 @@
+"""
+重采样模块，提供基于窗函数sinc的多相重采样
+"""
+
+from math import gcd
+
+import numpy as np
+
+
+def design_polyphase_filter(up: int, down: int, half_taps: int = 16, beta: float = 8.0) -> np.ndarray:
+    """
+    设计多相抗混叠滤波器组
+
+    参数:
+        up: 上采样倍数
+        down: 下采样倍数
+        half_taps: 每个相位单侧的抽头数
+        beta: Kaiser窗参数
+
+    返回:
+        形状为(up, 2*half_taps)的滤波器组，第p行对应小数相位p/up
+    """
+    # 截止频率取输入、输出奈奎斯特频率中较低者
+    cutoff = min(1.0, up / down)
+    offsets = np.arange(-half_taps + 1, half_taps + 1)
+    phases = np.arange(up)[:, None] / up
+    # x为每个抽头相对于输出时刻的距离（以输入采样为单位）
+    x = offsets[None, :] - phases
+    window = np.kaiser(2 * half_taps + 1, beta)
+    # 按距离在Kaiser窗上插值，得到与相位对齐的窗值
+    window_values = np.interp(x, np.arange(-half_taps, half_taps + 1), window)
+    taps = cutoff * np.sinc(cutoff * x) * window_values
+    # 每个相位单独归一化，保证直流增益为1
+    taps /= taps.sum(axis=1, keepdims=True)
+    return taps.astype(np.float32)
+
+
+def rational_ratio(src_rate: int, dst_rate: int) -> tuple:
+    """返回约分后的(上采样倍数, 下采样倍数)"""
+    divisor = gcd(int(src_rate), int(dst_rate))
+    return int(dst_rate) // divisor, int(src_rate) // divisor
+
+
+def resample_poly(audio: np.ndarray, src_rate: int, dst_rate: int, half_taps: int = 16) -> np.ndarray:
+    """
+    一次性对整段一维音频进行多相重采样
+
+    参数:
+        audio: 一维float音频
+        src_rate: 原采样率
+        dst_rate: 目标采样率
+        half_taps: 每个相位单侧的抽头数
+
+    返回:
+        float32重采样结果
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    if src_rate == dst_rate or len(audio) == 0:
+        return audio
+    up, down = rational_ratio(src_rate, dst_rate)
+    taps = design_polyphase_filter(up, down, half_taps)
+    # 两端补零，使所有抽头都落在数组内
+    padded = np.concatenate([
+        np.zeros(half_taps, dtype=np.float32), audio, np.zeros(half_taps, dtype=np.float32)
+    ])
+    output_length = (len(audio) * up) // down
+    output = np.empty(output_length, dtype=np.float32)
+    offsets = np.arange(-half_taps + 1, half_taps + 1)
+    # 分块计算，限制(输出数 × 抽头数)临时矩阵的大小
+    block = 8192
+    for start in range(0, output_length, block):
+        n = np.arange(start, min(start + block, output_length))
+        position = n * down
+        base = position // up
+        phase = position % up
+        index = base[:, None] + offsets[None, :] + half_taps
+        output[start:start + len(n)] = np.einsum("ij,ij->i", padded[index], taps[phase])
+    return output
+
+
+class StreamingResampler:
+    """
+    有状态的流式多相重采样器
+
+    逐块输入任意长度的一维音频，块之间保留滤波器所需的历史样本和输出相位，
+    因此分块结果与对整段音频调用resample_poly完全一致，块边界处没有不连续。
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, half_taps: int = 16):
+        self.src_rate = int(src_rate)
+        self.dst_rate = int(dst_rate)
+        self.half_taps = half_taps
+        self.up, self.down = rational_ratio(self.src_rate, self.dst_rate)
+        self.taps = design_polyphase_filter(self.up, self.down, half_taps)
+        self.offsets = np.arange(-half_taps + 1, half_taps + 1)
+        self.reset()
+
+    @property
+    def passthrough(self) -> bool:
+        """采样率相同时不做重采样"""
+        return self.src_rate == self.dst_rate
+
+    def reset(self):
+        """清空历史状态，开始新的音频流"""
+        # 缓冲区第一个样本对应的输入下标，开头补half_taps个零
+        self._buffer_start = -self.half_taps
+        self._buffer = np.zeros(self.half_taps, dtype=np.float32)
+        self._input_samples = 0
+        self._next_output = 0
+
+    def _output_count(self, available_end: int) -> int:
+        """输入样本下标小于available_end时，可以计算的输出总数"""
+        # 输出n需要输入下标 floor(n*down/up) + half_taps < available_end
+        last_base = available_end - self.half_taps - 1
+        if last_base < 0:
+            return 0
+        return ((last_base + 1) * self.up - 1) // self.down + 1
+
+    def _produce(self, output_end: int) -> np.ndarray:
+        """计算从_next_output到output_end的输出，并丢弃不再需要的历史样本"""
+        n = np.arange(self._next_output, max(self._next_output, output_end))
+        position = n * self.down
+        base = position // self.up
+        phase = position % self.up
+        index = base[:, None] + self.offsets[None, :] - self._buffer_start
+        output = np.einsum("ij,ij->i", self._buffer[index], self.taps[phase]).astype(np.float32)
+        self._next_output += len(n)
+
+        # 下一个输出最早需要的输入下标
+        keep_from = (self._next_output * self.down) // self.up - self.half_taps + 1
+        drop = max(0, keep_from - self._buffer_start)
+        if drop:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+        return output
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """
+        输入一块一维音频，返回当前可以确定的重采样输出
+
+        参数:
+            audio: 一维float音频块
+
+        返回:
+            float32输出，长度随块边界的相位略有变化
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return audio.copy()
+        self._input_samples += len(audio)
+        self._buffer = np.concatenate([self._buffer, audio])
+        return self._produce(self._output_count(self._buffer_start + len(self._buffer)))
+
+    def flush(self) -> np.ndarray:
+        """音频流结束：补零输出剩余样本，并重置状态"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, np.zeros(self.half_taps, dtype=np.float32)])
+        output = self._produce((self._input_samples * self.up) // self.down)
+        self.reset()
+        return output
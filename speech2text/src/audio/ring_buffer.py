@@ -0,0 +1,129 @@
+"""
+单生产者单消费者环形缓冲区，音频回调只做一次内存拷贝
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """预分配的SPSC音频环形缓冲区
+
+    生产者（音频回调线程）只写入数据并推进写游标，消费者（处理线程）只读取数据
+    并推进读游标，两个游标各自只有一个线程修改，因此不需要锁，也不会在实时线程上
+    分配内存或唤醒其他线程。游标是累计帧数，已用空间为两者之差。
+    空间不足时实时生产者丢弃整块并计数，非实时生产者（如文件回放）等待消费者。
+    """
+
+    def __init__(self, capacity: int, channels: int = 1):
+        """
+        参数:
+            capacity: 容量（帧数）
+            channels: 声道数
+        """
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self._data = np.zeros((self.capacity, self.channels), dtype=np.float32)
+        self._write = 0
+        self._read = 0
+        self._closed = False
+        # 空间不足时丢弃的块数和帧数
+        self.overflows = 0
+        self.dropped_frames = 0
+
+    @classmethod
+    def for_duration(cls, duration: float, sample_rate: int, channels: int = 1) -> "AudioRingBuffer":
+        """按时长创建缓冲区"""
+        return cls(max(1, int(duration * sample_rate)), channels)
+
+    @property
+    def available(self) -> int:
+        """可读取的帧数"""
+        return self._write - self._read
+
+    @property
+    def free(self) -> int:
+        """可写入的帧数"""
+        return self.capacity - (self._write - self._read)
+
+    def close(self):
+        """关闭缓冲区，释放等待空间的生产者"""
+        self._closed = True
+
+    def reset(self):
+        """清空缓冲区（只能在生产者和消费者都停止后调用）"""
+        self._write = 0
+        self._read = 0
+        self._closed = False
+
+    def write(self, block: np.ndarray, wait: bool = False, poll_interval: float = 0.002) -> bool:
+        """
+        生产者：把(帧数, 声道数)的音频块拷贝进缓冲区
+
+        参数:
+            block: 音频块
+            wait: 空间不足时是否等待消费者（实时回调中必须为False）
+            poll_interval: 等待时的轮询间隔（秒）
+
+        返回:
+            是否写入成功，失败时整块被丢弃并计入overflows
+        """
+        frames = len(block)
+        if frames > self.capacity:
+            block = block[-self.capacity:]
+            frames = self.capacity
+        while frames > self.free:
+            if not wait or self._closed:
+                self.overflows += 1
+                self.dropped_frames += frames
+                return False
+            time.sleep(poll_interval)
+
+        start = self._write % self.capacity
+        first = min(frames, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        if first < frames:
+            self._data[:frames - first] = block[first:]
+        # 数据写完后再发布写游标，消费者不会读到未写完的数据
+        self._write += frames
+        return True
+
+    def read(self, max_frames: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        消费者：取出最多max_frames帧（新数组），没有数据时返回None
+        """
+        frames = self.available
+        if max_frames is not None:
+            frames = min(frames, max_frames)
+        if frames <= 0:
+            return None
+        start = self._read % self.capacity
+        first = min(frames, self.capacity - start)
+        if first == frames:
+            block = self._data[start:start + frames].copy()
+        else:
+            block = np.concatenate([self._data[start:], self._data[:frames - first]])
+        # 拷贝完成后再释放空间
+        self._read += frames
+        return block
+
+    def wait_read(
+        self,
+        max_frames: Optional[int] = None,
+        timeout: float = 0.5,
+        poll_interval: float = 0.01
+    ) -> Optional[np.ndarray]:
+        """
+        消费者：轮询等待数据（唤醒由消费者自己完成，生产者不需要通知）
+
+        返回:
+            音频块，超时时返回None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            block = self.read(max_frames)
+            if block is not None or time.monotonic() >= deadline:
+                return block
+            time.sleep(poll_interval)
@@ -0,0 +1,175 @@
+"""
+音频源模块，统一实时设备和音频文件的采集接口
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+
+import numpy as np
+import soundfile as sf
+
+# 回调签名与sounddevice一致：callback(indata, frames, time, status)
+AudioCallback = Callable[[np.ndarray, int, Any, Any], None]
+
+
+class AudioSource(ABC):
+    """音频源基类
+
+    音频源以固定块大小把(帧数, 声道数)的float32数据推送给回调，
+    支持with语句自动启动和停止。
+    """
+
+    def __init__(self, sample_rate: int, channels: int, block_duration: float = 0.1):
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.block_duration = block_duration
+        self.callback: Optional[AudioCallback] = None
+
+    @property
+    def blocksize(self) -> int:
+        """每块的帧数"""
+        return int(self.sample_rate * self.block_duration)
+
+    @property
+    def is_finished(self) -> bool:
+        """音频源是否已经没有更多数据（实时设备永远返回False）"""
+        return False
+
+    @property
+    def is_realtime(self) -> bool:
+        """是否为实时音频源（回调在实时线程上，不能阻塞）"""
+        return True
+
+    @property
+    def name(self) -> str:
+        """音频源名称，用于显示"""
+        return type(self).__name__
+
+    @abstractmethod
+    def start(self, callback: AudioCallback):
+        """开始推送音频"""
+
+    @abstractmethod
+    def stop(self):
+        """停止推送音频"""
+
+    def __enter__(self):
+        if self.callback is None:
+            raise ValueError("启动音频源前需要设置callback")
+        self.start(self.callback)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class DeviceSource(AudioSource):
+    """sounddevice实时输入设备"""
+
+    def __init__(
+        self,
+        device: int,
+        sample_rate: int,
+        channels: int,
+        block_duration: float = 0.1,
+        extra_settings: Optional[dict] = None,
+        device_name: str = ""
+    ):
+        super().__init__(sample_rate, channels, block_duration)
+        self.device = device
+        self.extra_settings = extra_settings
+        self.device_name = device_name
+        self._stream = None
+
+    @property
+    def name(self) -> str:
+        return self.device_name or f"设备 {self.device}"
+
+    def start(self, callback: AudioCallback):
+        import sounddevice as sd
+        stream_config = {
+            'device': self.device,
+            'channels': self.channels,
+            'samplerate': self.sample_rate,
+            'callback': callback,
+            'blocksize': self.blocksize
+        }
+        if self.extra_settings:
+            stream_config['extra_settings'] = self.extra_settings
+        self._stream = sd.InputStream(**stream_config)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class FileSource(AudioSource):
+    """WAV/FLAC等音频文件回放
+
+    speed为1时按实时速度推送，为N时按N倍速推送，为0时尽可能快地推送。
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, block_duration: float = 0.1):
+        info = sf.info(path)
+        super().__init__(info.samplerate, info.channels, block_duration)
+        self.path = path
+        self.speed = speed
+        self.duration = info.duration
+        self.delivered_frames = 0
+        self._finished = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def name(self) -> str:
+        return str(self.path)
+
+    @property
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def is_realtime(self) -> bool:
+        # 回放线程可以等待消费者，快速回放时不会丢失音频
+        return False
+
+    def start(self, callback: AudioCallback):
+        self.callback = callback
+        self._finished.clear()
+        self._stopping.clear()
+        self.delivered_frames = 0
+        self._thread = threading.Thread(target=self._play, name="file-source", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待文件播放完毕"""
+        return self._finished.wait(timeout)
+
+    def _play(self):
+        """后台线程：按设定速度把文件分块推送给回调"""
+        start = time.perf_counter()
+        try:
+            for block in sf.blocks(self.path, blocksize=self.blocksize, dtype='float32', always_2d=True):
+                if self._stopping.is_set():
+                    break
+                if self.speed > 0:
+                    # 按音频时间控制推送节奏
+                    due = start + self.delivered_frames / self.sample_rate / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.callback(block, len(block), None, None)
+                self.delivered_frames += len(block)
+        finally:
+            self._finished.set()
@@ -0,0 +1,65 @@
+"""
+语音缓冲区模块，使用预分配的float32数组累积语音片段
+"""
+
+import numpy as np
+
+
+class SpeechBuffer:
+    """预分配的语音片段缓冲区
+
+    按最大录音时长一次性分配float32数组，音频块通过切片赋值追加，
+    片段结束时直接返回底层数组的视图，避免逐样本装箱为Python对象。
+    """
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓冲区
+
+        参数:
+            capacity: 最多可容纳的样本数
+        """
+        self._data = np.zeros(max(1, int(capacity)), dtype=np.float32)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def capacity(self) -> int:
+        """缓冲区总容量（样本数）"""
+        return len(self._data)
+
+    @property
+    def remaining(self) -> int:
+        """剩余可写入的样本数"""
+        return len(self._data) - self._length
+
+    @property
+    def is_full(self) -> bool:
+        """缓冲区是否已写满"""
+        return self._length >= len(self._data)
+
+    def append(self, block: np.ndarray) -> int:
+        """
+        追加一个音频块
+
+        参数:
+            block: 一维音频数据
+
+        返回:
+            实际写入的样本数；缓冲区写满时block[返回值:]没有写入，由调用方放入下一个片段
+        """
+        count = min(len(block), self.remaining)
+        if count > 0:
+            self._data[self._length:self._length + count] = block[:count]
+            self._length += count
+        return count
+
+    def view(self) -> np.ndarray:
+        """返回已写入数据的零拷贝视图，在下一次clear()之前有效"""
+        return self._data[:self._length]
+
+    def clear(self):
+        """清空缓冲区（不释放内存）"""
+        self._length = 0
@@ -0,0 +1,251 @@
+"""
+语音活动检测模块，提供可插拔的向量化VAD实现
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Type
+
+import numpy as np
+
+
+class VoiceActivityDetector(ABC):
+    """语音活动检测器基类
+
+    输入音频按固定帧长切分后整体送入NumPy计算特征，判决带有
+    双门限滞回（进入门限高于保持门限）和拖尾（hangover），状态在
+    多次调用之间保持，因此可以逐块流式调用。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_duration: float = 0.02,
+        hangover: float = 0.3,
+        noise_adaptation: float = 0.05
+    ):
+        """
+        参数:
+            sample_rate: 采样率
+            frame_duration: 帧长（秒）
+            hangover: 语音结束后继续判为语音的拖尾时长（秒）
+            noise_adaptation: 噪声基底的更新速率（0-1）
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_duration))
+        self.hangover_frames = int(round(hangover / frame_duration))
+        self.noise_adaptation = noise_adaptation
+        self.reset()
+
+    def reset(self):
+        """重置检测状态"""
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._active = False
+        self._frames_since_speech = self.hangover_frames + 1
+        self._noise_floor = None
+
+    @abstractmethod
+    def _frame_thresholds(self, frames: np.ndarray) -> tuple:
+        """
+        计算每帧的门限判决
+
+        参数:
+            frames: 形状为(帧数, 帧长)的音频帧
+
+        返回:
+            (enter, stay) 两个布尔数组：enter为满足进入语音的帧，
+            stay为满足保持语音状态的帧
+        """
+
+    def _update_noise_floor(self, energy: np.ndarray) -> float:
+        """用本批帧能量的低分位数平滑更新噪声基底并返回"""
+        if len(energy) == 0:
+            return self._noise_floor or 0.0
+        estimate = float(np.percentile(energy, 10))
+        if self._noise_floor is None:
+            self._noise_floor = estimate
+        elif estimate < self._noise_floor:
+            # 噪声下降时立即跟随
+            self._noise_floor = estimate
+        else:
+            # 噪声上升时缓慢跟随，语音进行中再放慢十倍，避免把语音当作噪声
+            rate = self.noise_adaptation / 10 if self._active else self.noise_adaptation
+            self._noise_floor += rate * (estimate - self._noise_floor)
+        return self._noise_floor
+
+    def frame(self, samples: np.ndarray) -> np.ndarray:
+        """把音频（连同上次剩余的样本）切分成完整帧，不足一帧的部分留到下次"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(self._remainder):
+            samples = np.concatenate([self._remainder, samples])
+        count = len(samples) // self.frame_length
+        used = count * self.frame_length
+        self._remainder = samples[used:].copy()
+        return samples[:used].reshape(count, self.frame_length)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        处理一段音频
+
+        参数:
+            samples: 一维音频数据
+
+        返回:
+            每个完整帧的语音判决（布尔数组）
+        """
+        frames = self.frame(samples)
+        count = len(frames)
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+
+        enter, stay = self._frame_thresholds(frames)
+
+        # 滞回：帧i为语音，当且仅当最近一次enter帧之后没有出现不满足stay的帧
+        # 下标从1开始，0表示上一次调用结束时的虚拟帧
+        index = np.arange(1, count + 1)
+        last_enter = np.maximum.accumulate(np.where(enter, index, 0 if self._active else -1))
+        last_break = np.maximum.accumulate(np.where(~stay, index, -1))
+        active = (last_enter > last_break) & stay
+
+        # 拖尾：语音结束后的hangover_frames帧内仍判为语音
+        last_speech = np.maximum.accumulate(np.where(active, index, -self._frames_since_speech))
+        decisions = (index - last_speech) <= self.hangover_frames
+
+        self._active = bool(active[-1])
+        self._frames_since_speech = int(count - last_speech[-1])
+        return decisions
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """判断一个音频块中是否包含语音"""
+        return bool(np.any(self.process(samples)))
+
+
+class EnergyZcrDetector(VoiceActivityDetector):
+    """能量+过零率检测器
+
+    帧RMS能量高于自适应噪声基底一定倍数且过零率处于浊音范围时进入语音；
+    能量远高于门限时即使过零率偏高（清辅音）也判为语音。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        energy_threshold: float = 0.002,
+        enter_ratio: float = 3.0,
+        stay_ratio: float = 1.5,
+        zcr_max: float = 0.25,
+        **kwargs
+    ):
+        """
+        参数:
+            energy_threshold: 绝对RMS能量门限
+            enter_ratio: 进入语音时能量需超过噪声基底的倍数
+            stay_ratio: 保持语音时能量需超过噪声基底的倍数
+            zcr_max: 浊音帧的最大过零率（每样本）
+        """
+        self.energy_threshold = energy_threshold
+        self.enter_ratio = enter_ratio
+        self.stay_ratio = stay_ratio
+        self.zcr_max = zcr_max
+        super().__init__(sample_rate, **kwargs)
+
+    def _frame_thresholds(self, frames: np.ndarray) -> tuple:
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+
+        floor = self._update_noise_floor(energy)
+        enter_level = max(self.energy_threshold, floor * self.enter_ratio)
+        stay_level = max(self.energy_threshold, floor * self.stay_ratio)
+
+        loud = energy > enter_level
+        enter = loud & ((zcr <= self.zcr_max) | (energy > 2 * enter_level))
+        stay = energy > stay_level
+        return enter, stay
+
+
+class SpectralFluxDetector(VoiceActivityDetector):
+    """谱通量检测器
+
+    在语音频带内计算相邻帧幅度谱的正向变化量（谱通量），非平稳的语音起始
+    会产生明显的通量，而平稳噪声不会；进入语音后以频带能量维持状态。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        energy_threshold: float = 0.002,
+        flux_ratio: float = 2.5,
+        stay_ratio: float = 2.0,
+        band: tuple = (100.0, 4000.0),
+        **kwargs
+    ):
+        """
+        参数:
+            energy_threshold: 频带RMS能量的绝对门限
+            flux_ratio: 进入语音时谱通量需超过其背景水平的倍数
+            stay_ratio: 保持语音时频带能量需超过噪声基底的倍数
+            band: 参与计算的频带范围（Hz）
+        """
+        self.energy_threshold = energy_threshold
+        self.flux_ratio = flux_ratio
+        self.stay_ratio = stay_ratio
+        self.band = band
+        super().__init__(sample_rate, **kwargs)
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_length, 1.0 / sample_rate)
+        self._band_mask = (freqs >= band[0]) & (freqs <= band[1])
+
+    def reset(self):
+        super().reset()
+        self._previous_spectrum = None
+        self._flux_floor = None
+
+    def _frame_thresholds(self, frames: np.ndarray) -> tuple:
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1))[:, self._band_mask]
+        bins = spectrum.shape[1]
+        # 与时域RMS同量纲的频带能量
+        energy = np.sqrt(np.sum(spectrum * spectrum, axis=1) * 2) / self.frame_length
+
+        previous = self._previous_spectrum if self._previous_spectrum is not None else spectrum[:1]
+        stacked = np.vstack([previous, spectrum])
+        flux = np.sum(np.maximum(np.diff(stacked, axis=0), 0.0), axis=1) / (bins * self.frame_length)
+        self._previous_spectrum = spectrum[-1:]
+
+        floor = self._update_noise_floor(energy)
+        flux_estimate = float(np.median(flux))
+        if self._flux_floor is None:
+            self._flux_floor = flux_estimate
+        else:
+            self._flux_floor += self.noise_adaptation * (flux_estimate - self._flux_floor)
+        flux_level = max(self._flux_floor, 1e-9) * self.flux_ratio
+        stay_level = max(self.energy_threshold, floor * self.stay_ratio)
+
+        stay = energy > stay_level
+        enter = (flux > flux_level) & stay
+        return enter, stay
+
+
+# 可用的检测器实现
+VAD_ENGINES: Dict[str, Type[VoiceActivityDetector]] = {
+    "energy_zcr": EnergyZcrDetector,
+    "spectral_flux": SpectralFluxDetector,
+}
+
+
+def create_detector(sample_rate: int, settings: Optional[dict] = None) -> VoiceActivityDetector:
+    """
+    按配置创建检测器
+
+    参数:
+        sample_rate: 采样率
+        settings: 检测器配置，'engine'指定实现，其余键作为构造参数
+
+    返回:
+        检测器实例
+    """
+    settings = dict(settings or {})
+    engine = settings.pop("engine", "energy_zcr")
+    detector_class = VAD_ENGINES.get(engine)
+    if detector_class is None:
+        raise ValueError(f"不支持的VAD引擎：{engine}")
+    return detector_class(sample_rate, **settings)
@@ -6,6 +6,8 @@
 AUDIO_SETTINGS = {
     "SAMPLE_RATE": 16000,    # 采样率
     "CHANNELS": 1,           # 声道数
+    "CAPTURE_SAMPLE_RATE": 16000,  # 下混为单声道并重采样到该采样率，None表示保持设备采样率
+    "RING_BUFFER_DURATION": 5.0,   # 音频回调环形缓冲区时长（秒），写满时丢弃新数据并计数
     "CHUNK_DURATION": 0.1,   # 音频块时长（秒）
     "BUFFER_DURATION": 1.0,  # 缓冲区时长（秒）
     "SPEECH_TIMEOUT": 2.0,   # 无语音超时时间（秒）
@@ -13,6 +15,60 @@ AUDIO_SETTINGS = {
     "PAUSE_TOLERANCE": 2.5,  # 暂停容忍时间（秒），从1.5秒增加到2.5秒
 }
 
+# 语音活动检测设置
+VAD_SETTINGS = {
+    'engine': 'energy_zcr',       # 检测器实现: energy_zcr / spectral_flux
+    'frame_duration': 0.02,       # 帧长（秒）
+    'hangover': 0.3,              # 语音结束后的拖尾时长（秒）
+    'energy_threshold': 0.002,    # 绝对能量门限
+}
+
+# HTTP连接设置（转写和对话请求共享同一个连接池）
+HTTP_SETTINGS = {
+    'max_connections': 10,             # 连接池最大连接数
+    'max_keepalive_connections': 5,    # 保持空闲的最大连接数
+    'keepalive_expiry': 120.0,         # 空闲连接保留时间（秒）
+    'http2': False,                    # 需要安装h2（pip install httpx[http2]）
+    'timeout': 60.0,                   # 请求超时（秒）
+    'connect_timeout': 5.0,            # 连接超时（秒）
+    'warm_up': True,                   # 开始录音时预热连接，第一个问题不必等待DNS和TLS握手
+}
+
+# 处理流水线设置
+PIPELINE_SETTINGS = {
+    'transcribe_workers': 2,     # 并行转写线程数
+    'segment_queue_size': 8,     # 待转写片段队列容量，写满时丢弃最旧片段
+    'answer_queue_size': 4,      # 待回答问题队列容量
+    # 回答进行中又来新问题时：queue排队依次回答，cancel取消当前回答只回答最新问题，
+    # parallel最多同时回答max_parallel_answers个问题（各自显示在独立的区域）
+    'answer_policy': 'queue',
+    'max_parallel_answers': 2,
+}
+
+# 跨片段的问题拼接：长问题中间停顿被切成两段时，前一段没说完且下一段在窗口内开始则合并成一个问题
+STITCH_SETTINGS = {
+    'enabled': True,
+    'window': 1.0,                 # 片段结束后下一段语音在该时长（秒）内开始才拼接
+    'hold_unpunctuated': True,     # 没有结尾标点且本身不是问题的文本视为没说完
+    'max_chars': 200,              # 拼接后的最大长度
+}
+
+# 流式输出设置：回答增量合并后再发给界面
+STREAM_SETTINGS = {
+    'flush_interval': 0.03,   # 最长合并时间（秒）
+    'max_chars': 64,          # 最多合并的字符数
+}
+
+# 回答缓存设置（相同或相似的问题直接回放之前的回答）
+ANSWER_CACHE_SETTINGS = {
+    'enabled': True,
+    'path': None,                      # SQLite文件路径（如'~/.omniask/answer_cache.sqlite3'），为None时只缓存在内存中
+    'max_entries': 500,                # 最多缓存的回答数，超出时淘汰最久未使用的
+    'ttl': 7 * 24 * 3600,              # 回答有效期（秒），为None时不过期
+    'embedding_model': None,           # 设为如'text-embedding-3-small'时按问题向量相似度匹配
+    'similarity_threshold': 0.92,      # 相似度匹配的余弦相似度阈值
+}
+
 # 界面设置
 UI_SETTINGS = {
     'window_title': '实时语音助手 - OmniAsk',
@@ -78,6 +134,42 @@ QUESTION_KEYWORDS = [
     '具体', '展开', '继续', '深入','请'
 ]
 
+# 问题检测：关键词和位置规则的得分之和达到阈值即为问题
+QUESTION_DETECTOR_SETTINGS = {
+    'threshold': 1.0,
+    'keyword_weight': 0.3,       # QUESTION_KEYWORDS中未单独指定权重的词
+    'statement_weight': -0.5,    # 以句号或感叹号结尾
+    # 单独指定权重的词（覆盖QUESTION_KEYWORDS中的同名词），负权重表示陈述
+    'weights': {
+        '?': 2.0, '请问': 1.5,
+        '什么': 1.0, '是什么': 1.5, '做什么': 1.5, '干什么': 1.5, '为什么': 1.2, '为啥': 1.2, '如何': 1.0, '怎么': 1.0, '怎样': 1.0, '咋': 1.0,
+        '哪': 1.0, '谁': 0.8, '何时': 1.0, '多少': 1.0, '几个': 0.6, '有何': 1.0, '啥': 0.8, '干嘛': 0.8,
+        '是否': 0.8, '能否': 1.0, '可否': 1.0, '是不是': 1.2, '有没有': 1.2, '会不会': 1.2,
+        '能不能': 1.2, '可不可以': 1.2, '要不要': 1.0,
+        # 面试中的祈使式提问
+        '介绍一下': 1.0, '说说': 1.0, '讲讲': 1.0, '谈谈': 1.0, '聊聊': 1.0, '说一下': 1.0, '说下': 1.0,
+        '讲一下': 1.0, '描述一下': 1.0, '解释一下': 1.0, '简述': 1.0, '举个例子': 1.0, '举个具体的例子': 1.0,
+        '详细说': 1.0, '展开讲': 1.0, '继续说': 1.0, '具体一点': 0.8,
+        # 第一人称多为回答者的陈述
+        '我': -0.5, '我们': -0.5,
+        '我来': -1.0, '我们来': -1.0, '我先': -1.0,  # 说话人宣布自己接下来要做的事
+        '给我': 0.0, '告诉我': 0.0, '问我': 0.0,    # 宾语位置的"我"不算陈述
+        '你': 0.3, '您': 0.3,
+        # 口头禅中的疑问词不表示提问
+        '怎么说呢': 0.0, '怎么讲呢': 0.0,
+        # 指示代词中的"么"不是句末语气词（强制切分时片段常以"那么"结尾）
+        '那么': 0.0, '这么': 0.0, '多么': 0.0,
+        # 英文（不区分大小写，按整词匹配）
+        'what': 1.0, 'why': 1.0, 'how': 1.0, 'which': 1.0, 'where': 1.0, 'when': 0.8, 'who': 0.8,
+        'can you': 1.0, 'could you': 1.0, 'would you': 1.0, 'do you': 1.0, 'did you': 1.0,
+        'have you': 1.0, 'are you': 1.0, 'tell me about': 1.0, 'walk me through': 1.0,
+        'i': -0.5, 'we': -0.5,
+    },
+    'final_particles': {'吗': 1.5, '呢': 1.0, '么': 1.0, '嘛': 0.8},   # 分句末尾的语气词
+    # 分句开头的祈使词：单独的"请"（"请坐""请进"）不足以判定为问题，需与"介绍一下""谈谈"等词同时出现
+    'initial_words': {'请': 0.5},
+}
+
 # Whisper设置
 WHISPER_SETTINGS = {
     'model': 'whisper-1',
@@ -86,7 +178,40 @@ WHISPER_SETTINGS = {
     'temperature': 0.0,    # 降低随机性
     'compression_ratio_threshold': 2.4,
     'logprob_threshold': -1.0,
-    'no_speech_threshold': 0.6
+    'no_speech_threshold': 0.6,
+    'upload_codec': 'flac',        # 上传编码: wav(PCM16) / flac / opus
+    'upload_sample_rate': 16000,   # 上传前下混为单声道并重采样到该采样率
+    'backend': 'api',              # 转写后端: api(OpenAI接口) / local(本地faster-whisper，需要安装faster-whisper)
+    'local_model': 'small',        # 本地模型名称或模型目录
+    'local_device': 'cpu',
+    'local_compute_type': 'int8',  # CPU上可用int8 / int8_float16(自动回退为CTranslate2支持的类型)
+    'local_cpu_threads': 0,        # 0表示使用默认线程数
+    'local_beam_size': 5,
+}
+
+# 部分转写设置（说话过程中使用本地faster-whisper模型显示临时文本）
+PARTIAL_SETTINGS = {
+    'enabled': False,
+    'interval': 0.5,          # 重新转写的间隔（秒）
+    'model': 'small',         # 模型名称或本地模型目录
+    'device': 'cpu',
+    'compute_type': 'int8',
+    'beam_size': 1,
+}
+
+# 推测式回答设置（需要启用部分转写）：说话人停顿时用部分转写结果提前请求回答，
+# 最终转写结果与之足够相似时直接采用，否则取消
+SPECULATIVE_SETTINGS = {
+    'enabled': False,
+    'silence': 0.6,                 # 停顿超过该时长（秒）开始推测，应小于PAUSE_TOLERANCE
+    'similarity_threshold': 0.85,   # 采用推测结果所需的最低问题相似度
+}
+
+# 延迟追踪设置（每个语音片段从说话到回答首字显示的各阶段耗时）
+LATENCY_SETTINGS = {
+    'enabled': True,
+    'max_samples': 1000,               # 每个指标保留的最近样本数
+    'export_path': 'latency_stats',    # 停止录音时导出<路径>.json和<路径>.csv，为空则不导出
 }
 
 # GPT设置
@@ -110,4 +235,38 @@ GPT_SETTINGS = {
     'top_p': 0.9,
     'frequency_penalty': 0.6,  # 减少重复
     'presence_penalty': 0.6    # 鼓励多样性
-} 
\ No newline at end of file
+} 
+# 对话记忆设置（追问时带上最近的问答和较早对话的摘要）
+MEMORY_SETTINGS = {
+    'enabled': True,
+    'budget_tokens': 1500,       # 按原文保留的最近问答轮次的token预算
+    'summary_tokens': 300,       # 较早对话滚动摘要的最大token数
+    'summary_model': None,       # 生成摘要使用的模型，为None时使用GPT_SETTINGS['model']
+    'follow_up_max_chars': 6,    # 有历史时归一化后不超过该长度的问题视为追问，不使用回答缓存
+    'summary_prompt': "把已有摘要和新的对话合并成一段简洁的中文摘要，保留讨论过的主题、关键结论和术语，不要添加新内容。",
+}
+
+# 知识库检索（需要先用local_knowledge_base创建知识库并安装其依赖，在仓库根目录运行）
+RAG_SETTINGS = {
+    'enabled': False,
+    'persist_directory': './knowledge_base',   # LocalKnowledgeBase的持久化目录
+    'k': 3,                      # 每个问题检索的资料片段数
+    'deadline': 0.15,            # 识别出问题后最多等待检索的时长（秒），超时则不带资料回答
+    'max_chars': 1500,           # 加入提示词的资料总字数上限
+    'max_workers': 2,            # 同时进行的检索数
+    'prompt': "以下是候选人本地资料（简历、项目文档等）中可能相关的片段，仅在与问题相关时参考：",
+}
+
+# 接口限流和重试设置（每个接口分别限制每分钟请求数和token数，值为None表示不限制）
+RATE_LIMIT_SETTINGS = {
+    'enabled': True,
+    'limits': {
+        'transcription': {'requests_per_minute': 50, 'tokens_per_minute': None},
+        'chat': {'requests_per_minute': 500, 'tokens_per_minute': 30000},
+        'embedding': {'requests_per_minute': 500, 'tokens_per_minute': 150000},
+    },
+    'max_retries': 4,            # 连接错误、超时、429和5xx的最多重试次数
+    'base_delay': 0.5,           # 指数退避的初始等待（秒），实际等待带随机抖动；服务端给出Retry-After时按其等待
+    'max_delay': 8.0,            # 指数退避的最长等待（秒）
+    'utterance_deadline': 30.0,  # 片段结束后多少秒内没有完成转写和回答请求就放弃，为None时不限制
+}
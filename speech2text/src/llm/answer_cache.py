@@ -0,0 +1,253 @@
+"""
+回答缓存模块，按归一化后的问题缓存GPT回答，并持久化到SQLite
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from ..utils.error_handler import logger
+from ..utils.text_normalize import normalize_question
+
+
+class CachedAnswer(NamedTuple):
+    """一条缓存的回答"""
+    question: str                      # 原始问题
+    answer: str                        # 完整回答
+    created: float                     # 写入时间（time.time()）
+    embedding: Optional[np.ndarray]    # 问题的向量（未启用相似度匹配时为None）
+
+
+class AnswerCache:
+    """回答缓存
+
+    先按归一化问题精确匹配，未命中且提供了embed函数时再按向量余弦相似度匹配。
+    内存中按LRU淘汰并检查TTL，所有条目同时写入SQLite，重启后按最近使用时间加载。
+    namespace区分不同的模型和系统提示词，切换后旧回答不会被命中。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        namespace: str = "",
+        max_entries: int = 500,
+        ttl: Optional[float] = None,
+        embed: Optional[Callable[[str], np.ndarray]] = None,
+        similarity_threshold: float = 0.92
+    ):
+        """
+        参数:
+            path: SQLite文件路径，为None时只缓存在内存中
+            namespace: 缓存命名空间（如模型名和系统提示词的摘要）
+            max_entries: 最多缓存的条目数
+            ttl: 条目有效期（秒），为None时不过期
+            embed: 文本 -> 向量函数，提供时启用相似度匹配
+            similarity_threshold: 相似度匹配的余弦相似度阈值
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        # 未命中的问题向量，回答完成后put()直接使用，不再计算一次
+        self._pending_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL, embedding BLOB, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+            self._load()
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return self.ttl is not None and now - entry.created > self.ttl
+
+    def _load(self):
+        """从SQLite加载最近使用的未过期条目"""
+        now = time.time()
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        # 容量调小后，超出部分同样从磁盘删除
+        self._db.execute(
+            "DELETE FROM answers WHERE namespace = ? AND key NOT IN ("
+            "SELECT key FROM answers WHERE namespace = ? ORDER BY last_used DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, question, answer, created, embedding FROM answers "
+            "WHERE namespace = ? ORDER BY last_used DESC LIMIT ?",
+            (self.namespace, self.max_entries)
+        ).fetchall()
+        # 按最近使用时间从旧到新插入，保持LRU顺序
+        for key, question, answer, created, blob in reversed(rows):
+            embedding = np.frombuffer(blob, dtype=np.float32) if blob else None
+            self._entries[key] = CachedAnswer(question, answer, created, embedding)
+        if rows:
+            logger.info(f"回答缓存已加载{len(rows)}条")
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """计算单位长度的问题向量，失败时返回None"""
+        if self.embed is None:
+            return None
+        try:
+            vector = np.asarray(self.embed(text), dtype=np.float32).reshape(-1)
+        except Exception as e:
+            logger.warning(f"计算问题向量失败，跳过相似度匹配: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _touch(self, key: str):
+        """标记条目被使用"""
+        self._entries.move_to_end(key)
+        if self._db is not None:
+            self._db.execute(
+                "UPDATE answers SET last_used = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+            self._db.commit()
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._db.commit()
+
+    def _find_similar(self, embedding: np.ndarray, now: float) -> Optional[str]:
+        """返回与问题向量最相似且超过阈值的条目键"""
+        candidates = [
+            (key, entry.embedding) for key, entry in self._entries.items()
+            if entry.embedding is not None and len(entry.embedding) == len(embedding)
+            and not self._expired(entry, now)
+        ]
+        if not candidates:
+            return None
+        similarities = np.stack([vector for _, vector in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+
+    def get(self, question: str) -> Optional[CachedAnswer]:
+        """
+        查找问题的缓存回答
+
+        返回:
+            命中的条目，未命中时返回None
+        """
+        key = normalize_question(question)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._touch(key)
+                self.hits += 1
+                return entry
+
+        if self.embed is not None:
+            # 向量计算可能较慢（如调用接口），不在锁内进行
+            embedding = self._embed(question)
+            if embedding is not None:
+                with self._lock:
+                    similar_key = self._find_similar(embedding, now)
+                    if similar_key is not None:
+                        self._touch(similar_key)
+                        self.hits += 1
+                        self.similar_hits += 1
+                        return self._entries[similar_key]
+                    self._pending_embeddings[key] = embedding
+                    # 回答被取消的问题不会put()，只保留最近的几个
+                    while len(self._pending_embeddings) > 16:
+                        self._pending_embeddings.popitem(last=False)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str):
+        """写入一条回答，超出容量时淘汰最久未使用的条目"""
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        with self._lock:
+            embedding = self._pending_embeddings.pop(key, None)
+        if embedding is None:
+            embedding = self._embed(question)
+        now = time.time()
+        entry = CachedAnswer(question, answer, now, embedding)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, question, answer, now, now,
+                     embedding.tobytes() if embedding is not None else None)
+                )
+                self._db.commit()
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def clear(self):
+        """清空当前命名空间的缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._pending_embeddings.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要"""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return ""
+        return f"缓存命中 {self.hits}/{lookups} ({self.hit_rate:.0%})"
+
+    def close(self):
+        """关闭SQLite连接"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,97 @@
+"""
+流式输出合并模块，把逐token的增量合并成较少的界面消息
+"""
+
+import threading
+import time
+from typing import Any, Callable
+
+
+class StreamCoalescer:
+    """流式增量合并器
+
+    第一个增量立即发出以保证首字延迟，之后的增量在缓冲区中累积，
+    距上次发出超过interval秒或累积超过max_chars个字符时合并发出。
+    后台线程负责在流暂停时按时发出缓冲区中剩余的内容，生产者不需要sleep。
+    """
+
+    def __init__(self, emit: Callable[[str], Any], interval: float = 0.03, max_chars: int = 64):
+        """
+        参数:
+            emit: 发出合并文本的回调
+            interval: 最长合并时间（秒）
+            max_chars: 最多合并的字符数
+        """
+        self.emit = emit
+        self.interval = interval
+        self.max_chars = max(1, max_chars)
+        self.pushed = 0
+        self.emitted = 0
+        self._parts = []
+        self._size = 0
+        self._last_emit = float("-inf")
+        self._closed = False
+        self._cond = threading.Condition()
+        # 保证发出顺序与到达顺序一致
+        self._emit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._timer, name="stream-coalescer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def push(self, text: str):
+        """加入一个增量"""
+        if not text:
+            return
+        with self._cond:
+            self._parts.append(text)
+            self._size += len(text)
+            self.pushed += 1
+            due = self._size >= self.max_chars or time.monotonic() - self._last_emit >= self.interval
+            if not due:
+                # 唤醒计时线程按截止时间发出
+                self._cond.notify()
+                return
+        self.flush()
+
+    def flush(self):
+        """立即发出缓冲区中的内容"""
+        with self._emit_lock:
+            with self._cond:
+                if not self._parts:
+                    return
+                text = "".join(self._parts)
+                self._parts = []
+                self._size = 0
+                self._last_emit = time.monotonic()
+            self.emitted += 1
+            self.emit(text)
+
+    def close(self):
+        """发出剩余内容并停止计时线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _timer(self):
+        """后台线程：缓冲区有内容时在截止时间发出"""
+        with self._cond:
+            while not self._closed:
+                if not self._parts:
+                    self._cond.wait()
+                    continue
+                remaining = self._last_emit + self.interval - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._cond.release()
+                try:
+                    self.flush()
+                finally:
+                    self._cond.acquire()
@@ -0,0 +1,249 @@
+"""
+对话记忆模块，在token预算内保留最近的问答轮次，较早的轮次由后台请求折叠为滚动摘要
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from ..utils.error_handler import logger
+from ..utils.text_normalize import normalize_question
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 每条消息在对话格式中的额外开销（角色和分隔符），参考OpenAI的计数方法
+MESSAGE_OVERHEAD = 4
+
+# 追问中指代上文的词语
+REFERENCE_WORDS = (
+    "这个", "那个", "这些", "那些", "它", "上面", "刚才", "刚刚", "前面",
+    "详细", "具体", "举个例子", "举例", "比如", "继续", "展开", "还有呢", "然后呢",
+)
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]")
+
+
+class TokenCounter:
+    """token计数器
+
+    安装了tiktoken时按模型的编码精确计数，否则按中日韩字符每字约1个token、
+    其他字符每4个约1个token估算。相同文本的计数结果会被缓存。
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini", cache_size: int = 4096):
+        """
+        参数:
+            model: 模型名，用于选择tiktoken编码
+            cache_size: 缓存的文本计数结果数
+        """
+        self.model = model
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        else:
+            logger.info("未安装tiktoken（pip install tiktoken），按字符数估算token")
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        """是否使用真实的分词器计数"""
+        return self.encoding is not None
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断文本到最多max_tokens个token"""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        # 估算模式下二分查找最长的前缀
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+class Turn:
+    """一轮问答，token数在加入时计算一次"""
+
+    __slots__ = ("question", "answer", "tokens")
+
+    def __init__(self, question: str, answer: str, tokens: int):
+        self.question = question
+        self.answer = answer
+        self.tokens = tokens
+
+    def as_text(self) -> str:
+        return f"问：{self.question}\n答：{self.answer}"
+
+
+class ConversationMemory:
+    """对话记忆
+
+    最近的问答轮次按原文保留，总token数不超过budget；超出时最早的轮次移出，
+    由后台线程调用summarize把它们和已有摘要合并成新的摘要（不超过summary_tokens）。
+    摘要请求进行中时移出的轮次会排队，在下一次摘要时一起折叠，不会阻塞回答。
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        budget: int = 1500,
+        summary_tokens: int = 300,
+        summarize: Optional[Callable[[str, str, int], str]] = None,
+        follow_up_max_chars: int = 6
+    ):
+        """
+        参数:
+            counter: token计数器
+            budget: 保留原文的问答轮次的token预算
+            summary_tokens: 摘要的最大token数
+            summarize: (已有摘要, 待折叠的对话文本, 最大token数) -> 新摘要；为None时直接丢弃移出的轮次
+            follow_up_max_chars: 归一化后不超过该长度的问题视为追问
+        """
+        self.counter = counter
+        self.budget = max(1, budget)
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.follow_up_max_chars = follow_up_max_chars
+
+        self._turns: List[Turn] = []
+        self._tokens = 0
+        self._summary = ""
+        self._summary_count = 0
+        self._pending: List[Turn] = []
+        self._summarizing = False
+        # clear()后丢弃进行中的摘要结果
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.folded_turns = 0
+        self.dropped_turns = 0
+        self.summaries = 0
+
+    def add(self, question: str, answer: str):
+        """加入一轮问答，超出预算时折叠最早的轮次"""
+        if not question or not answer:
+            return
+        tokens = self.counter.count(question) + self.counter.count(answer) + 2 * MESSAGE_OVERHEAD
+        with self._lock:
+            self._turns.append(Turn(question, answer, tokens))
+            self._tokens += tokens
+            # 至少保留最近一轮，即使它本身超出预算
+            while self._tokens > self.budget and len(self._turns) > 1:
+                turn = self._turns.pop(0)
+                self._tokens -= turn.tokens
+                self._pending.append(turn)
+            start = bool(self._pending) and not self._summarizing
+            if start:
+                self._summarizing = True
+        if start:
+            threading.Thread(target=self._fold, name="memory-summary", daemon=True).start()
+
+    def _fold(self):
+        """后台线程：把排队的轮次折叠进摘要，直到队列为空"""
+        while True:
+            with self._lock:
+                turns, self._pending = self._pending, []
+                summary = self._summary
+                generation = self._generation
+                if not turns:
+                    self._summarizing = False
+                    return
+            if self.summarize is None:
+                with self._lock:
+                    self.dropped_turns += len(turns)
+                continue
+            text = "\n\n".join(turn.as_text() for turn in turns)
+            try:
+                new_summary = self.summarize(summary, text, self.summary_tokens)
+            except Exception as e:
+                logger.warning(f"对话摘要失败，丢弃{len(turns)}轮较早的对话: {e}")
+                with self._lock:
+                    self.dropped_turns += len(turns)
+                continue
+            new_summary = self.counter.truncate((new_summary or "").strip(), self.summary_tokens)
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self._summary = new_summary
+                self._summary_count = self.counter.count(new_summary)
+                self.folded_turns += len(turns)
+                self.summaries += 1
+
+    def messages(self) -> List[Dict[str, str]]:
+        """返回放在当前问题之前的历史消息（摘要和最近的问答轮次）"""
+        with self._lock:
+            summary = self._summary
+            turns = list(self._turns)
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"之前对话的摘要：{summary}"})
+        for turn in turns:
+            messages.append({"role": "user", "content": turn.question})
+            messages.append({"role": "assistant", "content": turn.answer})
+        return messages
+
+    def prompt_tokens(self) -> int:
+        """历史消息的token数"""
+        with self._lock:
+            return self._tokens + (self._summary_count + MESSAGE_OVERHEAD if self._summary else 0)
+
+    def is_follow_up(self, question: str) -> bool:
+        """问题是否依赖上文（有历史时很短或包含指代词），这类问题不应使用回答缓存"""
+        with self._lock:
+            if not self._turns and not self._summary:
+                return False
+        if any(word in question for word in REFERENCE_WORDS):
+            return True
+        return len(normalize_question(question)) <= self.follow_up_max_chars
+
+    def clear(self):
+        """清空历史和摘要"""
+        with self._lock:
+            self._turns = []
+            self._tokens = 0
+            self._summary = ""
+            self._summary_count = 0
+            self._pending = []
+            self._generation += 1
+
+    def stats(self) -> Dict[str, float]:
+        """记忆统计"""
+        with self._lock:
+            turns = len(self._turns)
+            summary_tokens = self._summary_count
+        return {
+            "turns": turns,
+            "prompt_tokens": self.prompt_tokens(),
+            "summary_tokens": summary_tokens,
+            "summaries": self.summaries,
+            "folded_turns": self.folded_turns,
+            "dropped_turns": self.dropped_turns,
+            "exact_tokens": self.counter.exact,
+        }
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要"""
+        stats = self.stats()
+        if not stats["turns"] and not stats["summary_tokens"]:
+            return ""
+        return f"记忆 {stats['turns']}轮 {stats['prompt_tokens']}token"
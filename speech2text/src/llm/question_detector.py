@@ -0,0 +1,179 @@
+"""
+问题检测模块：启动时把关键词表编译成正则，按权重和位置规则给转写文本打分，超过阈值视为问题
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..utils.text_normalize import fold_width
+
+# 分句的标点（半角和全角）
+CLAUSE_BREAKS = ",.!?;:~、。…，！？；：～"
+
+# 陈述句的结尾
+STATEMENT_ENDINGS = ("。", ".", "!", "！")
+
+# 半角ASCII -> 全角，关键词按两种宽度编译，检测时不必逐次归一化文本
+_WIDE = {code: code + 0xFEE0 for code in range(0x21, 0x7F)}
+
+# 英文单词的字母（小写，半角和全角），英文关键词两侧不能紧邻字母
+_LETTERS = "a-z\uff41-\uff5a"
+
+
+def _variants(word: str) -> set:
+    """关键词的半角和全角写法（小写）"""
+    folded = fold_width(word).lower()
+    return {folded, folded.translate(_WIDE)}
+
+
+def _is_english(word: str) -> bool:
+    """首尾都是字母的英文关键词，需要按整词匹配"""
+    word = fold_width(word)
+    return word.isascii() and word[:1].isalpha() and word[-1:].isalpha()
+
+
+def _trie_pattern(words: Dict[str, str]) -> str:
+    """
+    把词表编译成前缀树形式的正则（如"为什么|为啥|什么" -> "为(?:什么|啥)|什么"）
+
+    每个位置只需按首字符选择分支，不必逐个尝试所有词；可选的后缀在前，同一位置优先匹配最长的词
+    （"为什么"不会被截断成"为"）。
+
+    参数:
+        words: 词 -> 词尾的零宽断言（如分句边界的前瞻），空字符串表示无条件匹配
+    """
+    trie = {}
+    for word, assertion in words.items():
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = assertion
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char is not None]
+        optional = node.get(None) == ""
+        if node.get(None):
+            branches.append(node[None])
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        if optional:
+            return f"(?:{body})?"
+        return f"(?:{body})" if len(branches) > 1 else body
+
+    return build(trie)
+
+
+class QuestionDetector:
+    """问题检测器
+
+    得分由三部分相加：
+    - 关键词：文本中出现的每个不同的词计一次权重，未单独指定权重的词使用keyword_weight，
+      权重可以为负（如第一人称的陈述）
+    - 位置：分句末尾的语气词（"吗""呢"）和分句开头的祈使词（"请"），只在对应位置计分；
+      属于更长关键词的一部分时不计（"什么"中的"么"、"请问"中的"请"）
+    - 结尾：以句号、感叹号结尾的文本加上statement_weight
+
+    英文关键词不区分大小写，按整词匹配（"how"不匹配"show"）。
+
+    关键词（前缀树形式）和位置规则在构造时编译成同一个正则，每次判断只扫描文本一遍，
+    耗时与词表长度基本无关。
+    """
+
+    def __init__(
+        self,
+        keywords: Iterable[str] = (),
+        weights: Optional[Dict[str, float]] = None,
+        final_particles: Optional[Dict[str, float]] = None,
+        initial_words: Optional[Dict[str, float]] = None,
+        keyword_weight: float = 0.4,
+        statement_weight: float = -0.5,
+        threshold: float = 1.0
+    ):
+        """
+        参数:
+            keywords: 通用关键词，权重为keyword_weight（包含更强的词时取其权重）
+            weights: 单独指定权重的词，覆盖keywords中的同名词
+            final_particles: 分句末尾的语气词及权重
+            initial_words: 分句开头的词及权重
+            keyword_weight: 通用关键词的权重
+            statement_weight: 以句号或感叹号结尾时的权重
+            threshold: 判定为问题的最低得分
+        """
+        weights = {fold_width(k).lower(): v for k, v in (weights or {}).items()}
+        # 长词优先匹配，通用关键词不应掩盖其中包含的更强的词（如"哪里"中的"哪"）
+        merged = {
+            word: max([keyword_weight] + [v for k, v in weights.items() if k in word])
+            for word in (fold_width(k).lower() for k in keywords)
+        }
+        merged.update(weights)
+        final_particles = {fold_width(k).lower(): v for k, v in (final_particles or {}).items()}
+        initial_words = {fold_width(k).lower(): v for k, v in (initial_words or {}).items()}
+        # 位置词只按位置计分，不作为普通关键词
+        for word in (*final_particles, *initial_words):
+            merged.pop(word, None)
+
+        self.weights = {variant: v for word, v in merged.items() for variant in _variants(word)}
+        self.final_particles = {variant: v for word, v in final_particles.items() for variant in _variants(word)}
+        self.initial_words = {variant: v for word, v in initial_words.items() for variant in _variants(word)}
+        self.statement_weight = statement_weight
+        self.threshold = threshold
+
+        # 位置词和关键词放在同一棵前缀树中，位置词的词尾带分句边界的断言；
+        # 同一位置更长的关键词优先（"请问"而不是开头的"请"），
+        # 位置词若是某个关键词的一部分（"什么"中的"么"）已随关键词一起被匹配，不会重复计分
+        boundary = re.escape(CLAUSE_BREAKS) + r"\s"
+        assertions = {
+            word: f"(?<![{_LETTERS}]{re.escape(word)})(?![{_LETTERS}])" if _is_english(word) else ""
+            for word in self.weights
+        }
+        assertions.update({word: f"(?=[{boundary}]|$)" for word in self.final_particles})
+        assertions.update({word: f"(?<![^{boundary}]{re.escape(word)})" for word in self.initial_words})
+        self._pattern = re.compile(_trie_pattern(assertions)) if assertions else None
+        # 三类词互不重叠，命中的词直接查表
+        self._all_weights = {**self.weights, **self.final_particles, **self.initial_words}
+
+    @classmethod
+    def from_settings(cls, settings: dict, keywords: Iterable[str] = ()) -> "QuestionDetector":
+        """按QUESTION_DETECTOR_SETTINGS创建，keywords为通用关键词表（QUESTION_KEYWORDS）"""
+        return cls(
+            keywords=keywords,
+            weights=settings.get('weights'),
+            final_particles=settings.get('final_particles'),
+            initial_words=settings.get('initial_words'),
+            keyword_weight=settings.get('keyword_weight', 0.4),
+            statement_weight=settings.get('statement_weight', -0.5),
+            threshold=settings.get('threshold', 1.0)
+        )
+
+    def matches(self, text: str) -> List[Tuple[str, float]]:
+        """
+        返回命中的规则及权重（每个规则只计一次），用于调试和调整权重
+
+        位置规则显示为"…吗"（分句末尾）和"请…"（分句开头）。
+        """
+        text = text.strip().lower()
+        found = []
+        words = set(self._pattern.findall(text)) if self._pattern is not None else set()
+        for word in sorted(words):
+            if word in self.final_particles:
+                found.append((f"…{word}", self.final_particles[word]))
+            elif word in self.initial_words:
+                found.append((f"{word}…", self.initial_words[word]))
+            else:
+                found.append((word, self.weights[word]))
+        if text.endswith(STATEMENT_ENDINGS):
+            found.append(("。", self.statement_weight))
+        return found
+
+    def score(self, text: str) -> float:
+        """文本的问题得分（与matches()的权重之和相同）"""
+        text = text.strip().lower()
+        total = self.statement_weight if text.endswith(STATEMENT_ENDINGS) else 0.0
+        if self._pattern is not None:
+            total += sum(map(self._all_weights.__getitem__, set(self._pattern.findall(text))))
+        return total
+
+    def is_question(self, text: str) -> bool:
+        """得分达到阈值即为问题"""
+        return self.score(text) >= self.threshold
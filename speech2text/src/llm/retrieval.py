@@ -0,0 +1,223 @@
+"""
+知识库检索模块：识别出问题后立即在后台检索本地知识库，回答时只等待到截止时间，
+按时返回的资料片段加入提示词，超时则不带资料直接回答
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from ..utils.error_handler import ErrorHandler, logger
+from ..utils.latency import percentiles_of
+
+# 检索函数：(问题, 返回数量) -> 资料片段文本
+SearchFunc = Callable[[str, int], List[str]]
+
+
+def load_local_knowledge_base(persist_directory: str) -> SearchFunc:
+    """
+    加载local_knowledge_base中已创建的知识库，返回其检索函数
+
+    需要在仓库根目录运行并安装local_knowledge_base/requirements.txt中的依赖。
+    """
+    from local_knowledge_base.knowledge_base import LocalKnowledgeBase
+
+    # 只做查询，不需要文档片段的嵌入缓存
+    knowledge_base = LocalKnowledgeBase(persist_directory, cache_directory=None)
+    knowledge_base.load_existing_knowledge_base()
+    return knowledge_base.search
+
+
+class RetrievalResult(NamedTuple):
+    """一次回答使用的检索结果"""
+    seq: Optional[int]
+    chunks: List[str]
+    elapsed: float     # 检索耗时（秒），超时时为等待的时长
+    timed_out: bool    # 截止时间内没有返回
+    status: str        # ok/empty/timeout/loading/busy/error
+
+
+class KnowledgeRetriever:
+    """带截止时间的知识库检索
+
+    问题被识别后调用start()在线程池中开始检索，与排队、缓存查找和"正在思考"提示等回答前的工作并行；
+    回答线程调用collect()取结果，最多等到开始检索后deadline秒。超时的检索无法中断，继续在后台完成，结果丢弃；
+    所有工作线程都在检索时不再提交新的检索（状态为busy），避免新问题排在被放弃的检索之后等到超时。
+    知识库（嵌入模型）在后台加载，加载完成前的问题不做检索，回答不会等待模型加载。
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], SearchFunc],
+        k: int = 3,
+        deadline: float = 0.15,
+        max_chars: int = 1500,
+        max_workers: int = 2,
+        max_records: int = 1000
+    ):
+        """
+        参数:
+            load: 加载知识库并返回检索函数（在后台线程中调用一次）
+            k: 每个问题检索的片段数
+            deadline: 从开始检索起最多等待的秒数
+            max_chars: 加入提示词的资料总字数上限
+            max_workers: 同时进行的检索数
+            max_records: 保留的最近检索记录数
+        """
+        self.load = load
+        self.k = k
+        self.deadline = deadline
+        self.max_chars = max_chars
+        self._search: Optional[SearchFunc] = None
+        self._loading: Optional[threading.Thread] = None
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="retrieve")
+        # 已提交且尚未结束的检索数（包括超时后被放弃、仍在运行的检索）
+        self._in_flight = 0
+        # 片段序号 -> (问题, 开始时间, Future)
+        self._pending: Dict[int, tuple] = {}
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._search is not None
+
+    def start_loading(self):
+        """在后台加载知识库（只加载一次）"""
+        with self._lock:
+            if self._search is not None or self._loading is not None:
+                return
+            self._loading = threading.Thread(target=self._load, name="knowledge-base-load", daemon=True)
+            self._loading.start()
+
+    def _load(self):
+        start = time.perf_counter()
+        search = ErrorHandler.safe_execute(self.load, "加载知识库时出错")
+        if search is not None:
+            self._search = search
+            logger.info(f"知识库加载耗时{(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def _submit(self, question: str):
+        """提交检索，所有工作线程都忙时返回None"""
+        with self._lock:
+            if self._in_flight >= self.max_workers:
+                return None
+            self._in_flight += 1
+        future = self._executor.submit(self._timed_search, question)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def start(self, seq: int, question: str):
+        """开始检索片段seq的问题；知识库尚未加载或工作线程都忙时不做任何事"""
+        if self._search is None:
+            return
+        future = self._submit(question)
+        if future is None:
+            return
+        with self._lock:
+            self._pending[seq] = (question, time.monotonic(), future)
+            # 没有被取走的结果（如回答被取消）不无限累积
+            while len(self._pending) > 64:
+                self._pending.pop(next(iter(self._pending)))[2].cancel()
+
+    def cancel(self, seq: Optional[int]):
+        """问题不再需要检索结果（如命中回答缓存）"""
+        with self._lock:
+            entry = self._pending.pop(seq, None)
+        if entry is not None:
+            entry[2].cancel()
+
+    def collect(self, question: str, seq: Optional[int] = None) -> RetrievalResult:
+        """
+        取问题的检索结果，最多等到开始检索后deadline秒
+
+        没有对应的start()（如推测回答使用的部分转写文本）时现在开始检索并等待完整的deadline。
+        """
+        with self._lock:
+            entry = self._pending.pop(seq, None) if seq is not None else None
+        if entry is not None and entry[0] != question:
+            # 问题文本已变化（如推测回答被最终结果取代），早先的检索作废
+            entry[2].cancel()
+            entry = None
+        if entry is None:
+            if self._search is None:
+                return self._record(RetrievalResult(seq, [], 0.0, False, "loading"))
+            future = self._submit(question)
+            if future is None:
+                return self._record(RetrievalResult(seq, [], 0.0, False, "busy"))
+            entry = (question, time.monotonic(), future)
+
+        _, started, future = entry
+        try:
+            chunks, elapsed = future.result(timeout=max(0.0, started + self.deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            return self._record(RetrievalResult(seq, [], time.monotonic() - started, True, "timeout"))
+        except Exception as e:
+            logger.warning(f"知识库检索失败: {e}")
+            return self._record(RetrievalResult(seq, [], time.monotonic() - started, False, "error"))
+        chunks = [chunk for chunk in (chunks or []) if chunk and chunk.strip()]
+        return self._record(RetrievalResult(seq, chunks, elapsed, False, "ok" if chunks else "empty"))
+
+    def _timed_search(self, question: str) -> tuple:
+        """线程池中执行检索，返回(片段, 耗时)"""
+        start = time.monotonic()
+        chunks = self._search(question, self.k)
+        return chunks, time.monotonic() - start
+
+    def _record(self, result: RetrievalResult) -> RetrievalResult:
+        with self._lock:
+            self._records.append(result)
+        if result.status not in ("loading", "busy"):
+            logger.info(
+                f"知识库检索 #{result.seq}: {result.elapsed * 1000:.0f}ms, {len(result.chunks)}段"
+                + ("（超时）" if result.timed_out else "")
+            )
+        return result
+
+    def format_context(self, chunks: List[str]) -> str:
+        """把资料片段编号拼接成提示词，总字数不超过max_chars"""
+        parts = []
+        remaining = self.max_chars
+        for i, chunk in enumerate(chunks, 1):
+            chunk = chunk.strip()[:remaining]
+            if not chunk:
+                break
+            parts.append(f"[{i}] {chunk}")
+            remaining -= len(chunk)
+        return "\n\n".join(parts)
+
+    def records(self) -> List[RetrievalResult]:
+        """最近的检索记录（每个回答一条）"""
+        with self._lock:
+            return list(self._records)
+
+    def stats(self) -> dict:
+        """检索次数、按时返回/超时/因忙跳过/出错次数、平均片段数和耗时分位数"""
+        records = self.records()
+        searched = [r for r in records if r.status not in ("loading", "busy")]
+        counts = {status: sum(r.status == status for r in records)
+                  for status in ("ok", "empty", "timeout", "loading", "busy", "error")}
+        latency = percentiles_of({"retrieval": [r.elapsed for r in searched if not r.timed_out]})["retrieval"]
+        return {
+            "requests": len(records),
+            **counts,
+            "avg_chunks": round(sum(len(r.chunks) for r in searched) / len(searched), 2) if searched else 0.0,
+            "p50_ms": round(latency["p50"], 1) if latency["p50"] is not None else None,
+            "p90_ms": round(latency["p90"], 1) if latency["p90"] is not None else None,
+        }
+
+    def cancel_all(self):
+        """停止录音：取消所有等待中的检索（知识库保持加载）"""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for _, _, future in pending:
+            future.cancel()
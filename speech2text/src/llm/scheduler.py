@@ -0,0 +1,246 @@
+"""
+回答调度模块，决定新问题到达时如何处理正在进行的回答：排队、取消或并行
+"""
+
+import collections
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.error_handler import ErrorHandler, logger
+
+# 调度策略
+POLICIES = ("queue", "cancel", "parallel")
+
+
+class AnswerTask:
+    """一个待回答的问题
+
+    回答函数打开流式响应后通过add_closer()登记关闭函数，cancel()时立即调用，
+    HTTP流随之关闭，服务端停止生成（不再计费）。
+    """
+
+    def __init__(self, seq: int, item: Any):
+        """
+        参数:
+            seq: 片段序号
+            item: 交给回答函数的数据
+        """
+        self.seq = seq
+        self.item = item
+        self.cancelled = False
+        self._closers = []
+        self._lock = threading.Lock()
+
+    def add_closer(self, close: Callable[[], Any]):
+        """登记取消时调用的关闭函数；已取消时立即调用"""
+        with self._lock:
+            if not self.cancelled:
+                self._closers.append(close)
+                return
+        self._close(close)
+
+    def cancel(self):
+        """取消回答并关闭已登记的流"""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            closers, self._closers = self._closers, []
+        for close in closers:
+            self._close(close)
+
+    @staticmethod
+    def _close(close: Callable[[], Any]):
+        try:
+            close()
+        except Exception as e:
+            logger.debug(f"关闭回答流时出错: {e}")
+
+
+class AnswerScheduler:
+    """回答调度器
+
+    - queue：同一时间只回答一个问题，其余按顺序排队
+    - cancel：新问题到达时取消正在进行和排队中的回答，只回答最新的问题
+    - parallel：最多同时回答max_parallel个问题，其余排队
+    """
+
+    def __init__(
+        self,
+        run: Callable[[AnswerTask], Any],
+        policy: str = "queue",
+        max_parallel: int = 2,
+        queue_size: int = 4,
+        on_done: Optional[Callable[[AnswerTask], Any]] = None,
+        on_drop: Optional[Callable[[AnswerTask], Any]] = None,
+        error_callback: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        参数:
+            run: 回答函数，输入任务（应定期检查task.cancelled并登记关闭函数）
+            policy: 调度策略，见POLICIES
+            max_parallel: parallel策略下同时进行的回答数
+            queue_size: 排队的问题数上限，写满时submit()等待
+            on_done: 任务结束（回答完成、出错或被取消）后的回调
+            on_drop: 任务在开始前被取消时的回调
+            error_callback: 错误消息回调
+        """
+        if policy not in POLICIES:
+            logger.warning(f"未知的回答调度策略{policy!r}，使用queue")
+            policy = "queue"
+        self.run = run
+        self.policy = policy
+        self.workers = max(1, max_parallel) if policy == "parallel" else 1
+        self.queue_size = max(1, queue_size)
+        self.on_done = on_done
+        self.on_drop = on_drop
+        self.error_callback = error_callback
+
+        self._pending = collections.deque()
+        self._active: Dict[int, AnswerTask] = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self.is_running = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.dropped = 0
+
+    def start(self):
+        """启动回答线程"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"answer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止调度：取消所有回答并丢弃排队的问题"""
+        with self._cond:
+            self.is_running = False
+            dropped = list(self._pending)
+            self._pending.clear()
+            active = list(self._active.values())
+            self._cond.notify_all()
+        for task in active:
+            task.cancel()
+        for task in dropped:
+            self._drop(task)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, seq: int, item: Any) -> Optional[AnswerTask]:
+        """
+        提交一个问题，按策略处理正在进行的回答；排队已满时等待
+
+        返回:
+            新任务，调度器已停止时返回None
+        """
+        task = AnswerTask(seq, item)
+        with self._cond:
+            if self.policy == "cancel":
+                superseded = list(self._active.values())
+                dropped = list(self._pending)
+                self._pending.clear()
+            else:
+                superseded, dropped = [], []
+                while self.is_running and len(self._pending) >= self.queue_size:
+                    self._cond.wait(0.2)
+            if not self.is_running:
+                return None
+            self._pending.append(task)
+            self.submitted += 1
+            self._cond.notify_all()
+        for old in superseded:
+            logger.info(f"新问题 #{seq} 取消正在进行的回答 #{old.seq}")
+            old.cancel()
+        for old in dropped:
+            self._drop(old)
+        return task
+
+    def cancel(self, seq: int) -> bool:
+        """取消指定片段的回答，返回是否找到"""
+        with self._cond:
+            task = self._active.get(seq)
+            if task is None:
+                for pending in self._pending:
+                    if pending.seq == seq:
+                        task = pending
+                        self._pending.remove(pending)
+                        break
+                if task is None:
+                    return False
+                started = False
+            else:
+                started = True
+        if started:
+            task.cancel()
+        else:
+            self._drop(task)
+        return True
+
+    def _drop(self, task: AnswerTask):
+        """任务在开始前被取消"""
+        task.cancel()
+        with self._cond:
+            self.dropped += 1
+        if self.on_drop:
+            self.on_drop(task)
+        if self.on_done:
+            self.on_done(task)
+
+    def _worker(self):
+        """回答线程：依次取出问题并回答"""
+        while True:
+            with self._cond:
+                while self.is_running and not self._pending:
+                    self._cond.wait()
+                if not self.is_running:
+                    return
+                task = self._pending.popleft()
+                self._active[task.seq] = task
+                self._cond.notify_all()
+            ErrorHandler.safe_execute(
+                self.run,
+                "回答线程出错",
+                self.error_callback,
+                None,
+                task
+            )
+            with self._cond:
+                self._active.pop(task.seq, None)
+                if task.cancelled:
+                    self.cancelled += 1
+                else:
+                    self.completed += 1
+            if self.on_done:
+                self.on_done(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """调度统计"""
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "dropped": self.dropped,
+                "active": len(self._active),
+                "queued": len(self._pending),
+            }
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要"""
+        with self._cond:
+            active, queued = len(self._active), len(self._pending)
+            interrupted = self.cancelled + self.dropped
+        if not self.submitted:
+            return ""
+        text = f"回答 进行{active} 排队{queued}"
+        return f"{text} 取消{interrupted}" if interrupted else text
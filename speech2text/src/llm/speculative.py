@@ -0,0 +1,233 @@
+"""
+推测式回答模块，在片段结束前根据稳定的部分转写结果提前请求回答
+"""
+
+import difflib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from ..utils.error_handler import logger
+from ..utils.text_normalize import normalize_question
+
+
+def question_similarity(a: str, b: str) -> float:
+    """归一化后两个问题的相似度（0~1）"""
+    a, b = normalize_question(a), normalize_question(b)
+    if not a or not b:
+        return 0.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class Speculation:
+    """一次推测请求
+
+    后台线程消费流式响应并把内容缓存起来（不显示），被采用后由回答线程
+    依次取出已缓存和后续到达的内容；被取消时关闭HTTP流。
+    """
+
+    def __init__(
+        self,
+        seq: int,
+        question: str,
+        open_stream: Callable[[str], Any],
+        extract: Callable[[Any], Optional[str]]
+    ):
+        """
+        参数:
+            seq: 片段序号
+            question: 推测使用的问题（部分转写文本）
+            open_stream: 问题 -> 可迭代的流式响应（支持close()时取消会关闭连接）
+            extract: 响应块 -> 文本增量（没有内容时返回None）
+        """
+        self.seq = seq
+        self.question = question
+        self.open_stream = open_stream
+        self.extract = extract
+        self.started = time.monotonic()
+        self.first_token_time: Optional[float] = None
+        self.tokens = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+        self._response = None
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"speculate-{seq}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """后台线程：请求回答并缓存所有内容"""
+        try:
+            self._response = self.open_stream(self.question)
+            if self.cancelled:
+                # cancel()在请求建立期间调用时还没有可关闭的响应
+                return
+            for chunk in self._response:
+                if self.cancelled:
+                    break
+                content = self.extract(chunk)
+                if not content:
+                    continue
+                with self._changed:
+                    if self.first_token_time is None:
+                        self.first_token_time = time.monotonic()
+                    self.tokens.append(content)
+                    self._changed.notify_all()
+        except Exception as e:
+            if not self.cancelled:
+                self.error = e
+                logger.warning(f"推测回答请求失败: {e}")
+        finally:
+            self._close()
+            with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    def _close(self):
+        close = getattr(self._response, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def cancel(self):
+        """取消推测并关闭HTTP流"""
+        self.cancelled = True
+        self._close()
+
+    def iter_tokens(self) -> Iterator[str]:
+        """依次返回已缓存和后续到达的内容，直到响应结束"""
+        index = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: index < len(self.tokens) or self.done)
+                pending = self.tokens[index:]
+                finished = self.done
+            for token in pending:
+                yield token
+            index += len(pending)
+            if finished and index >= len(self.tokens):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SpeculativeAnswerer:
+    """推测式回答管理器
+
+    部分转写结果看起来是问题时调用start()提前请求；片段最终转写结果到达后，
+    claim()比较两者，足够相似时采用推测结果，否则取消。统计节省的首token时间
+    和被取消推测浪费的token数。
+    """
+
+    def __init__(
+        self,
+        open_stream: Callable[[str], Any],
+        extract: Callable[[Any], Optional[str]],
+        similarity_threshold: float = 0.85,
+        max_active: int = 2,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        """
+        参数:
+            open_stream: 问题 -> 流式响应
+            extract: 响应块 -> 文本增量
+            similarity_threshold: 采用或保留推测所需的最低问题相似度
+            max_active: 同时进行的推测数，超出时取消最旧的
+            count_tokens: 文本 -> token数，用于统计被取消推测浪费的token；为None时按流式块数计
+        """
+        self.open_stream = open_stream
+        self.extract = extract
+        self.count_tokens = count_tokens
+        self.similarity_threshold = similarity_threshold
+        self.max_active = max(1, max_active)
+        self._active: Dict[int, Speculation] = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+        self.wasted_tokens = 0
+        self.ttft_saved = 0.0
+
+    def start(self, seq: int, question: str):
+        """根据部分转写文本开始推测；已有相似的推测时保留，否则重新开始"""
+        with self._lock:
+            current = self._active.get(seq)
+            if current is not None:
+                if question_similarity(current.question, question) >= self.similarity_threshold:
+                    return
+                self._cancel_locked(seq)
+            while len(self._active) >= self.max_active:
+                self._cancel_locked(min(self._active))
+            self._active[seq] = Speculation(seq, question, self.open_stream, self.extract)
+            self.started += 1
+        logger.info(f"推测回答 #{seq}: {question}")
+
+    def cancel(self, seq: int):
+        """取消片段的推测（如最终结果不是问题或片段被丢弃）"""
+        with self._lock:
+            self._cancel_locked(seq)
+
+    def _cancel_locked(self, seq: int):
+        speculation = self._active.pop(seq, None)
+        if speculation is None:
+            return
+        speculation.cancel()
+        self.cancelled += 1
+        with speculation._changed:
+            tokens = list(speculation.tokens)
+        if self.count_tokens is not None:
+            self.wasted_tokens += self.count_tokens("".join(tokens))
+        else:
+            self.wasted_tokens += len(tokens)
+
+    def claim(self, seq: int, question: str) -> Optional[Speculation]:
+        """
+        用最终问题认领推测
+
+        返回:
+            可以采用的推测；没有推测、推测失败或问题差异过大时返回None（推测被取消）
+        """
+        with self._lock:
+            speculation = self._active.get(seq)
+            if speculation is None:
+                return None
+            similarity = question_similarity(speculation.question, question)
+            if speculation.error is not None or similarity < self.similarity_threshold:
+                logger.info(f"放弃推测回答 #{seq}（相似度{similarity:.2f}）")
+                self._cancel_locked(seq)
+                return None
+            del self._active[seq]
+            self.used += 1
+
+        # 不推测时首token要等完整的请求时间；推测后只需等剩余部分
+        claimed = time.monotonic()
+        first_token = speculation.first_token_time or claimed
+        self.ttft_saved += max(0.0, min(first_token, claimed) - speculation.started)
+        return speculation
+
+    def shutdown(self):
+        """取消所有推测"""
+        with self._lock:
+            for seq in list(self._active):
+                self._cancel_locked(seq)
+
+    def stats(self) -> Dict[str, float]:
+        """推测统计"""
+        return {
+            "started": self.started,
+            "used": self.used,
+            "cancelled": self.cancelled,
+            "wasted_tokens": self.wasted_tokens,
+            "ttft_saved": round(self.ttft_saved, 3),
+            "avg_ttft_saved": round(self.ttft_saved / self.used, 3) if self.used else 0.0,
+        }
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要"""
+        if not self.started:
+            return ""
+        average = self.ttft_saved / self.used if self.used else 0.0
+        return f"推测 {self.used}/{self.started} 平均提前{average:.1f}s 浪费{self.wasted_tokens}token"
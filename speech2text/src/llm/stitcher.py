@@ -0,0 +1,76 @@
+"""
+跨片段的问题拼接：长问题中间停顿超过PAUSE_TOLERANCE时会被切成两个片段，
+前一段看起来没说完时暂缓路由，与紧接着的下一段合并成一个问题，只请求一次回答
+"""
+
+from typing import Callable, Iterable, Optional
+
+# 句子已结束的标点（全角和半角）
+TERMINAL_PUNCTUATION = ("。", "？", "！", "?", "!")
+
+# 句子未结束的标点，省略号表示说话人停下来想
+OPEN_PUNCTUATION = ("，", ",", "、", "；", ";", "：", ":", "…", "...", "——", "-")
+
+# 说到一半时常见的结尾词
+DEFAULT_CONNECTORS = (
+    "然后", "而且", "并且", "或者", "还是", "以及", "还有", "就是", "就是说", "比如", "比如说", "例如",
+    "因为", "所以", "但是", "不过", "如果", "假如", "那么", "那个", "这个", "关于", "对于", "针对",
+    "和", "跟", "与", "及", "的", "地", "在", "把", "对", "从", "向", "给", "是", "有", "呃", "嗯",
+)
+
+
+class QuestionStitcher:
+    """判断转写文本是否像说到一半，以及如何把相邻的两段拼接起来
+
+    时间条件（下一段在窗口内开始）由处理线程判断，流水线的路由线程据此暂缓或合并，
+    这里只负责文本上的信号：结尾标点、结尾的连接词，以及没有标点且本身不构成问题。
+    """
+
+    def __init__(
+        self,
+        is_question: Optional[Callable[[str], bool]] = None,
+        connectors: Iterable[str] = DEFAULT_CONNECTORS,
+        hold_unpunctuated: bool = True,
+        max_chars: int = 200
+    ):
+        """
+        参数:
+            is_question: 问题检测函数，没有标点的文本本身已构成问题时不暂缓
+            connectors: 表示没说完的结尾词
+            hold_unpunctuated: 没有结尾标点且不是问题的文本是否视为没说完
+            max_chars: 拼接后的最大长度，超过后不再继续拼接
+        """
+        self.is_question = is_question
+        # 长词在前，"就是说"优先于"是"
+        self.connectors = tuple(sorted(set(connectors), key=len, reverse=True))
+        self.hold_unpunctuated = hold_unpunctuated
+        self.max_chars = max_chars
+
+    def is_incomplete(self, text: str) -> bool:
+        """文本是否像一句没说完的话"""
+        text = text.strip()
+        if not text or len(text) >= self.max_chars:
+            return False
+        if text.endswith(OPEN_PUNCTUATION):
+            return True
+        if text.endswith(TERMINAL_PUNCTUATION):
+            return False
+        if text.endswith(self.connectors):
+            return True
+        if not self.hold_unpunctuated:
+            return False
+        return self.is_question is None or not self.is_question(text)
+
+    @staticmethod
+    def join(first: str, second: str) -> str:
+        """拼接两段文本：去掉前一段结尾的省略号，英文单词之间补空格"""
+        first = first.strip()
+        second = second.strip()
+        for ellipsis in ("...", "…"):
+            if first.endswith(ellipsis):
+                first = first[:-len(ellipsis)].rstrip()
+        if not first:
+            return second
+        if first[-1].isascii() and first[-1].isalnum() and second[:1].isascii() and second[:1].isalnum():
+            return f"{first} {second}"
+        return first + second
@@ -0,0 +1,132 @@
+"""
+无界面回放入口：用音频文件驱动真实的音频处理流程，并把输出事件写成JSONL
+
+用法（在仓库根目录）：
+    python -m speech2text.src.replay input.wav                  # 实时速度
+    python -m speech2text.src.replay input.wav --speed 4        # 4倍速
+    python -m speech2text.src.replay input.wav --speed 0 -o events.jsonl   # 尽可能快
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from .audio.audio_processor import AudioProcessor
+from .audio.sources import FileSource
+
+# 消息前缀 -> 事件类型（按顺序匹配）
+EVENT_TYPES = [
+    ("<partial>", "partial"),
+    ("<trace>", "trace"),
+    ("<stream>", "stream"),
+    ("针对问题:", "answer_start"),
+    ("回答:", "answer"),
+    ("问题:", "question"),
+    ("文本:", "text"),
+]
+
+
+class EventWriter:
+    """把AudioProcessor的文本回调写成带时间戳的JSONL事件"""
+
+    def __init__(self, output, source: FileSource, on_render=None):
+        self.output = output
+        self.source = source
+        # 写出事件即视为"显示"，回答首字的追踪标记立即回调
+        self.on_render = on_render
+        self.start = time.monotonic()
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def classify(self, message: str) -> str:
+        """根据消息前缀判断事件类型"""
+        if message.startswith("<block:"):
+            # 回答区域消息的<block:序号>前缀不影响类型
+            message = message.partition(">")[2]
+        for prefix, event_type in EVENT_TYPES:
+            if message.startswith(prefix):
+                return event_type
+        if "错误" in message or "失败" in message:
+            return "error"
+        return "system"
+
+    def __call__(self, message: str):
+        event_type = self.classify(message)
+        if event_type == "trace" and self.on_render:
+            self.on_render(int(message[7:]))
+        event = {
+            "t": round(time.monotonic() - self.start, 4),
+            "audio_t": round(self.source.delivered_frames / self.source.sample_rate, 3),
+            "type": event_type,
+            "text": message,
+        }
+        with self._lock:
+            self.counts[event_type] = self.counts.get(event_type, 0) + 1
+            self.output.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用音频文件无界面回放处理流程")
+    parser.add_argument("input", help="WAV/FLAC等音频文件")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0表示尽可能快")
+    parser.add_argument("-o", "--output", help="JSONL事件输出文件，默认输出到标准输出")
+    parser.add_argument("--timeout", type=float, default=None, help="回放结束后等待处理完毕的最长时间（秒）")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    source = FileSource(args.input, speed=args.speed)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    processor = AudioProcessor()
+    writer = EventWriter(output, source, on_render=processor.mark_answer_rendered)
+    processor.text_callback = writer
+
+    start = time.perf_counter()
+    try:
+        processor.start_recording("file", 0, source=source)
+        finished = processor.wait_until_idle(timeout=args.timeout)
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.stop_recording()
+        if output is not sys.stdout:
+            output.close()
+
+    dropped = processor.pipeline.dropped_segments if processor.pipeline else 0
+    overflows = processor.audio_ring.overflows if processor.audio_ring else 0
+    print(
+        f"音频时长: {source.duration:.1f}s, 处理耗时: {elapsed:.2f}s, "
+        f"速度: {source.duration / elapsed:.1f}x 实时, 丢弃片段: {dropped}, 缓冲区溢出: {overflows}"
+        + ("" if finished else "（等待超时）"),
+        file=sys.stderr
+    )
+    print("事件统计: " + ", ".join(f"{k}={v}" for k, v in sorted(writer.counts.items())), file=sys.stderr)
+    print(f"连接统计: {processor.transport_stats.stats()}", file=sys.stderr)
+    if processor.pipeline:
+        print(f"回答调度: {processor.pipeline.scheduler.stats()}", file=sys.stderr)
+        if processor.pipeline.stitched_segments:
+            print(f"问题拼接: 合并了{processor.pipeline.stitched_segments}个片段", file=sys.stderr)
+    if processor.rate_limiter:
+        print(f"限流统计: {processor.rate_limiter.stats()}", file=sys.stderr)
+    if processor.answer_cache:
+        print(f"回答缓存: {processor.answer_cache.stats()}", file=sys.stderr)
+    if processor.speculator:
+        print(f"推测回答: {processor.speculator.stats()}", file=sys.stderr)
+    if processor.retriever:
+        print(f"知识库检索: {processor.retriever.stats()}", file=sys.stderr)
+    if processor.latency:
+        for name, entry in processor.latency.percentiles().items():
+            if entry["count"]:
+                print(
+                    f"{name}: n={entry['count']} p50={entry['p50']:.0f}ms "
+                    f"p90={entry['p90']:.0f}ms p99={entry['p99']:.0f}ms",
+                    file=sys.stderr
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,8 @@ class MainWindow:
         self.typing_queue = queue.Queue()
         self.typing_speed = 20  # 每字符毫秒数（越小越快）
         self.is_typing = False
+        # 等待显示首字的回答片段序号（用于延迟追踪）
+        self.pending_render_seqs = set()
         
         # 创建线程处理打字机效果
         self.typing_thread = threading.Thread(target=self.process_typing_queue, daemon=True)
@@ -181,6 +183,17 @@ class MainWindow:
         )
         self.status_label.pack(side="left", padx=10, pady=5)
         
+        # 延迟和缓存统计
+        self.stats_label = ctk.CTkLabel(
+            self.status_frame,
+            text="",
+            height=25,
+            font=("微软雅黑", 10),
+            text_color="#94a3b8"
+        )
+        self.stats_label.pack(side="right", padx=10, pady=5)
+        self.root.after(2000, self.update_stats_status)
+        
         # 音量指示器 - 使用简化的指示器
         self.create_volume_indicator()
         
@@ -275,6 +288,7 @@ class MainWindow:
         self.question_area.tag_configure("transcription", foreground="#e2e8f0", font=("微软雅黑", 11))
         self.question_area.tag_configure("system", foreground="#94a3b8", font=("微软雅黑", 10))
         self.question_area.tag_configure("error", foreground="#f87171", font=("微软雅黑", 10, "bold"))
+        self.question_area.tag_configure("partial", foreground="#64748b", font=("微软雅黑", 11, "italic"))
         
         self.answer_area.tag_configure("answer", foreground="#a7f3d0", font=("微软雅黑", 11))
         self.answer_area.tag_configure("answer_bold", foreground="#a7f3d0", font=("微软雅黑", 12, "bold"))
@@ -412,53 +426,67 @@ class MainWindow:
     def update_text(self, text):
         """更新文本显示，处理流式输出和普通文本"""
         if "当前音量级别" not in text:
+            # 处理部分转写的临时文本：不进入打字队列（否则要排在正在逐字显示的回答之后），
+            # 由Tk主线程直接替换临时行
+            if text.startswith("<partial>"):
+                seq, _, content = text[9:].partition(":")
+                self.root.after(0, self.show_partial, seq, content)
+                return
+            
+            # 回答首个token的追踪标记，放入打字队列以便在首字显示时记录
+            if text.startswith("<trace>"):
+                self.typing_queue.put(("", f"trace_{text[7:]}", True, False, None))
+                return
+            
+            # 回答区域的消息带有<block:序号>前缀，同一个回答的内容显示在同一个区域
+            block = None
+            if text.startswith("<block:"):
+                block, _, text = text[7:].partition(">")
+            
             # 处理流式输出
             if text.startswith("<stream>"):
                 content = text[8:]  # 移除<stream>标记
-                # 处理特殊的回车符清除指令
+                # 处理特殊的回车符清除指令，按顺序放入打字队列，保证清除的是已显示的提示
                 if content.startswith("\r"):
-                    # 获取最后一行
-                    end_index = self.answer_area.index("end-1c")
-                    last_line_start = self.answer_area.index(f"{end_index} linestart")
-                    # 删除最后一行
-                    self.answer_area.delete(last_line_start, end_index)
+                    self.typing_queue.put(("", "clear_line", True, False, block))
                     # 移除回车符后再处理剩余内容
                     content = content.lstrip("\r").lstrip(" ").lstrip("\r")
                     if not content:  # 如果没有剩余内容，直接返回
                         return
                 
                 # 将流式内容添加到打字队列
-                self.typing_queue.put((content, "answer", True, True))  # 最后参数表示是否需要markdown渲染
+                self.typing_queue.put((content, "answer", True, True, block))  # 第4个参数表示是否需要markdown渲染
                 return
             
             # 根据内容类型将文本添加到相应的区域
-            if "问题:" in text:
+            if text.startswith("针对问题:"):
+                # 回答开始前在右侧添加问题提示，保证问题与回答相邻
+                self.typing_queue.put((text, "system", True, False, block))
+                
+            elif "问题:" in text:
                 # 记录当前问题ID，保证答案对应到正确的问题
                 question_text = text.replace("问题:", "").strip()
                 
                 # 添加分隔线使问题更明显
-                self.typing_queue.put(("\n" + "─"*40 + "\n", "system", False, False))
+                self.typing_queue.put(("\n" + "─"*40 + "\n", "system", False, False, None))
                 
                 # 添加带编号的问题
                 formatted_question = f"问题: {question_text}\n"
-                self.typing_queue.put((formatted_question, "question", False, False))
-                
-                # 同时在右侧添加问题提示
-                self.typing_queue.put((f"针对问题: {question_text}\n", "system", True, False))
+                self.typing_queue.put((formatted_question, "question", False, False, None))
                 
             elif "文本:" in text:
-                self.typing_queue.put((text + "\n", "transcription", False, False))
+                self.typing_queue.put((text + "\n", "transcription", False, False, None))
             elif "回答:" in text:
                 # 只添加"回答:"标记，实际内容通过流式输出显示
-                self.typing_queue.put(("", "answer", True, False))
+                self.typing_queue.put(("", "answer", True, False, block))
             elif "错误" in text or "失败" in text:
                 # 错误信息同时显示在两边
-                self.typing_queue.put(("\n❌ " + text + "\n", "error", False, False))
-                self.typing_queue.put(("\n❌ " + text + "\n", "error", True, False))
+                self.typing_queue.put(("\n❌ " + text + "\n", "error", False, False, None))
+                self.typing_queue.put(("\n❌ " + text + "\n", "error", True, False, block))
                 self.status_label.configure(text="❌ 出现错误", text_color="#f87171")
             else:
                 # 系统消息显示在问题区域
-                self.typing_queue.put((text + "\n", "system", False, False))
+                self.typing_queue.put((text + "\n", "system", False, False, None))
             
             # 更新状态标签
             if "开始" in text:
@@ -466,6 +494,28 @@ class MainWindow:
             elif "停止" in text:
                 self.status_label.configure(text="⏹ 已停止", text_color="#f87171")
     
+    def show_partial(self, seq, text):
+        """显示或替换某个语音片段的临时转写文本，空文本表示清除（在Tk主线程中调用）"""
+        tag = f"partial_{seq}"
+        ranges = self.question_area.tag_ranges(tag)
+        if ranges:
+            self.question_area.delete(ranges[0], ranges[-1])
+        if text:
+            self.question_area.insert("end", f"… {text}\n", ("partial", tag))
+            self.question_area.see("end")
+    
+    def block_position(self, block):
+        """回答区域中某个回答的插入位置，第一次出现时在末尾新建该回答的区域"""
+        if block is None:
+            return "end"
+        mark = f"block_{block}"
+        if mark not in self.answer_area.mark_names():
+            # 每个回答以自己的换行结尾，标记放在换行之前；标记默认右侧吸附，插入内容后仍在内容之后，
+            # 之后新建的回答位于该换行之后，不会推动之前回答的标记
+            self.answer_area.insert("end", "\n")
+            self.answer_area.mark_set(mark, "end-2c")
+        return mark
+    
     def parse_markdown(self, text):
         """简单的Markdown解析函数"""
         # 替换粗体 **text** -> 添加bold标签
@@ -485,18 +535,34 @@ class MainWindow:
         while True:
             try:
                 # 获取下一个要显示的字符和相关信息
-                text, tag, is_stream, is_markdown = self.typing_queue.get(timeout=0.1)
+                text, tag, is_stream, is_markdown, block = self.typing_queue.get(timeout=0.1)
                 self.is_typing = True
                 
-                # 选择目标文本区域
+                # 选择目标文本区域，回答区域中有所属回答的内容插入到该回答的末尾
                 target_area = self.answer_area if is_stream else self.question_area
+                position = self.block_position(block) if is_stream else "end"
                 
                 # 如果是空文本，直接跳过
                 if not text:
+                    if tag.startswith("trace_"):
+                        self.pending_render_seqs.add(tag[6:])
+                    elif tag == "clear_line":
+                        # 删除当前回答的最后一行（"正在思考"提示）
+                        line_end = "end-1c" if position == "end" else position
+                        target_area.delete(f"{line_end} linestart", line_end)
                     self.typing_queue.task_done()
                     self.is_typing = False
                     continue
                 
+                # 追踪标记之后该回答的第一段流式内容即回答首字，开始显示时记录
+                if is_stream and self.pending_render_seqs:
+                    seq = block if block in self.pending_render_seqs else (
+                        None if block is not None else self.pending_render_seqs.pop()
+                    )
+                    if seq is not None:
+                        self.pending_render_seqs.discard(seq)
+                        self.audio_processor.mark_answer_rendered(int(seq))
+                
                 # 确保样式标签已创建
                 if not hasattr(self, 'markdown_tags_created'):
                     target_area.tag_configure("bold", font=("微软雅黑", 11, "bold"), foreground="#a7f3d0")
@@ -517,12 +583,12 @@ class MainWindow:
                         list_match = re.match(r'^(\d+\.\s)(.*?)$', line)
                         if list_match:
                             # 列表项处理为点标记
-                            target_area.insert("end", "• ", "list_item")
+                            target_area.insert(position, "• ", "list_item")
                             # 显示列表内容
                             content = list_match.group(2)
                             for char in content:
-                                target_area.insert("end", char, "list_item")
-                                target_area.see("end")
+                                target_area.insert(position, char, "list_item")
+                                target_area.see(position)
                                 time.sleep(self.typing_speed / 1000)
                         else:
                             # 普通文本行，可能包含粗体
@@ -545,28 +611,28 @@ class MainWindow:
                                 if part_type == "bold":
                                     # 粗体文本
                                     for char in part_text:
-                                        target_area.insert("end", char, "answer_bold")
-                                        target_area.see("end")
+                                        target_area.insert(position, char, "answer_bold")
+                                        target_area.see(position)
                                         time.sleep(self.typing_speed / 1000)
                                 else:
                                     # 普通文本
                                     for char in part_text:
-                                        target_area.insert("end", char, tag)
-                                        target_area.see("end")
+                                        target_area.insert(position, char, tag)
+                                        target_area.see(position)
                                         time.sleep(self.typing_speed / 1000)
                         
                         # 除了最后一行外，所有行末尾添加换行符
                         if i < len(lines) - 1:
-                            target_area.insert("end", "\n", tag)
+                            target_area.insert(position, "\n", tag)
                 else:
                     # 非markdown内容，逐字显示文本
                     for char in text:
-                        target_area.insert("end", char, tag)
-                        target_area.see("end")
+                        target_area.insert(position, char, tag)
+                        target_area.see(position)
                         time.sleep(self.typing_speed / 1000)
                 
                 # 确保文本区域滚动到最新内容
-                target_area.see("end")
+                target_area.see(position)
                 
                 self.is_typing = False
                 self.typing_queue.task_done()
@@ -579,6 +645,22 @@ class MainWindow:
                 self.is_typing = False
                 continue
 
+    def update_stats_status(self):
+        """定期在状态栏显示延迟分位数、回答缓存命中率、推测回答、对话记忆和限流统计"""
+        parts = [
+            stats.summary()
+            for stats in (
+                self.audio_processor.latency,
+                self.audio_processor.answer_cache,
+                self.audio_processor.speculator,
+                self.audio_processor.memory,
+                self.audio_processor.rate_limiter
+            )
+            if stats
+        ]
+        self.stats_label.configure(text="  ".join(part for part in parts if part))
+        self.root.after(2000, self.update_stats_status)
+    
     def adjust_typing_speed(self, speed):
         """调整打字速度（毫秒）"""
         self.typing_speed = max(10, min(50, speed))  # 限制在10-50毫秒范围内
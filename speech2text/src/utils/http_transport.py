@@ -0,0 +1,223 @@
+"""
+HTTP传输层模块，提供共享的连接池客户端、连接预热和连接复用统计
+"""
+
+import functools
+import importlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .error_handler import logger
+
+
+class TransportStats:
+    """连接统计
+
+    通过httpcore的trace扩展记录每个请求是否新建连接，以及TCP连接和TLS握手耗时。
+    收到响应头的请求才计入复用统计：期间没有建立TCP连接即为复用了已有连接，
+    连接失败或被拒绝的请求只计入failed。
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.completed = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.tls_handshakes = 0
+        self.connect_time = 0.0
+        self.tls_time = 0.0
+        self._lock = threading.Lock()
+
+    def _tracer(self):
+        """为一个请求创建httpcore trace回调（在发起请求的线程中调用）"""
+        state = {"connected": False, "connect_started": None, "tls_started": None}
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            now = time.perf_counter()
+            if event_name == "connection.connect_tcp.started":
+                state["connect_started"] = now
+            elif event_name == "connection.connect_tcp.complete":
+                state["connected"] = True
+                with self._lock:
+                    self.new_connections += 1
+                    self.connect_time += now - (state["connect_started"] or now)
+            elif event_name == "connection.start_tls.started":
+                state["tls_started"] = now
+            elif event_name == "connection.start_tls.complete":
+                with self._lock:
+                    self.tls_handshakes += 1
+                    self.tls_time += now - (state["tls_started"] or now)
+            elif event_name.endswith(".receive_response_headers.complete"):
+                # HTTP/1.1和HTTP/2的事件前缀不同（http11./http2.）
+                with self._lock:
+                    self.completed += 1
+                    if not state["connected"]:
+                        self.reused_connections += 1
+
+        return trace
+
+    def on_request(self, request: httpx.Request):
+        """httpx请求钩子：计数并挂上trace回调"""
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._tracer()
+
+    def stats(self) -> Dict[str, float]:
+        """连接统计，时间单位为毫秒；复用率按收到响应的请求计算"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "completed": self.completed,
+                "failed": self.requests - self.completed,    # 包括统计时仍在进行的请求
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "reuse_rate": round(self.reused_connections / self.completed, 3) if self.completed else 0.0,
+                "avg_connect_ms": round(self.connect_time / self.new_connections * 1000, 2) if self.new_connections else 0.0,
+                "avg_tls_ms": round(self.tls_time / self.tls_handshakes * 1000, 2) if self.tls_handshakes else 0.0,
+            }
+
+
+def http2_available() -> bool:
+    """是否安装了HTTP/2所需的h2包"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _httpx_module(client_class: type):
+    """客户端类所属的httpx包（不同版本的OpenAI SDK可能基于httpx或其分支）"""
+    for base in client_class.__mro__:
+        root = base.__module__.split(".")[0]
+        if root.startswith("httpx"):
+            return importlib.import_module(root)
+    return httpx
+
+
+@functools.lru_cache(maxsize=None)
+def _draining_stream_class(module):
+    """为httpx包创建流式响应体包装类（响应的stream必须是该包的SyncByteStream）"""
+
+    class DrainingStream(module.SyncByteStream):
+        """读到SSE结束标记后，关闭时先读完剩余的响应体
+
+        OpenAI SDK读到"data: [DONE]"就关闭响应，此时结束块通常还没读，
+        连接会被直接关掉而不是放回连接池；读完剩余的几个字节即可复用连接。
+        没读到结束标记就关闭（如取消推测回答）时照常断开连接。
+        """
+
+        DONE = b"data: [DONE]"
+
+        def __init__(self, stream, max_drain: int = 65536):
+            self._stream = stream
+            self._max_drain = max_drain
+            self._tail = b""
+            self.done = False
+
+        def __iter__(self):
+            for chunk in self._stream:
+                if not self.done:
+                    self.done = self.DONE in self._tail + chunk
+                    self._tail = chunk[-len(self.DONE):]
+                yield chunk
+
+        def close(self):
+            try:
+                if self.done:
+                    drained = 0
+                    for chunk in self._stream:
+                        drained += len(chunk)
+                        if drained > self._max_drain:
+                            break
+            except Exception:
+                pass
+            finally:
+                self._stream.close()
+
+    return DrainingStream
+
+
+def create_http_client(
+    settings: Dict[str, Any],
+    stats: Optional[TransportStats] = None,
+    **client_options
+) -> httpx.Client:
+    """
+    创建共享的HTTP客户端
+
+    参数:
+        settings: HTTP_SETTINGS，包括连接池大小、keep-alive时长、HTTP/2和超时
+        stats: 可选的连接统计，提供时为每个请求挂上trace回调
+        client_options: 其他传给httpx.Client的参数（如verify）
+
+    返回:
+        httpx.Client实例
+    """
+    http2 = settings.get('http2', False)
+    if http2 and not http2_available():
+        logger.warning("未安装h2（pip install httpx[http2]），使用HTTP/1.1")
+        http2 = False
+
+    try:
+        # 使用OpenAI SDK的默认客户端，保留其默认的重定向等设置
+        from openai import DefaultHttpxClient as client_class
+    except ImportError:
+        client_class = httpx.Client
+    module = _httpx_module(client_class)
+
+    limits = module.Limits(
+        max_connections=settings.get('max_connections', 10),
+        max_keepalive_connections=settings.get('max_keepalive_connections', 5),
+        keepalive_expiry=settings.get('keepalive_expiry', 60.0)
+    )
+    timeout = module.Timeout(
+        settings.get('timeout', 60.0),
+        connect=settings.get('connect_timeout', 5.0)
+    )
+    stream_class = _draining_stream_class(module)
+
+    def on_response(response):
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            response.stream = stream_class(response.stream)
+
+    event_hooks = {"response": [on_response]}
+    if stats is not None:
+        event_hooks["request"] = [stats.on_request]
+
+    return client_class(
+        limits=limits,
+        timeout=timeout,
+        http2=http2,
+        event_hooks=event_hooks,
+        **client_options
+    )
+
+
+def warm_up(client, timeout: float = 5.0) -> Optional[float]:
+    """
+    预热连接：发送一个轻量请求，提前完成DNS解析、TCP连接和TLS握手
+
+    参数:
+        client: OpenAI客户端
+        timeout: 超时时间（秒）
+
+    返回:
+        预热耗时（秒），失败时返回None
+    """
+    from openai import APIConnectionError
+    start = time.perf_counter()
+    try:
+        client.with_options(max_retries=0, timeout=timeout).models.list()
+    except APIConnectionError as e:
+        logger.warning(f"连接预热失败: {e}")
+        return None
+    except Exception as e:
+        # 接口不支持模型列表（如部分代理）时连接通常已经建立，不影响预热效果
+        logger.info(f"连接预热请求返回错误: {type(e).__name__}")
+    elapsed = time.perf_counter() - start
+    logger.info(f"连接预热耗时{elapsed * 1000:.0f}ms")
+    return elapsed
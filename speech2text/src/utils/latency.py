@@ -0,0 +1,199 @@
+"""
+延迟追踪模块，记录每个语音片段从说话到回答显示的各阶段时间并汇总分位数
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 按时间顺序排列的追踪阶段
+STAGES = [
+    "speech_start",    # 第一个语音块
+    "segment_close",   # 片段结束
+    "upload_start",    # 开始上传/转写
+    "upload_end",      # 上传/转写请求返回
+    "transcript",      # 得到转写文本
+    "classified",      # 完成问题判断
+    "first_token",     # GPT第一个token
+    "last_token",      # GPT最后一个token
+    "first_render",    # 回答区域显示第一个字符
+]
+
+# 汇总指标：名称 -> (起始阶段, 结束阶段)
+METRICS = OrderedDict([
+    ("utterance", ("speech_start", "segment_close")),
+    ("queue_wait", ("segment_close", "upload_start")),
+    ("upload", ("upload_start", "upload_end")),
+    ("close_to_transcript", ("segment_close", "transcript")),
+    ("classify", ("transcript", "classified")),
+    ("answer_wait", ("classified", "first_token")),
+    ("close_to_first_token", ("segment_close", "first_token")),
+    ("stream", ("first_token", "last_token")),
+    ("render_delay", ("first_token", "first_render")),
+    ("close_to_first_render", ("segment_close", "first_render")),
+])
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentiles_of(samples: Dict[str, List[float]]) -> Dict[str, dict]:
+    """
+    计算每个指标的样本数和p50/p90/p99
+
+    参数:
+        samples: 指标名 -> 样本（秒），可以是多个记录器合并后的样本
+
+    返回:
+        指标名 -> {'count': ..., 'p50': ..., 'p90': ..., 'p99': ...}（毫秒，没有样本时为None）
+    """
+    result = {}
+    for name, values in samples.items():
+        entry = {"count": len(values)}
+        for p in PERCENTILES:
+            entry[f"p{p}"] = float(np.percentile(values, p) * 1000) if values else None
+        result[name] = entry
+    return result
+
+
+class UtteranceTrace:
+    """单个语音片段的追踪记录，保存各阶段的单调时钟时间戳"""
+
+    def __init__(self, seq: int):
+        self.seq = seq
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, stage: str, timestamp: Optional[float] = None):
+        """记录阶段时间，同一阶段只记录第一次"""
+        self.marks.setdefault(stage, time.monotonic() if timestamp is None else timestamp)
+
+    def durations(self) -> Dict[str, float]:
+        """计算所有两端都已记录的指标（秒）"""
+        return {
+            name: self.marks[end] - self.marks[start]
+            for name, (start, end) in METRICS.items()
+            if start in self.marks and end in self.marks
+        }
+
+
+class LatencyRecorder:
+    """延迟记录器，线程安全
+
+    每个片段以序号为键创建追踪，完成后把各指标写入定长样本窗口，
+    用于计算p50/p90/p99并导出JSON/CSV。
+    """
+
+    def __init__(self, max_samples: int = 1000, max_active: int = 100):
+        """
+        参数:
+            max_samples: 每个指标保留的最近样本数
+            max_active: 同时追踪的最大片段数，超出时丢弃最旧的追踪
+        """
+        self.max_active = max_active
+        self._active: "OrderedDict[int, UtteranceTrace]" = OrderedDict()
+        self._samples = {name: deque(maxlen=max_samples) for name in METRICS}
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    def start(self, seq: int) -> UtteranceTrace:
+        """开始追踪一个片段并记录speech_start"""
+        trace = UtteranceTrace(seq)
+        trace.mark("speech_start")
+        with self._lock:
+            self._active[seq] = trace
+            while len(self._active) > self.max_active:
+                self._active.popitem(last=False)
+        return trace
+
+    def mark(self, seq: Optional[int], stage: str):
+        """记录片段的某个阶段；回答的首字显示和最后一个token都到齐后自动完成追踪"""
+        if seq is None:
+            return
+        with self._lock:
+            trace = self._active.get(seq)
+            if trace is None:
+                return
+            trace.mark(stage)
+            if "first_render" in trace.marks and "last_token" in trace.marks:
+                self._finish_locked(seq)
+
+    def finish(self, seq: Optional[int], pending: Optional[str] = None):
+        """
+        完成追踪（如非问题文本在分类后即完成）
+
+        参数:
+            seq: 片段序号
+            pending: 若该阶段已记录，说明后续阶段（如界面显示首字）还会到达，此时不完成
+        """
+        with self._lock:
+            trace = self._active.get(seq)
+            if trace is not None and pending in trace.marks:
+                return
+            self._finish_locked(seq)
+
+    def discard(self, seq: Optional[int]):
+        """丢弃追踪（如片段过短或被丢弃）"""
+        with self._lock:
+            self._active.pop(seq, None)
+
+    def _finish_locked(self, seq: Optional[int]):
+        trace = self._active.pop(seq, None)
+        if trace is None:
+            return
+        for name, value in trace.durations().items():
+            self._samples[name].append(value)
+        self._completed += 1
+
+    def samples(self) -> Dict[str, List[float]]:
+        """返回每个指标当前窗口内的样本（秒）"""
+        with self._lock:
+            return {name: list(values) for name, values in self._samples.items()}
+
+    def percentiles(self) -> Dict[str, dict]:
+        """返回每个指标的样本数和p50/p90/p99（毫秒）"""
+        return percentiles_of(self.samples())
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要"""
+        stats = self.percentiles()
+        parts = []
+        for name, label in (("close_to_transcript", "转写"), ("close_to_first_render", "首字")):
+            entry = stats[name]
+            if entry["count"]:
+                parts.append(f"{label} p50 {entry['p50'] / 1000:.1f}s / p90 {entry['p90'] / 1000:.1f}s")
+        return "⏱ " + "，".join(parts) if parts else ""
+
+    def dump_json(self, path: str):
+        """把分位数和原始样本导出为JSON"""
+        with self._lock:
+            samples = {name: [round(v * 1000, 2) for v in values] for name, values in self._samples.items()}
+            completed = self._completed
+        data = {
+            "completed": completed,
+            "percentiles_ms": self.percentiles(),
+            "samples_ms": samples,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def dump_csv(self, path: str):
+        """把每个指标的分位数导出为CSV"""
+        stats = self.percentiles()
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["metric", "count"] + [f"p{p}_ms" for p in PERCENTILES])
+            for name, entry in stats.items():
+                writer.writerow([name, entry["count"]] + [
+                    "" if entry[f"p{p}"] is None else f"{entry[f'p{p}']:.1f}" for p in PERCENTILES
+                ])
+
+    def export(self, path_prefix: str) -> List[str]:
+        """同时导出JSON和CSV，返回生成的文件路径"""
+        paths = [f"{path_prefix}.json", f"{path_prefix}.csv"]
+        self.dump_json(paths[0])
+        self.dump_csv(paths[1])
+        return paths
@@ -0,0 +1,251 @@
+"""
+接口限流模块：按接口分别限制每分钟请求数和token数，失败时按指数退避重试，
+并遵守服务端的Retry-After和每个语音片段的截止时间
+"""
+
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .error_handler import logger
+
+# 可重试的HTTP状态码（其余4xx错误重试也不会成功）
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class DeadlineExceeded(Exception):
+    """请求无法在截止时间前完成（排队限流或重试等待会超过截止时间）"""
+
+
+class TokenBucket:
+    """令牌桶
+
+    按rate_per_minute匀速补充，最多积累capacity个。reserve()预先扣除并返回需要等待的时间，
+    余额可以为负，后来的请求排在前面的请求之后，多个线程按到达顺序公平等待。
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        参数:
+            rate_per_minute: 每分钟补充的数量
+            capacity: 桶容量（允许的突发量），默认为一分钟的配额
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """扣除amount，返回需要等待的秒数（0表示立即可用）"""
+        # 超过容量的单次请求按容量计，否则永远无法满足
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float = 1.0):
+        """退还未使用的预留（如等待会超过截止时间而放弃）"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class EndpointStats:
+    """单个接口的计数"""
+
+    __slots__ = ("requests", "throttled", "throttle_wait", "rate_limited", "retried", "abandoned", "failed")
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0         # 因本地限流等待的请求
+        self.throttle_wait = 0.0   # 本地限流累计等待时间（秒）
+        self.rate_limited = 0      # 服务端返回429的次数
+        self.retried = 0           # 重试次数
+        self.abandoned = 0         # 因截止时间放弃的请求
+        self.failed = 0            # 重试用尽或不可重试的失败
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(getattr(self, name), 3) for name in self.__slots__}
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """从错误响应的retry-after-ms或Retry-After头中取出建议的等待秒数"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # HTTP日期格式
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """连接错误、超时、429和5xx可以重试"""
+    try:
+        from openai import APIConnectionError
+    except ImportError:
+        APIConnectionError = ()
+    if isinstance(error, (APIConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+class RateLimiter:
+    """按接口的客户端限流和重试
+
+    每个接口（如transcription、chat）有独立的请求数桶和可选的token数桶。
+    调用前在桶中预留配额，需要等待时先检查截止时间；失败时按带抖动的指数退避重试，
+    服务端给出Retry-After时按其等待，等待后会超过截止时间则放弃并抛出DeadlineExceeded。
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Dict[str, Any]],
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 60.0
+    ):
+        """
+        参数:
+            limits: 接口名 -> {'requests_per_minute': ..., 'tokens_per_minute': ...}，值为None表示不限制
+            max_retries: 最多重试次数
+            base_delay: 退避的初始等待（秒）
+            max_delay: 退避的最长等待（秒，不含Retry-After）
+            max_retry_after: 没有截止时间时最多遵守的Retry-After（秒）
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._buckets: Dict[str, tuple] = {}
+        for endpoint, limit in limits.items():
+            rpm = limit.get('requests_per_minute')
+            tpm = limit.get('tokens_per_minute')
+            self._buckets[endpoint] = (
+                TokenBucket(rpm) if rpm else None,
+                TokenBucket(tpm) if tpm else None
+            )
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint_stats(self, endpoint: str) -> EndpointStats:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            return stats
+
+    def _count(self, stats: EndpointStats, name: str, amount: float = 1):
+        with self._lock:
+            setattr(stats, name, getattr(stats, name) + amount)
+
+    def _throttle(self, endpoint: str, stats: EndpointStats, tokens: int, deadline: Optional[float]):
+        """在请求数和token数桶中预留配额，必要时等待"""
+        requests_bucket, tokens_bucket = self._buckets.get(endpoint, (None, None))
+        reserved = []
+        wait = 0.0
+        for bucket, amount in ((requests_bucket, 1), (tokens_bucket, tokens)):
+            if bucket is not None and amount:
+                wait = max(wait, bucket.reserve(amount))
+                reserved.append((bucket, amount))
+        if wait <= 0:
+            return
+        if deadline is not None and time.monotonic() + wait > deadline:
+            for bucket, amount in reserved:
+                bucket.refund(amount)
+            self._count(stats, "abandoned")
+            raise DeadlineExceeded(f"{endpoint}限流需等待{wait:.1f}秒，超过截止时间")
+        self._count(stats, "throttled")
+        self._count(stats, "throttle_wait", wait)
+        logger.info(f"{endpoint}接口限流，等待{wait:.2f}秒")
+        time.sleep(wait)
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """第attempt次重试前的等待时间：有Retry-After时按其等待，否则为带完全抖动的指数退避"""
+        suggested = retry_after(error)
+        if suggested is not None:
+            return suggested + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(
+        self,
+        endpoint: str,
+        func: Callable[[], Any],
+        tokens: int = 0,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """
+        限流并带重试地调用接口
+
+        参数:
+            endpoint: 接口名
+            func: 发起请求的函数
+            tokens: 请求预计消耗的token数（计入token数桶）
+            deadline: 截止时间（time.monotonic()），超过后结果已无用
+
+        返回:
+            func的返回值
+        """
+        stats = self._endpoint_stats(endpoint)
+        self._count(stats, "requests")
+        attempt = 0
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                self._count(stats, "abandoned")
+                raise DeadlineExceeded(f"{endpoint}请求已超过截止时间")
+            self._throttle(endpoint, stats, tokens, deadline)
+            try:
+                return func()
+            except Exception as e:
+                if getattr(e, "status_code", None) == 429:
+                    self._count(stats, "rate_limited")
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count(stats, "failed")
+                    raise
+                delay = self.backoff(attempt, e)
+                if deadline is None:
+                    delay = min(delay, self.max_retry_after)
+                elif time.monotonic() + delay >= deadline:
+                    self._count(stats, "abandoned")
+                    raise DeadlineExceeded(f"{endpoint}请求失败（{e}），重试等待会超过截止时间") from e
+                attempt += 1
+                self._count(stats, "retried")
+                logger.warning(f"{endpoint}请求失败（{type(e).__name__}），{delay:.2f}秒后第{attempt}次重试")
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """各接口的计数"""
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self._stats.items()}
+
+    def summary(self) -> str:
+        """生成适合状态栏显示的简短摘要（没有限流、重试或放弃时为空）"""
+        with self._lock:
+            throttled = sum(s.throttled + s.rate_limited for s in self._stats.values())
+            retried = sum(s.retried for s in self._stats.values())
+            abandoned = sum(s.abandoned for s in self._stats.values())
+        if not (throttled or retried or abandoned):
+            return ""
+        return f"限流{throttled} 重试{retried} 放弃{abandoned}"
@@ -0,0 +1,50 @@
+"""
+文本归一化工具，用于比较和缓存转写出来的问题
+"""
+
+import re
+import unicodedata
+
+# 口语中不影响问题含义的语气词，出现在任何位置都去除
+FILLER_WORDS = [
+    '嗯', '呃', '啊', '哦', '噢', '唉',
+    'um', 'uh', 'erm', 'hmm',
+]
+
+# 句首的礼貌用语，只在开头去除（"这个""然后""就是"等可能改变问题含义，不去除）
+LEADING_FILLERS = ['请问', '麻烦']
+
+# 英文填充词需要按整词匹配，避免误删"number"中的"um"
+_FILLER_PATTERN = re.compile("|".join(
+    rf"\b{re.escape(word)}\b" if word.isascii() else re.escape(word)
+    for word in sorted(FILLER_WORDS, key=len, reverse=True)
+))
+
+_LEADING_PATTERN = re.compile(
+    r"^[\W_]*(?:(?:" + "|".join(map(re.escape, LEADING_FILLERS)) + r")[\W_]*)+"
+)
+
+
+def fold_width(text: str) -> str:
+    """全角字符折叠为半角（如"ＡＢＣ１２３"->"ABC123"，"？"->"?"）"""
+    return unicodedata.normalize("NFKC", text)
+
+
+def strip_punctuation(text: str) -> str:
+    """去除标点、符号和空白"""
+    return "".join(
+        char for char in text
+        if not unicodedata.category(char).startswith(("P", "S", "Z", "C"))
+    )
+
+
+def normalize_question(text: str, strip_fillers: bool = True) -> str:
+    """
+    把问题归一化为比较用的键：全半角折叠、转小写、去标点空白、去语气词和句首礼貌用语
+
+    例如"嗯，请问 Ｐｙｔｈｏｎ 的GIL是什么？"和"python的gil是什么"得到相同结果。
+    """
+    text = fold_width(text).lower()
+    if strip_fillers:
+        text = _LEADING_PATTERN.sub("", _FILLER_PATTERN.sub("", text))
+    return strip_punctuation(text)